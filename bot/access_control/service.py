@@ -1,14 +1,19 @@
+import asyncio
 import logging
+from collections.abc import Mapping
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 
 from aiogram import Bot
 from aiogram.exceptions import TelegramAPIError
 
+from bot.utils.rate_limit import telegram_rate_limiter
 from config import settings
 
 logger = logging.getLogger(__name__)
 
+INVITE_LINK_TTL = timedelta(hours=24)
+
 
 @dataclass(frozen=True)
 class AccessChangeResult:
@@ -24,6 +29,7 @@ class AccessChangeResult:
 
 
 async def _safe_ban(bot: Bot, chat_id: int, tg_id: int) -> bool:
+    await telegram_rate_limiter.acquire()
     try:
         await bot.ban_chat_member(chat_id=chat_id, user_id=tg_id, revoke_messages=False)
         return True
@@ -36,6 +42,7 @@ async def _safe_ban(bot: Bot, chat_id: int, tg_id: int) -> bool:
 
 
 async def _safe_unban(bot: Bot, chat_id: int, tg_id: int) -> bool:
+    await telegram_rate_limiter.acquire()
     try:
         # Without only_if_banned Telegram may remove an existing member. Granting
         # or refreshing links must never kick somebody who already has access.
@@ -50,12 +57,13 @@ async def _safe_unban(bot: Bot, chat_id: int, tg_id: int) -> bool:
 
 
 async def _safe_invite_link(bot: Bot, chat_id: int, tg_id: int) -> str | None:
+    await telegram_rate_limiter.acquire()
     try:
         link = await bot.create_chat_invite_link(
             chat_id=chat_id,
             creates_join_request=True,
             name=f"access-{tg_id}",
-            expire_date=datetime.now(timezone.utc) + timedelta(hours=24),
+            expire_date=datetime.now(timezone.utc) + INVITE_LINK_TTL,
         )
         return link.invite_link
     except TelegramAPIError:
@@ -66,22 +74,52 @@ async def _safe_invite_link(bot: Bot, chat_id: int, tg_id: int) -> str | None:
         return None
 
 
-async def grant_access(bot: Bot, tg_id: int) -> AccessChangeResult:
-    channel_unbanned = await _safe_unban(bot, settings.primary_channel_id, tg_id)
-    group_unbanned = await _safe_unban(bot, settings.secondary_discussion_id, tg_id)
-    channel_link = (
-        await _safe_invite_link(bot, settings.primary_channel_id, tg_id)
-        if channel_unbanned
-        else None
-    )
-    group_link = (
-        await _safe_invite_link(bot, settings.secondary_discussion_id, tg_id)
-        if group_unbanned
-        else None
+async def revoke_invite_link(bot: Bot, chat_id: int, invite_link: str) -> bool:
+    await telegram_rate_limiter.acquire()
+    try:
+        await bot.revoke_chat_invite_link(chat_id=chat_id, invite_link=invite_link)
+        return True
+    except TelegramAPIError:
+        logger.warning(
+            "Failed to revoke invite link",
+            extra={"chat_id": chat_id},
+            exc_info=True,
+        )
+        return False
+
+
+async def ban_in_chat(bot: Bot, chat_id: int, tg_id: int) -> bool:
+    return await _safe_ban(bot, chat_id, tg_id)
+
+
+async def grant_in_chat(
+    bot: Bot, chat_id: int, tg_id: int, known_link: str | None = None
+) -> str | None:
+    """Unban in one chat and return an invite link.
+
+    ``known_link`` is a still-valid link issued to this user earlier; it is
+    returned instead of creating a new one.
+    """
+    if not await _safe_unban(bot, chat_id, tg_id):
+        return None
+    return known_link or await _safe_invite_link(bot, chat_id, tg_id)
+
+
+async def grant_access(
+    bot: Bot, tg_id: int, known_links: Mapping[int, str] | None = None
+) -> AccessChangeResult:
+    # The chats are independent, so both run at once; within a chat the link
+    # is only created after the unban succeeded.
+    known_links = known_links or {}
+    channel_id = settings.primary_channel_id
+    group_id = settings.secondary_discussion_id
+    channel_link, group_link = await asyncio.gather(
+        grant_in_chat(bot, channel_id, tg_id, known_links.get(channel_id)),
+        grant_in_chat(bot, group_id, tg_id, known_links.get(group_id)),
     )
     return AccessChangeResult(
-        channel_ok=channel_unbanned and channel_link is not None,
-        group_ok=group_unbanned and group_link is not None,
+        channel_ok=channel_link is not None,
+        group_ok=group_link is not None,
         channel_link=channel_link,
         group_link=group_link,
     )
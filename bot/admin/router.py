@@ -1,4 +1,5 @@
 from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
 
 from aiogram import Router, types
 from aiogram.filters import Command
@@ -7,7 +8,7 @@ from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from bot.access_control.service import grant_access, revoke_access
+from bot.access_control.service import revoke_access
 from bot.admin.keyboards import (
     back_menu_kb,
     flows_edit_select_kb,
@@ -23,9 +24,11 @@ from bot.admin.keyboards import (
     user_card_kb,
     users_search_kb,
 )
-from bot.admin.templates import DEFAULT_TEMPLATES
+from bot.admin.templates import DEFAULT_TEMPLATES, TEMPLATE_LABELS
 from bot.db.models import Flow, Membership, MembershipStatus
+from bot.db.replica import read_only_session
 from bot.repositories import flows as flow_repo
+from bot.repositories import mailing_events as mailing_event_repo
 from bot.repositories import memberships as membership_repo
 from bot.repositories import promos as promo_repo
 from bot.repositories.app_settings import get_setting, set_setting
@@ -39,9 +42,18 @@ from bot.repositories.users import (
     get_user_by_username,
     lock_user_by_id,
 )
+from bot.scheduler.deadlines import schedule_membership_deadline
 from bot.services.entitlements import has_valid_access
 from bot.services.flows import sales_window_for_start
-from bot.services.mailings import send_custom_broadcast
+from bot.services.invite_links import (
+    grant_access_with_links,
+    revoke_user_invite_links,
+)
+from bot.services.mailings import (
+    MAILING_AUDIENCE_LABELS,
+    schedule_flow_mailings,
+    send_custom_broadcast,
+)
 from bot.services.memberships import compute_grace_end
 from bot.services.settings import (
     get_effective_settings,
@@ -182,6 +194,20 @@ def _format_flow_block(title: str, flow, now: datetime) -> str:
     )
 
 
+def _format_mailing_calendar(events) -> str:
+    if not events:
+        return "Запланированные рассылки: нет"
+    lines = ["Запланированные рассылки:"]
+    for event, flow in events:
+        label = TEMPLATE_LABELS.get(event.template_key, event.template_key)
+        audience = MAILING_AUDIENCE_LABELS.get(event.audience, event.audience)
+        lines.append(
+            f"{event.send_on:%d.%m.%Y} — {label} ({audience}), "
+            f"поток от {flow.start_at.date()}"
+        )
+    return "\n".join(lines)
+
+
 async def _get_current_flow(session: AsyncSession, now: datetime):
     if settings.free_flows_enabled:
         flow = await flow_repo.get_active_free_flow(session, now)
@@ -233,6 +259,12 @@ async def _show_flows_screen(
         [
             _format_flow_block("Текущий поток", current_flow, now),
             _format_flow_block("Следующий поток", next_flow, now),
+            _format_mailing_calendar(
+                await mailing_event_repo.list_upcoming_events(
+                    session,
+                    now.astimezone(ZoneInfo(settings.scheduler_timezone)).date(),
+                )
+            ),
         ]
     )
     await edit_screen(
@@ -462,10 +494,12 @@ async def admin_section(
         await state.clear()
     text: str | None = None
     if section == "flows":
-        await _show_flows_screen(callback, session)
+        async with read_only_session("admin:flows") as reader:
+            await _show_flows_screen(callback, reader)
         return
     elif section == "prices":
-        await _show_prices_screen(callback, session)
+        async with read_only_session("admin:prices") as reader:
+            await _show_prices_screen(callback, reader)
         return
     elif section == "texts":
         await edit_screen(
@@ -483,10 +517,12 @@ async def admin_section(
         await _show_users_search(callback, state)
         return
     elif section == "mailings":
-        await _show_mailings_screen(callback, session)
+        async with read_only_session("admin:mailings") as reader:
+            await _show_mailings_screen(callback, reader)
         return
     elif section == "audit":
-        logs = await list_audit_logs(session, limit=50)
+        async with read_only_session("admin:audit") as reader:
+            logs = await list_audit_logs(reader, limit=50)
         if not logs:
             await edit_screen(
                 callback.message, "Лог пуст.", reply_markup=back_menu_kb("admin:menu")
@@ -683,6 +719,7 @@ async def admin_section(
         # automatic expiry for this participant.
         user = await lock_user_by_id(session, user.id)
         if user is None:
+            await session.rollback()
             await callback.message.answer("Пользователь больше не существует.")
             await callback.answer()
             return
@@ -696,6 +733,7 @@ async def admin_section(
         if action == "grant":
             flow = await _get_current_or_next_flow(session, now)
             if flow is None:
+                await session.rollback()
                 await callback.message.answer("Поток не найден.")
                 await callback.answer()
                 return
@@ -713,7 +751,10 @@ async def admin_section(
             membership.grace_end_at = compute_grace_end(
                 flow.end_at, effective.grace_days
             )
-            access_result = await grant_access(callback.message.bot, user.tg_id)
+            schedule_membership_deadline(membership)
+            access_result = await grant_access_with_links(
+                session, callback.message.bot, user.id, user.tg_id
+            )
             await add_audit_log(
                 session,
                 action="admin_user_action",
@@ -790,6 +831,7 @@ async def admin_section(
                 )
                 await callback.answer()
                 return
+            await revoke_user_invite_links(session, callback.message.bot, user.id)
             expired_count = await membership_repo.expire_all_active_memberships(
                 session, user.id
             )
@@ -839,6 +881,7 @@ async def admin_section(
 
         if action == "extend7":
             if not membership:
+                await session.rollback()
                 await callback.message.answer("Нет участия для продления.")
                 await callback.answer()
                 return
@@ -846,6 +889,7 @@ async def admin_section(
             membership.grace_end_at = compute_grace_end(
                 membership.access_end_at, effective.grace_days
             )
+            schedule_membership_deadline(membership)
             await add_audit_log(
                 session,
                 action="admin_user_action",
@@ -863,6 +907,7 @@ async def admin_section(
 
         if action == "reset_pay_later":
             if not membership:
+                await session.rollback()
                 await callback.message.answer("Нет участия для сброса.")
                 await callback.answer()
                 return
@@ -943,17 +988,18 @@ async def admin_section(
                 return
             end_at = start_at + timedelta(weeks=5)
             sales_open_at, sales_close_at = sales_window_for_start(start_at)
-            session.add(
-                Flow(
-                    title="Платный поток",
-                    start_at=start_at,
-                    end_at=end_at,
-                    duration_weeks=5,
-                    is_free=False,
-                    sales_open_at=sales_open_at,
-                    sales_close_at=sales_close_at,
-                )
+            flow = Flow(
+                title="Платный поток",
+                start_at=start_at,
+                end_at=end_at,
+                duration_weeks=5,
+                is_free=False,
+                sales_open_at=sales_open_at,
+                sales_close_at=sales_close_at,
             )
+            session.add(flow)
+            await session.flush()
+            await schedule_flow_mailings(session, flow)
             await session.commit()
             await callback.message.answer(
                 "Создан платный поток:\n"
@@ -1070,6 +1116,7 @@ async def flow_edit_end_handler(
     flow.end_at = end_at
     flow.duration_weeks = max(1, (end_at - start_at).days // 7)
     flow.sales_open_at, flow.sales_close_at = sales_window_for_start(start_at)
+    await schedule_flow_mailings(session, flow)
     await session.commit()
     await state.clear()
 
@@ -1335,6 +1382,7 @@ async def promo_disable_handler(
         return
     ok = await promo_repo.disable_promo(session, code)
     if not ok:
+        await session.rollback()
         await message.answer("Промокод не найден.")
         return
     await session.commit()
@@ -1342,7 +1390,8 @@ async def promo_disable_handler(
     await message.answer("✅ Промокод отключен.")
 
 
-@router.message(CustomMailingState.waiting_text)
+# Audience selection and the per-recipient lookups only read.
+@router.message(CustomMailingState.waiting_text, flags={"read_only": True})
 async def custom_mailing_text_handler(
     message: types.Message, session: AsyncSession, state: FSMContext
 ) -> None:
@@ -24,9 +24,13 @@ DEFAULT_TEMPLATES: dict[str, str] = {
     "payment_success_no_links": (
         "Оплата подтверждена. Доступ активирован.\n"
         "Ссылки входа временно не сгенерировались автоматически.\n"
-        "Откройте раздел «💳 Оплата» ещё раз через минуту.\n"
+        "Бот пришлёт их сам в ближайшие минуты.\n"
         "Если ссылки не появятся, напишите администратору: @zzsaaeva"
     ),
+    "access_link_retry": (
+        "Ссылка для входа готова.\n"
+        "Нажмите кнопку ниже и отправьте заявку на вступление."
+    ),
     "payment_failed": (
         "Оплата не прошла или была отменена.\n"
         "Проверьте способ оплаты и попробуйте снова."
@@ -118,6 +122,7 @@ TEMPLATE_LABELS: dict[str, str] = {
     "pay_unavailable": "💳 Оплата",
     "payment_success": "💳 Оплата — успех",
     "payment_success_no_links": "💳 Оплата — успех (без ссылок)",
+    "access_link_retry": "🔁 Ссылка входа после повторной попытки",
     "payment_failed": "💳 Оплата — ошибка",
     "payment_expired": "💳 Оплата — срок истёк",
     "payment_needs_review": "💳 Оплата — ручная проверка",
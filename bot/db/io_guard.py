@@ -0,0 +1,97 @@
+"""Keep pooled connections out of Telegram and YooKassa round-trips.
+
+A session holds its pool connection from the first query until commit or
+rollback. The update middleware binds its session here, and the Telegram
+session and the YooKassa adapter call ``before_network_io`` before every
+request. If the transaction has only read, it is committed to hand the
+connection back. Objects stay loaded because of expire_on_commit=False. Under
+READ COMMITTED this changes nothing a handler can observe. If the transaction
+has written or locked rows, it cannot be ended behind the handler's back, so
+the handler is flagged.
+"""
+
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import ORMExecuteState, Session, SessionTransaction
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+_HOLDS_CONNECTION = "io_guard_holds_connection"
+_WROTE = "io_guard_wrote"
+
+_bound: ContextVar[tuple[AsyncSession, str] | None] = ContextVar(
+    "io_guard_bound", default=None
+)
+
+
+class TransactionOpenDuringIOError(RuntimeError):
+    """Network I/O was awaited while the session held uncommitted writes."""
+
+
+@contextmanager
+def bind_session(session: AsyncSession, owner: str):
+    """Watch ``session`` for network I/O awaited by ``owner`` in this context."""
+    token = _bound.set((session, owner))
+    try:
+        yield session
+    finally:
+        _bound.reset(token)
+
+
+@event.listens_for(Session, "after_begin")
+def _mark_connection(session: Session, transaction, connection) -> None:
+    session.info[_HOLDS_CONNECTION] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_write(state: ORMExecuteState) -> None:
+    # Locking reads count as writes: ending the transaction releases the lock.
+    if not state.is_select or state.statement._for_update_arg is not None:
+        state.session.info[_WROTE] = True
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_flush(session: Session, flush_context) -> None:
+    session.info[_WROTE] = True
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _clear_marks(session: Session, transaction: SessionTransaction) -> None:
+    if transaction.parent is None:
+        session.info.pop(_HOLDS_CONNECTION, None)
+        session.info.pop(_WROTE, None)
+
+
+def _has_writes(session: AsyncSession) -> bool:
+    return bool(
+        session.info.get(_WROTE) or session.new or session.dirty or session.deleted
+    )
+
+
+async def before_network_io(target: str) -> None:
+    """Release or flag the bound session's connection before calling ``target``."""
+    bound = _bound.get()
+    if bound is None or settings.db_io_guard == "off":
+        return
+    session, owner = bound
+    if not session.info.get(_HOLDS_CONNECTION):
+        return
+    if not _has_writes(session):
+        # Cleared before the await so concurrent calls do not commit twice.
+        session.info.pop(_HOLDS_CONNECTION, None)
+        await session.commit()
+        return
+    if settings.db_io_guard == "raise":
+        raise TransactionOpenDuringIOError(
+            f"{owner} calls {target} inside an open transaction"
+        )
+    logger.warning(
+        "Network I/O inside an open transaction",
+        extra={"handler": owner, "target": target},
+    )
@@ -1,16 +1,19 @@
-from datetime import datetime, timezone
+from datetime import date, datetime, timezone
 from typing import Optional
 
 from sqlalchemy import (
     BigInteger,
     Boolean,
+    Date,
     DateTime,
     Enum,
     ForeignKey,
+    Index,
     Integer,
     String,
     Text,
     UniqueConstraint,
+    text,
 )
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
@@ -34,6 +37,9 @@ class User(Base):
     access_exempt: Mapped[bool] = mapped_column(
         Boolean, default=False, server_default="false"
     )
+    # Bumped by every payment or access decision; checkout compares and sets
+    # it instead of holding the row lock across provider calls.
+    version: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), default=utcnow
     )
@@ -44,6 +50,11 @@ class User(Base):
     memberships: Mapped[list["Membership"]] = relationship(back_populates="user")
     payments: Mapped[list["Payment"]] = relationship(back_populates="user")
 
+    __table_args__ = (
+        # Admin search matches usernames case-insensitively.
+        Index("ix_users_username_lower", text("lower(username)")),
+    )
+
 
 class Flow(Base):
     __tablename__ = "flows"
@@ -111,6 +122,9 @@ class Membership(Base):
         DateTime(timezone=True), default=utcnow, onupdate=utcnow
     )
 
+    # ORM updates are compare-and-set on this column; bulk updates bump it.
+    version: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+
     user: Mapped["User"] = relationship(back_populates="memberships")
     flow: Mapped["Flow"] = relationship(back_populates="memberships")
     last_payment: Mapped[Optional["Payment"]] = relationship(
@@ -119,7 +133,20 @@ class Membership(Base):
 
     __table_args__ = (
         UniqueConstraint("user_id", "flow_id", name="uq_memberships_user_flow"),
+        Index("ix_memberships_status_grace_end", "status", "grace_end_at"),
+        Index(
+            "ix_memberships_user_status_access_end",
+            "user_id",
+            "status",
+            "access_end_at",
+        ),
+        Index(
+            "ix_memberships_active_pay_later_deadline",
+            "pay_later_deadline_at",
+            postgresql_where=text("status = 'active'"),
+        ),
     )
+    __mapper_args__ = {"version_id_col": version}
 
 
 class PaymentStatus(str):
@@ -167,10 +194,27 @@ class Payment(Base):
     expires_at: Mapped[Optional[datetime]] = mapped_column(
         DateTime(timezone=True), nullable=True
     )
+    # Last state seen at YooKassa, so a repeated checkout can be rendered
+    # without asking the provider again.
+    confirmation_url: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    remote_status: Mapped[Optional[str]] = mapped_column(String(32), nullable=True)
+    remote_checked_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
 
     user: Mapped["User"] = relationship(back_populates="payments")
     flow: Mapped[Optional["Flow"]] = relationship(back_populates="payments")
 
+    __table_args__ = (
+        # Pending payments are a small, hot slice walked in id order.
+        Index(
+            "ix_payments_pending",
+            "id",
+            postgresql_where=text("status = 'pending'"),
+        ),
+        Index("ix_payments_user_status_flow", "user_id", "status", "flow_id"),
+    )
+
 
 class PromoCode(Base):
     __tablename__ = "promo_codes"
@@ -238,3 +282,263 @@ class AuditLog(Base):
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), default=utcnow
     )
+
+    __table_args__ = (
+        Index("ix_audit_log_created_at", "created_at"),
+        # Dedupe checks look actions up by their payload key.
+        Index("ix_audit_log_action_key", "action", text("(payload ->> 'key')")),
+    )
+
+
+class JobRunStatus(str):
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class JobRun(Base):
+    __tablename__ = "scheduler_job_runs"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    job_id: Mapped[str] = mapped_column(String(64), index=True)
+    status: Mapped[str] = mapped_column(
+        Enum(
+            JobRunStatus.RUNNING,
+            JobRunStatus.SUCCEEDED,
+            JobRunStatus.FAILED,
+            name="job_run_status",
+        ),
+        default=JobRunStatus.RUNNING,
+    )
+    started_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=utcnow
+    )
+    finished_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+
+
+class AccessOperationKind(str):
+    BAN = "ban"
+    GRANT = "grant"
+
+
+class AccessOperationStatus(str):
+    PENDING = "pending"
+    DONE = "done"
+    CANCELED = "canceled"
+    FAILED = "failed"
+
+
+class AccessOperation(Base):
+    __tablename__ = "access_operations"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
+    chat_id: Mapped[int] = mapped_column(BigInteger)
+    kind: Mapped[str] = mapped_column(
+        Enum(
+            AccessOperationKind.BAN,
+            AccessOperationKind.GRANT,
+            name="access_operation_kind",
+        )
+    )
+    status: Mapped[str] = mapped_column(
+        Enum(
+            AccessOperationStatus.PENDING,
+            AccessOperationStatus.DONE,
+            AccessOperationStatus.CANCELED,
+            AccessOperationStatus.FAILED,
+            name="access_operation_status",
+        ),
+        default=AccessOperationStatus.PENDING,
+    )
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=utcnow
+    )
+    last_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=utcnow
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=utcnow, onupdate=utcnow
+    )
+
+    __table_args__ = (
+        # One row per chat: a newer operation replaces the pending one.
+        UniqueConstraint("user_id", "chat_id", name="uq_access_operations_user_chat"),
+        Index("ix_access_operations_due", "status", "next_attempt_at"),
+    )
+
+
+class MailingEventStatus(str):
+    PLANNED = "planned"
+    SENT = "sent"
+    # Never started and past the catch-up window; kept for the audit trail.
+    EXPIRED = "expired"
+
+
+class MailingEvent(Base):
+    __tablename__ = "mailing_events"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    flow_id: Mapped[int] = mapped_column(ForeignKey("flows.id"), index=True)
+    send_on: Mapped[date] = mapped_column(Date, index=True)
+    template_key: Mapped[str] = mapped_column(String(128))
+    audience: Mapped[str] = mapped_column(String(32))
+    status: Mapped[str] = mapped_column(
+        Enum(
+            MailingEventStatus.PLANNED,
+            MailingEventStatus.SENT,
+            MailingEventStatus.EXPIRED,
+            name="mailing_event_status",
+        ),
+        default=MailingEventStatus.PLANNED,
+    )
+    recipients: Mapped[Optional[list]] = mapped_column(JSONB, nullable=True)
+    # Index of the next recipient; lets a long mailing resume on the next tick.
+    cursor: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    sent_count: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    sent_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=utcnow
+    )
+
+    flow: Mapped["Flow"] = relationship()
+
+    __table_args__ = (
+        UniqueConstraint(
+            "flow_id", "template_key", "audience", name="uq_mailing_events_flow_kind"
+        ),
+    )
+
+
+class WebhookEventStatus(str):
+    PENDING = "pending"
+    PROCESSED = "processed"
+    FAILED = "failed"
+
+
+class WebhookEvent(Base):
+    __tablename__ = "webhook_inbox"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    event: Mapped[str] = mapped_column(String(64))
+    payment_id: Mapped[str] = mapped_column(String(128))
+    payload: Mapped[dict] = mapped_column(JSONB, default=dict)
+    # Delivered from a YooKassa address, so the payload itself can be trusted.
+    sender_verified: Mapped[bool] = mapped_column(Boolean, default=False)
+    status: Mapped[str] = mapped_column(
+        Enum(
+            WebhookEventStatus.PENDING,
+            WebhookEventStatus.PROCESSED,
+            WebhookEventStatus.FAILED,
+            name="webhook_event_status",
+        ),
+        default=WebhookEventStatus.PENDING,
+    )
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=utcnow
+    )
+    last_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    received_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=utcnow
+    )
+    processed_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+
+    __table_args__ = (
+        # Redelivered notifications are dropped by the insert.
+        UniqueConstraint("event", "payment_id", name="uq_webhook_inbox_event_payment"),
+        Index("ix_webhook_inbox_due", "status", "next_attempt_at"),
+    )
+
+
+class OutboxStatus(str):
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"
+
+
+class OutboxKind(str):
+    # Grant Telegram access for a confirmed payment and send the links.
+    PAID_ACCESS = "paid_access"
+    # Send one payment status template.
+    PAYMENT_NOTICE = "payment_notice"
+
+
+class OutboxMessage(Base):
+    """A Telegram side effect written in the transaction that caused it."""
+
+    __tablename__ = "outbox"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
+    kind: Mapped[str] = mapped_column(String(32))
+    payload: Mapped[dict] = mapped_column(JSONB, default=dict)
+    dedupe_key: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    status: Mapped[str] = mapped_column(
+        Enum(
+            OutboxStatus.PENDING,
+            OutboxStatus.SENT,
+            OutboxStatus.FAILED,
+            name="outbox_status",
+        ),
+        default=OutboxStatus.PENDING,
+    )
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=utcnow
+    )
+    last_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=utcnow
+    )
+    sent_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+
+    __table_args__ = (
+        UniqueConstraint("dedupe_key", name="uq_outbox_dedupe_key"),
+        Index(
+            "ix_outbox_pending_due",
+            "next_attempt_at",
+            postgresql_where=text("status = 'pending'"),
+        ),
+        # Serves the "no earlier pending message for this user" check.
+        Index(
+            "ix_outbox_pending_user",
+            "user_id",
+            "id",
+            postgresql_where=text("status = 'pending'"),
+        ),
+    )
+
+
+class InviteLink(Base):
+    """The current invite link issued to a user for one chat."""
+
+    __tablename__ = "invite_links"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
+    chat_id: Mapped[int] = mapped_column(BigInteger)
+    invite_link: Mapped[str] = mapped_column(String(255))
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    revoked_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=utcnow
+    )
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "chat_id", name="uq_invite_links_user_chat"),
+        Index("ix_invite_links_expires_at", "expires_at"),
+    )
@@ -0,0 +1,72 @@
+import logging
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+logger = logging.getLogger(__name__)
+
+
+class PoolMetrics:
+    """Counters for connection checkouts, shown in /api/healthz."""
+
+    def __init__(self) -> None:
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.overflow_peak = 0
+
+    def record_checkout(self, waited: float, overflow: int) -> None:
+        self.checkouts += 1
+        self.wait_seconds_total += waited
+        self.wait_seconds_max = max(self.wait_seconds_max, waited)
+        self.overflow_peak = max(self.overflow_peak, overflow)
+
+    def record_timeout(self) -> None:
+        self.timeouts += 1
+
+    def snapshot(self, pool: AsyncAdaptedQueuePool) -> dict:
+        average = self.wait_seconds_total / self.checkouts if self.checkouts else 0.0
+        return {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "idle": pool.checkedin(),
+            # Negative while the pool has not opened pool_size connections yet.
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": pool._max_overflow,
+            "overflow_peak": self.overflow_peak,
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_ms_avg": round(average * 1000, 1),
+            "wait_ms_max": round(self.wait_seconds_max * 1000, 1),
+        }
+
+
+pool_metrics = PoolMetrics()
+
+
+class MeteredPool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long callers wait for a connection.
+
+    The wait includes opening a new connection when the pool grows.
+    """
+
+    def connect(self):
+        started = time.monotonic()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            pool_metrics.record_timeout()
+            logger.warning(
+                "Database pool exhausted",
+                extra={
+                    "checked_out": self.checkedout(),
+                    "waited_seconds": round(time.monotonic() - started, 3),
+                },
+            )
+            raise
+        pool_metrics.record_checkout(
+            time.monotonic() - started, max(self.overflow(), 0)
+        )
+        return connection
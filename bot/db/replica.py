@@ -0,0 +1,143 @@
+"""Route read-only screens to an optional streaming replica.
+
+Payments, locks and idempotency checks always use AsyncSessionLocal. Screens
+that only read can open ``read_only_session()`` or be registered with
+``flags={"read_only": True}``. They get the replica while it answers and
+lags less than REPLICA_MAX_LAG_SECONDS, and the primary otherwise. Both are
+opened as read-only transactions, so a write on such a session fails on
+either server.
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+
+from bot.db.io_guard import bind_session
+from bot.db.session import engine
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# How long a replica health verdict is reused before the next probe.
+CHECK_INTERVAL_SECONDS = 5.0
+PROBE_TIMEOUT_SECONDS = 2.0
+
+# Caught up when everything received has been replayed; the replay timestamp
+# alone grows on an idle primary. A server not in recovery (a plain second
+# database standing in for tests) has no lag.
+LAG_SQL = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(
+            EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0
+        )
+    END
+    """
+)
+
+
+def _read_only_maker(target: AsyncEngine) -> async_sessionmaker[AsyncSession]:
+    return async_sessionmaker(
+        target.execution_options(postgresql_readonly=True), expire_on_commit=False
+    )
+
+
+class ReplicaRouter:
+    def __init__(
+        self,
+        replica: AsyncEngine | None,
+        primary: AsyncEngine,
+        max_lag_seconds: float,
+    ) -> None:
+        self._replica = replica
+        self._max_lag = max_lag_seconds
+        self._replica_sessions = _read_only_maker(replica) if replica else None
+        self.primary_sessions = _read_only_maker(primary)
+        self._healthy = False
+        self._checked_at: float | None = None
+        self._lock = asyncio.Lock()
+
+    async def _replica_lag(self) -> float:
+        async with self._replica.connect() as conn:
+            return float(await conn.scalar(LAG_SQL))
+
+    async def _probe(self) -> bool:
+        try:
+            lag = await asyncio.wait_for(self._replica_lag(), PROBE_TIMEOUT_SECONDS)
+        except Exception:
+            logger.warning("Read replica is unavailable", exc_info=True)
+            return False
+        if lag > self._max_lag:
+            logger.warning("Read replica lags behind", extra={"lag_seconds": lag})
+            return False
+        return True
+
+    async def replica_usable(self) -> bool:
+        if self._replica is None:
+            return False
+        async with self._lock:
+            now = time.monotonic()
+            if (
+                self._checked_at is None
+                or now - self._checked_at >= CHECK_INTERVAL_SECONDS
+            ):
+                self._healthy = await self._probe()
+                self._checked_at = time.monotonic()
+            return self._healthy
+
+    def mark_down(self) -> None:
+        """Send reads to the primary until the next probe."""
+        self._healthy = False
+        self._checked_at = time.monotonic()
+
+    async def sessionmaker(self) -> async_sessionmaker[AsyncSession]:
+        if await self.replica_usable():
+            return self._replica_sessions
+        return self.primary_sessions
+
+    def is_replica(self, maker: async_sessionmaker[AsyncSession]) -> bool:
+        return maker is self._replica_sessions
+
+
+def _create_replica_engine() -> AsyncEngine | None:
+    if not settings.database_replica_url:
+        return None
+    return create_async_engine(
+        settings.database_replica_url,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+    )
+
+
+replica_router = ReplicaRouter(
+    _create_replica_engine(), engine, settings.replica_max_lag_seconds
+)
+
+
+@asynccontextmanager
+async def read_only_session(owner: str):
+    """Read-only session on the replica when it is usable, else the primary."""
+    maker = await replica_router.sessionmaker()
+    async with maker() as session:
+        with bind_session(session, owner):
+            try:
+                yield session
+            except (DBAPIError, OSError):
+                if replica_router.is_replica(maker):
+                    replica_router.mark_down()
+                raise
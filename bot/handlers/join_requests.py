@@ -7,6 +7,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from bot.repositories.users import get_user_by_tg_id
 from bot.services.entitlements import has_valid_access
+from bot.services.invite_links import revoke_user_invite_links
 from config import settings
 
 router = Router()
@@ -50,3 +51,9 @@ async def approve_join_request(
         )
     except TelegramAPIError:
         logger.exception("Failed to approve join request")
+        return
+    # The link has done its job; a later grant issues a fresh one.
+    await revoke_user_invite_links(
+        session, join_request.bot, user.id, [join_request.chat.id]
+    )
+    await session.commit()
@@ -5,6 +5,7 @@ from aiogram.filters import Command
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from bot.db.replica import read_only_session
 from bot.repositories import memberships as membership_repo
 from bot.repositories.users import get_or_create_user, lock_user_by_id
 from bot.services.memberships import apply_pay_later, evaluate_pay_later
@@ -42,7 +43,15 @@ async def _status_content(
         is_admin=tg_user.id in settings.admin_tg_ids,
     )
     await session.commit()
-    membership = await membership_repo.get_active_membership(session, user_id=user.id)
+    # Only the user row needs the primary; the rest is display.
+    async with read_only_session("status") as reader:
+        return await _membership_status(reader, user.id, now)
+
+
+async def _membership_status(
+    session: AsyncSession, user_id: int, now: datetime
+) -> tuple[str, InlineKeyboardMarkup]:
+    membership = await membership_repo.get_active_membership(session, user_id=user_id)
     text = (
         "👤 Мой доступ\n\n"
         "Сейчас активного участия нет.\n"
@@ -64,7 +73,7 @@ async def _status_content(
                 f"{format_local_date(membership.grace_end_at)}"
             )
 
-        pay_later = await evaluate_pay_later(session, user.id, now)
+        pay_later = await evaluate_pay_later(session, user_id, now)
         if pay_later.eligible:
             keyboard = _pay_later_keyboard()
             text += "\n\nМожно оформить отсрочку оплаты."
@@ -110,15 +119,19 @@ async def pay_later_handler(
     await session.commit()
     user = await lock_user_by_id(session, user.id)
     if user is None:
+        await session.rollback()
         await callback.answer("Пользователь не найден", show_alert=True)
         return
     membership = await membership_repo.get_active_membership(session, user_id=user.id)
     if not membership:
+        await session.rollback()
         await callback.answer("Нет активной подписки", show_alert=True)
         return
 
     ok, text = await apply_pay_later(session, user_id=user.id, now=now)
     if not ok:
+        # Release the user lock before answering.
+        await session.rollback()
         await callback.answer(text, show_alert=True)
         return
     await session.commit()
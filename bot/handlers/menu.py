@@ -9,22 +9,29 @@ from aiogram.fsm.state import State, StatesGroup
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from bot.access_control.service import grant_access
 from bot.db.models import (
     Flow,
     Membership,
     MembershipStatus,
     Payment,
     PaymentStatus,
-    User,
 )
 from bot.payments.verification import validate_remote_payment
-from bot.payments.yookassa_adapter import YooKassaAdapter
+from bot.payments.yookassa_adapter import is_rejected_request, yookassa_adapter
 from bot.repositories import flows as flow_repo
 from bot.repositories import memberships as membership_repo
+from bot.repositories import payments as payment_repo
 from bot.repositories import promos as promo_repo
-from bot.repositories.users import get_or_create_user, lock_user_by_id
+from bot.repositories.users import (
+    advance_user_version,
+    get_or_create_user,
+    get_user_version,
+    lock_user_by_id,
+)
+from bot.scheduler.deadlines import schedule_membership_deadline
+from bot.services.access_operations import grant_access_or_enqueue
 from bot.services.flows import get_next_paid_flow
+from bot.services.invite_links import grant_access_with_links
 from bot.services.memberships import (
     PayLaterEligibility,
     compute_grace_end,
@@ -33,6 +40,8 @@ from bot.services.memberships import (
 from bot.services.payments import (
     calculate_price_rub,
     confirm_payment,
+    has_fresh_pending_snapshot,
+    record_remote_snapshot,
     resolve_flow_for_payment,
 )
 from bot.services.promos import is_promo_valid
@@ -55,6 +64,8 @@ from config import settings
 router = Router()
 logger = logging.getLogger(__name__)
 
+CHECKOUT_ATTEMPTS = 3
+
 
 class PromoCodeState(StatesGroup):
     waiting_code = State()
@@ -169,9 +180,10 @@ async def _should_offer_renewal_checkout(
 
 
 async def _send_paid_access_links(
-    session: AsyncSession, responder: ScreenResponder, tg_id: int
+    session: AsyncSession, responder: ScreenResponder, user_id: int, tg_id: int
 ) -> None:
-    links = await grant_access(responder.bot, tg_id)
+    links = await grant_access_with_links(session, responder.bot, user_id, tg_id)
+    await session.commit()
     kb = access_links_kb(links.channel_link, links.group_link)
     if kb is None:
         await responder.answer("Оплата уже подтверждена. Доступ активирован.")
@@ -183,6 +195,36 @@ async def _send_paid_access_links(
     )
 
 
+async def _confirm_and_send_links(
+    session: AsyncSession,
+    responder: ScreenResponder,
+    payment: Payment,
+    tg_id: int,
+    now: datetime,
+) -> None:
+    # Lock and read again: the payment was read without a lock and may have
+    # been confirmed elsewhere since.
+    await lock_user_by_id(session, payment.user_id)
+    payment = await payment_repo.get_payment_by_id(session, payment.id)
+    paid = await confirm_payment(session, payment, paid_at=now, notify_user=False)
+    # Telegram is only called once the user row lock is released.
+    await session.commit()
+    links = None
+    if paid:
+        links = await grant_access_or_enqueue(
+            session, responder.bot, payment.user_id, tg_id
+        )
+        await session.commit()
+    kb = access_links_kb(
+        links.channel_link if links else None,
+        links.group_link if links else None,
+    )
+    text = await get_text(
+        session, "payment_success" if kb else "payment_success_no_links"
+    )
+    await responder.answer(text, reply_markup=kb or back_home_kb())
+
+
 async def _resolve_free_access_flow(
     session: AsyncSession, user_id: int, now: datetime
 ) -> int | None:
@@ -215,6 +257,54 @@ async def _resolve_free_access_flow(
     return None
 
 
+def _refresh_kb() -> types.InlineKeyboardMarkup:
+    return types.InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                types.InlineKeyboardButton(
+                    text="🔄 Проверить оплату",
+                    callback_data="payment:refresh",
+                )
+            ],
+            [
+                types.InlineKeyboardButton(
+                    text="← Главное меню", callback_data="nav:home"
+                )
+            ],
+        ]
+    )
+
+
+def _invoice_kb(url: str) -> types.InlineKeyboardMarkup:
+    return types.InlineKeyboardMarkup(
+        inline_keyboard=[
+            [types.InlineKeyboardButton(text="💳 Перейти к оплате", url=url)],
+            [
+                types.InlineKeyboardButton(
+                    text="🔄 Проверить оплату",
+                    callback_data="payment:refresh",
+                )
+            ],
+            [
+                types.InlineKeyboardButton(
+                    text="← Главное меню", callback_data="nav:home"
+                )
+            ],
+        ]
+    )
+
+
+async def _answer_existing_invoice(
+    responder: ScreenResponder, price: int, url: str
+) -> None:
+    await responder.answer(
+        "💳 У вас уже есть активный счёт\n\n"
+        f"Сумма: {format_price_rub(price)} ₽\n"
+        "Если вы уже оплатили, проверка обычно занимает до минуты.",
+        reply_markup=_invoice_kb(url),
+    )
+
+
 async def _send_personal_payment_link(
     session: AsyncSession, tg_user: types.User, responder: ScreenResponder
 ) -> None:
@@ -227,22 +317,55 @@ async def _send_personal_payment_link(
         last_name=tg_user.last_name,
         is_admin=tg_user.id in settings.admin_tg_ids,
     )
-    await session.flush()
-    # Serialize payment decisions per user. Rapid double taps must not create
-    # two YooKassa orders before either request sees the other's PENDING row.
-    await session.execute(select(User.id).where(User.id == user.id).with_for_update())
+    await session.commit()
+    user_id = user.id
+
+    # Decisions are made on an unlocked read and claimed with a compare-and-set
+    # on the user's version; no row lock is held across YooKassa calls. Rapid
+    # double taps lose the race, read again and find the first tap's invoice.
+    for attempt in range(CHECKOUT_ATTEMPTS):
+        if await _checkout_attempt(
+            session, user_id, tg_user.id, responder, now, first=attempt == 0
+        ):
+            return
+        await session.rollback()
+        logger.info(
+            "Checkout state changed, deciding again",
+            extra={"user_id": user_id, "attempt": attempt + 1},
+        )
+    await responder.answer(
+        "Сейчас обрабатывается другой запрос по вашей оплате. "
+        "Повторите через несколько секунд.",
+        reply_markup=back_home_kb(),
+    )
+
+
+async def _checkout_attempt(
+    session: AsyncSession,
+    user_id: int,
+    tg_id: int,
+    responder: ScreenResponder,
+    now: datetime,
+    *,
+    first: bool,
+) -> bool:
+    """Run one checkout decision; return False when it must be made again."""
+    version = await get_user_version(session, user_id)
+    if version is None:
+        return True
 
     # Оплата за текущий ещё действующий поток: обычно только повторяем ссылки.
     # Если открыт следующий поток и за него не платили, выставляем продление.
-    if await _find_paid_payment_with_active_flow(session, user.id, now) is not None:
-        if not await _should_offer_renewal_checkout(session, user.id, now):
+    if await _find_paid_payment_with_active_flow(session, user_id, now) is not None:
+        if not await _should_offer_renewal_checkout(session, user_id, now):
             await session.commit()
-            await _send_paid_access_links(session, responder, tg_user.id)
-            return
+            await _send_paid_access_links(session, responder, user_id, tg_id)
+            return True
 
-    latest_membership = await membership_repo.get_latest_membership(session, user.id)
+    latest_membership = await membership_repo.get_latest_membership(session, user_id)
     if (
-        latest_membership is not None
+        first
+        and latest_membership is not None
         and latest_membership.status != MembershipStatus.ACTIVE
     ):
         last_flow = await flow_repo.get_flow_by_id(session, latest_membership.flow_id)
@@ -256,14 +379,17 @@ async def _send_personal_payment_link(
                 "Сейчас доступ можно получить только после оплаты полной стоимости."
             )
 
-    price = await calculate_price_rub(session, user_id=user.id, paid_at=now)
+    price = await calculate_price_rub(session, user_id=user_id, paid_at=now)
     if price <= 0:
-        flow_id = await _resolve_free_access_flow(session, user.id, now)
+        flow_id = await _resolve_free_access_flow(session, user_id, now)
         if flow_id is None:
+            await session.commit()
             await responder.answer(await get_text(session, "payment_needs_review"))
-            return
+            return True
+        if not await advance_user_version(session, user_id, version):
+            return False
         payment = Payment(
-            user_id=user.id,
+            user_id=user_id,
             provider="promo",
             status=PaymentStatus.PENDING,
             amount_rub=0,
@@ -272,190 +398,185 @@ async def _send_personal_payment_link(
         )
         session.add(payment)
         await session.flush()
-        links = await confirm_payment(
-            session, responder.bot, payment, paid_at=now, notify_user=False
-        )
-        await session.commit()
-        kb = access_links_kb(
-            links.channel_link if links else None,
-            links.group_link if links else None,
-        )
-        text = await get_text(
-            session, "payment_success" if kb else "payment_success_no_links"
-        )
-        await responder.answer(text, reply_markup=kb or back_home_kb())
-        return
+        await _confirm_and_send_links(session, responder, payment, tg_id, now)
+        return True
 
     existing_pending = (
         await session.execute(
             select(Payment)
-            .where(Payment.user_id == user.id)
+            .where(Payment.user_id == user_id)
             .where(Payment.status == PaymentStatus.PENDING)
-            .where(Payment.external_id.is_not(None))
+            .where(Payment.provider == "yookassa")
             .where(Payment.amount_rub == price)
             .order_by(Payment.created_at.desc())
-            .with_for_update()
             .limit(1)
         )
     ).scalar_one_or_none()
-    if existing_pending is not None:
-        adapter = YooKassaAdapter()
-        try:
-            remote = await adapter.get_payment(existing_pending.external_id)
-            if _payment_validation_error(remote, existing_pending):
-                await responder.answer(
-                    "Не удалось безопасно подтвердить принадлежность счёта. "
-                    "Создаю новый платёж."
-                )
-                existing_pending.status = PaymentStatus.FAILED
-                await session.flush()
-            else:
-                remote_status = remote.get("status")
-                if remote_status == "succeeded":
-                    links = await confirm_payment(
-                        session,
-                        responder.bot,
-                        existing_pending,
-                        paid_at=now,
-                        notify_user=False,
-                    )
-                    await session.commit()
-                    kb = access_links_kb(
-                        links.channel_link if links else None,
-                        links.group_link if links else None,
-                    )
-                    text = await get_text(
-                        session,
-                        "payment_success" if kb else "payment_success_no_links",
-                    )
-                    await responder.answer(text, reply_markup=kb or back_home_kb())
-                    return
-                if remote_status in ("canceled", "expired"):
-                    existing_pending.status = PaymentStatus.FAILED
-                    await session.flush()
-                elif remote_status == "pending":
-                    conf = remote.get("confirmation", {})
-                    url = conf.get("confirmation_url")
-                    if url:
-                        keyboard = types.InlineKeyboardMarkup(
-                            inline_keyboard=[
-                                [
-                                    types.InlineKeyboardButton(
-                                        text="💳 Перейти к оплате", url=url
-                                    )
-                                ],
-                                [
-                                    types.InlineKeyboardButton(
-                                        text="🔄 Проверить оплату",
-                                        callback_data="payment:refresh",
-                                    )
-                                ],
-                                [
-                                    types.InlineKeyboardButton(
-                                        text="← Главное меню", callback_data="nav:home"
-                                    )
-                                ],
-                            ]
-                        )
-                        await responder.answer(
-                            "💳 У вас уже есть активный счёт\n\n"
-                            f"Сумма: {format_price_rub(price)} ₽\n"
-                            "Если вы уже оплатили, проверка обычно занимает до минуты.",
-                            reply_markup=keyboard,
-                        )
-                        return
-                    await responder.answer(
-                        "Платёжный сервис не вернул ссылку на действующий счёт. "
-                        "Не создавайте повторную оплату и попробуйте позже.",
-                        reply_markup=back_home_kb(),
-                    )
-                    return
-                else:
-                    await responder.answer(
-                        "Платёжный сервис вернул неизвестный статус. "
-                        "Не создавайте повторную оплату и попробуйте позже.",
-                        reply_markup=back_home_kb(),
-                    )
-                    return
-        except Exception:
-            await session.rollback()
-            logger.exception("Failed to reuse existing YooKassa payment")
+    if existing_pending is None:
+        target_flow_id = await resolve_flow_for_payment(session, now)
+        if target_flow_id is None:
+            await session.commit()
             await responder.answer(
-                "Не удалось связаться с платёжным сервисом. Существующий счёт "
-                "не изменён — попробуйте снова через минуту.",
+                "Сейчас набор закрыт, поэтому новый счёт не создаётся. "
+                "Дата следующего набора появится в расписании.",
                 reply_markup=back_home_kb(),
             )
-            return
+            return True
+        if not await advance_user_version(session, user_id, version):
+            return False
+        payment = Payment(
+            user_id=user_id,
+            provider="yookassa",
+            status=PaymentStatus.PENDING,
+            amount_rub=price,
+            currency="RUB",
+            flow_id=target_flow_id,
+            expires_at=now + timedelta(hours=1),
+        )
+        session.add(payment)
+        await session.flush()
+        payment_id = payment.id
+        await session.commit()
+        return await _create_remote_invoice(
+            session, responder, payment_id, user_id, price
+        )
+    if existing_pending.external_id is None:
+        # Another tap is creating this invoice, or its create call failed: the
+        # same idempotence key returns the same YooKassa payment.
+        payment_id = existing_pending.id
+        await session.commit()
+        return await _create_remote_invoice(
+            session, responder, payment_id, user_id, price
+        )
+    if has_fresh_pending_snapshot(existing_pending, now):
+        # Checked moments ago: repeated taps render from the stored snapshot.
+        await session.commit()
+        await _answer_existing_invoice(
+            responder, price, existing_pending.confirmation_url
+        )
+        return True
 
-    target_flow_id = await resolve_flow_for_payment(session, now)
-    if target_flow_id is None:
+    payment_id = existing_pending.id
+    external_id = existing_pending.external_id
+    await session.commit()
+    try:
+        remote = await yookassa_adapter.get_payment(external_id)
+    except Exception:
+        logger.exception("Failed to reuse existing YooKassa payment")
         await responder.answer(
-            "Сейчас набор закрыт, поэтому новый счёт не создаётся. "
-            "Дата следующего набора появится в расписании.",
+            "Не удалось связаться с платёжным сервисом. Существующий счёт "
+            "не изменён — попробуйте снова через минуту.",
             reply_markup=back_home_kb(),
         )
-        return
+        return True
 
-    payment = Payment(
-        user_id=user.id,
-        provider="yookassa",
-        status=PaymentStatus.PENDING,
-        amount_rub=price,
-        currency="RUB",
-        flow_id=target_flow_id,
-        expires_at=now + timedelta(hours=1),
+    payment = await payment_repo.get_payment_by_id(session, payment_id)
+    if payment is None or payment.status != PaymentStatus.PENDING:
+        # Settled by a webhook or a job while we were asking.
+        return False
+    if _payment_validation_error(remote, payment):
+        if not await payment_repo.transition_pending_payment(
+            session, payment_id, PaymentStatus.FAILED
+        ):
+            return False
+        await session.commit()
+        await responder.answer(
+            "Не удалось безопасно подтвердить принадлежность счёта. "
+            "Создаю новый платёж."
+        )
+        return False
+    record_remote_snapshot(payment, remote, now)
+    remote_status = remote.get("status")
+    if remote_status == "succeeded":
+        await _confirm_and_send_links(session, responder, payment, tg_id, now)
+        return True
+    if remote_status in ("canceled", "expired"):
+        if not await payment_repo.transition_pending_payment(
+            session, payment_id, PaymentStatus.FAILED
+        ):
+            return False
+        await session.commit()
+        # The old invoice is closed: the next decision creates a new one.
+        return False
+    url = payment.confirmation_url
+    await session.commit()
+    if remote_status == "pending":
+        if url:
+            await _answer_existing_invoice(responder, price, url)
+            return True
+        await responder.answer(
+            "Платёжный сервис не вернул ссылку на действующий счёт. "
+            "Не создавайте повторную оплату и попробуйте позже.",
+            reply_markup=back_home_kb(),
+        )
+        return True
+    await responder.answer(
+        "Платёжный сервис вернул неизвестный статус. "
+        "Не создавайте повторную оплату и попробуйте позже.",
+        reply_markup=back_home_kb(),
     )
-    session.add(payment)
-    await session.flush()
+    return True
+
 
-    adapter = YooKassaAdapter()
+async def _create_remote_invoice(
+    session: AsyncSession,
+    responder: ScreenResponder,
+    payment_id: int,
+    user_id: int,
+    price: int,
+) -> bool:
+    """Create the YooKassa payment for a committed local one, outside any lock."""
     description = "Оплата участия в Клубе Пробуждение"
     try:
-        payment_id, confirmation_url = await adapter.create_payment(
+        external_id, confirmation_url = await yookassa_adapter.create_payment(
             amount_rub=price,
             description=description,
-            metadata={"user_id": user.id, "internal_payment_id": payment.id},
-            internal_payment_id=payment.id,
+            metadata={"user_id": user_id, "internal_payment_id": payment_id},
+            internal_payment_id=payment_id,
         )
-        payment.external_id = payment_id
-        await session.commit()
-    except Exception:
-        await session.rollback()
+    except Exception as exc:
         logger.exception("Failed to create YooKassa payment")
+        if is_rejected_request(exc):
+            # The refusal is cached under this idempotence key: close the
+            # payment so the next tap starts a new one.
+            await payment_repo.transition_pending_payment(
+                session, payment_id, PaymentStatus.FAILED
+            )
+            await session.commit()
+            await responder.answer(
+                "Платёжный сервис отклонил создание счёта. Списания не будет — "
+                "попробуйте снова или напишите в поддержку.",
+                reply_markup=back_home_kb(),
+            )
+            return True
+        # The local payment stays pending without an external id; the next tap
+        # repeats the call with the same idempotence key, and the payments job
+        # fails it once it expires.
         await responder.answer(
             "Платёжный сервис временно недоступен. Счёт не создан и списания "
             "не будет — попробуйте снова позже.",
             reply_markup=back_home_kb(),
         )
-        return
-
-    keyboard = types.InlineKeyboardMarkup(
-        inline_keyboard=[
-            [
-                types.InlineKeyboardButton(
-                    text="💳 Перейти к оплате", url=confirmation_url
-                )
-            ],
-            [
-                types.InlineKeyboardButton(
-                    text="🔄 Проверить оплату",
-                    callback_data="payment:refresh",
-                )
-            ],
-            [
-                types.InlineKeyboardButton(
-                    text="← Главное меню", callback_data="nav:home"
-                )
-            ],
-        ]
+        return True
+    attached = await payment_repo.attach_external_payment(
+        session,
+        payment_id,
+        external_id,
+        confirmation_url,
+        datetime.now(timezone.utc),
     )
+    await session.commit()
+    if not attached:
+        return False
+
     await responder.answer(
         "💳 Счёт готов\n\n"
         f"Ваша стоимость: {format_price_rub(price)} ₽\n"
         "После оплаты доступ появится автоматически. Если банк задержит статус, "
         "используйте кнопку проверки.",
-        reply_markup=keyboard,
+        reply_markup=_invoice_kb(confirmation_url),
     )
+    return True
 
 
 @router.message(lambda m: m.text == "💳 Моя оплата")
@@ -738,14 +859,6 @@ async def payment_refresh_handler(
         is_admin=callback.from_user.id in settings.admin_tg_ids,
     )
     await session.commit()
-    user = await lock_user_by_id(session, user.id)
-    if user is None:
-        await responder.answer(
-            "Профиль не найден. Вернитесь в главное меню и повторите попытку.",
-            reply_markup=back_home_kb(),
-        )
-        await callback.answer()
-        return
 
     pending_payment = (
         await session.execute(
@@ -771,6 +884,7 @@ async def payment_refresh_handler(
             await _send_paid_access_links(
                 session,
                 ScreenResponder(callback.message, edit_existing=True),
+                user.id,
                 callback.from_user.id,
             )
             await callback.answer("Оплата уже подтверждена")
@@ -783,13 +897,17 @@ async def payment_refresh_handler(
         await callback.answer()
         return
 
-    adapter = YooKassaAdapter()
+    # The provider is asked outside any transaction; the result is applied
+    # only if the payment is still pending afterwards.
+    payment_id = pending_payment.id
+    external_id = pending_payment.external_id
+    await session.commit()
     try:
-        remote = await adapter.get_payment(pending_payment.external_id)
+        remote = await yookassa_adapter.get_payment(external_id)
     except Exception:
         logger.exception(
             "Failed to refresh YooKassa payment",
-            extra={"payment_id": pending_payment.id},
+            extra={"payment_id": payment_id},
         )
         await responder.answer(
             "Не удалось получить статус от платёжного сервиса. "
@@ -799,9 +917,21 @@ async def payment_refresh_handler(
         await callback.answer()
         return
 
+    pending_payment = await payment_repo.get_payment_by_id(session, payment_id)
+    if pending_payment is None or pending_payment.status != PaymentStatus.PENDING:
+        await session.commit()
+        await responder.answer(
+            "Статус счёта только что изменился. Повторите проверку.",
+            reply_markup=_refresh_kb(),
+        )
+        await callback.answer()
+        return
+
     remote_status = remote.get("status")
     if _payment_validation_error(remote, pending_payment):
-        pending_payment.status = PaymentStatus.FAILED
+        await payment_repo.transition_pending_payment(
+            session, payment_id, PaymentStatus.FAILED
+        )
         await session.commit()
         await responder.answer(
             "Не удалось безопасно сопоставить счёт с вашим профилем. "
@@ -825,27 +955,16 @@ async def payment_refresh_handler(
         return
 
     if remote_status == "succeeded":
-        links = await confirm_payment(
-            session,
-            callback.message.bot,
-            pending_payment,
-            paid_at=now,
-            notify_user=False,
-        )
-        await session.commit()
-        kb = access_links_kb(
-            links.channel_link if links else None,
-            links.group_link if links else None,
+        await _confirm_and_send_links(
+            session, responder, pending_payment, callback.from_user.id, now
         )
-        text = await get_text(
-            session, "payment_success" if kb else "payment_success_no_links"
-        )
-        await responder.answer(text, reply_markup=kb or back_home_kb())
         await callback.answer("Оплата подтверждена")
         return
 
     if remote_status in ("canceled", "expired"):
-        pending_payment.status = PaymentStatus.FAILED
+        await payment_repo.transition_pending_payment(
+            session, payment_id, PaymentStatus.FAILED
+        )
         await session.commit()
         await responder.answer(
             "Этот счёт отменён платёжным сервисом. Новый счёт создастся только "
@@ -868,30 +987,14 @@ async def payment_refresh_handler(
         await callback.answer()
         return
 
-    conf = remote.get("confirmation", {})
-    url = conf.get("confirmation_url")
+    record_remote_snapshot(pending_payment, remote, now)
+    url = pending_payment.confirmation_url
     if remote_status == "pending" and url:
-        keyboard = types.InlineKeyboardMarkup(
-            inline_keyboard=[
-                [types.InlineKeyboardButton(text="💳 Перейти к оплате", url=url)],
-                [
-                    types.InlineKeyboardButton(
-                        text="🔄 Проверить оплату",
-                        callback_data="payment:refresh",
-                    )
-                ],
-                [
-                    types.InlineKeyboardButton(
-                        text="← Главное меню", callback_data="nav:home"
-                    )
-                ],
-            ]
-        )
         await session.commit()
         await responder.answer(
             "⏳ Оплата пока не подтверждена банком.\n"
             "Если вы уже оплатили, повторите проверку через 30–60 секунд.",
-            reply_markup=keyboard,
+            reply_markup=_invoice_kb(url),
         )
         await callback.answer()
         return
@@ -978,7 +1081,11 @@ async def access_handler(message: types.Message, session: AsyncSession) -> None:
         )
         session.add(membership)
     await session.commit()
-    links = await grant_access(message.bot, message.from_user.id)
+    schedule_membership_deadline(membership)
+    links = await grant_access_with_links(
+        session, message.bot, user.id, message.from_user.id
+    )
+    await session.commit()
     text = await get_text(session, "access_granted_free")
     kb = access_links_kb(links.channel_link, links.group_link)
     if kb is None:
@@ -1099,14 +1206,14 @@ async def _schedule_content(session: AsyncSession) -> str:
         )
 
 
-@router.message(lambda m: m.text == "📅 Расписание")
+@router.message(lambda m: m.text == "📅 Расписание", flags={"read_only": True})
 async def schedule_handler(message: types.Message, session: AsyncSession) -> None:
     await send_clean_screen(
         message, await _schedule_content(session), reply_markup=back_home_kb()
     )
 
 
-@router.callback_query(lambda c: c.data == "nav:schedule")
+@router.callback_query(lambda c: c.data == "nav:schedule", flags={"read_only": True})
 async def schedule_navigation_handler(
     callback: types.CallbackQuery, session: AsyncSession
 ) -> None:
@@ -1,9 +1,15 @@
 from abc import ABC, abstractmethod
+from datetime import datetime
 
 
 class PaymentAdapter(ABC):
     @abstractmethod
-    async def get_payment(self, external_id: str) -> dict:
+    async def get_payment(self, external_id: str, *, fresh: bool = False) -> dict:
+        """Return the provider's payment object.
+
+        ``fresh=True`` bypasses any caching or request sharing in front of the
+        provider.
+        """
         raise NotImplementedError
 
     @abstractmethod
@@ -15,3 +21,16 @@ class PaymentAdapter(ABC):
         internal_payment_id: int,
     ) -> tuple[str, str]:
         raise NotImplementedError
+
+    async def list_payments(
+        self,
+        *,
+        created_since: datetime,
+        status: str | None = None,
+        cursor: str | None = None,
+    ) -> tuple[list[dict], str | None]:
+        """Return one page of provider payments and the next page cursor."""
+        raise NotImplementedError
+
+    async def aclose(self) -> None:
+        return None
@@ -0,0 +1,49 @@
+from datetime import datetime
+
+from bot.payments.adapter import PaymentAdapter
+from bot.utils.circuit_breaker import CircuitBreaker
+
+
+class CircuitBreakerPaymentAdapter(PaymentAdapter):
+    """Refuse provider calls immediately while the provider is known to be down."""
+
+    def __init__(self, inner: PaymentAdapter, breaker: CircuitBreaker) -> None:
+        self._inner = inner
+        self.breaker = breaker
+
+    async def get_payment(self, external_id: str, *, fresh: bool = False) -> dict:
+        return await self.breaker.call(
+            self._inner.get_payment, external_id, fresh=fresh
+        )
+
+    async def create_payment(
+        self,
+        amount_rub: int,
+        description: str,
+        metadata: dict,
+        internal_payment_id: int,
+    ) -> tuple[str, str]:
+        return await self.breaker.call(
+            self._inner.create_payment,
+            amount_rub=amount_rub,
+            description=description,
+            metadata=metadata,
+            internal_payment_id=internal_payment_id,
+        )
+
+    async def list_payments(
+        self,
+        *,
+        created_since: datetime,
+        status: str | None = None,
+        cursor: str | None = None,
+    ) -> tuple[list[dict], str | None]:
+        return await self.breaker.call(
+            self._inner.list_payments,
+            created_since=created_since,
+            status=status,
+            cursor=cursor,
+        )
+
+    async def aclose(self) -> None:
+        await self._inner.aclose()
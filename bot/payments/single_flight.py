@@ -0,0 +1,89 @@
+import asyncio
+import copy
+import time
+from datetime import datetime
+
+from bot.payments.adapter import PaymentAdapter
+
+MAX_CACHED_PAYMENTS = 1024
+
+
+class SingleFlightPaymentAdapter(PaymentAdapter):
+    """Share one in-flight status lookup per payment and cache it briefly.
+
+    Webhook, refresh button, polling job and checkout can ask for the same
+    payment at the same moment; only one request reaches the provider.
+    """
+
+    def __init__(self, inner: PaymentAdapter, ttl_seconds: float) -> None:
+        self._inner = inner
+        self._ttl = ttl_seconds
+        self._in_flight: dict[str, asyncio.Future] = {}
+        self._cache: dict[str, tuple[float, dict]] = {}
+
+    async def get_payment(self, external_id: str, *, fresh: bool = False) -> dict:
+        if not fresh:
+            cached = self._cache.get(external_id)
+            if cached is not None and time.monotonic() - cached[0] < self._ttl:
+                return copy.deepcopy(cached[1])
+            in_flight = self._in_flight.get(external_id)
+            if in_flight is not None:
+                return copy.deepcopy(await asyncio.shield(in_flight))
+
+        task = asyncio.ensure_future(self._fetch(external_id))
+        self._in_flight[external_id] = task
+        task.add_done_callback(lambda done: self._forget(external_id, done))
+        # Shielded so a caller that gives up does not cancel the request the
+        # other callers are waiting for.
+        return copy.deepcopy(await asyncio.shield(task))
+
+    async def _fetch(self, external_id: str) -> dict:
+        started = time.monotonic()
+        result = await self._inner.get_payment(external_id)
+        if len(self._cache) >= MAX_CACHED_PAYMENTS:
+            self._cache = {
+                key: entry
+                for key, entry in self._cache.items()
+                if started - entry[0] < self._ttl
+            }
+        # Age counts from the request start: the provider state may have
+        # changed while it was in flight.
+        self._cache[external_id] = (started, result)
+        return result
+
+    def _forget(self, external_id: str, task: asyncio.Future) -> None:
+        if self._in_flight.get(external_id) is task:
+            del self._in_flight[external_id]
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every caller gave up.
+            task.exception()
+
+    async def list_payments(
+        self,
+        *,
+        created_since: datetime,
+        status: str | None = None,
+        cursor: str | None = None,
+    ) -> tuple[list[dict], str | None]:
+        started = time.monotonic()
+        items, next_cursor = await self._inner.list_payments(
+            created_since=created_since, status=status, cursor=cursor
+        )
+        for item in items:
+            if item.get("id"):
+                self._cache[item["id"]] = (started, item)
+        return items, next_cursor
+
+    async def create_payment(
+        self,
+        amount_rub: int,
+        description: str,
+        metadata: dict,
+        internal_payment_id: int,
+    ) -> tuple[str, str]:
+        return await self._inner.create_payment(
+            amount_rub, description, metadata, internal_payment_id
+        )
+
+    async def aclose(self) -> None:
+        await self._inner.aclose()
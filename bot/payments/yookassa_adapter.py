@@ -1,17 +1,48 @@
+import asyncio
 import base64
 import logging
+import random
+from datetime import datetime, timezone
 from decimal import Decimal
 
 import httpx
 
+from bot.db.io_guard import before_network_io
+from bot.payments.adapter import PaymentAdapter
+from bot.payments.circuit_breaker import CircuitBreakerPaymentAdapter
+from bot.payments.single_flight import SingleFlightPaymentAdapter
+from bot.utils.circuit_breaker import CircuitBreaker
 from config import settings
 
 logger = logging.getLogger(__name__)
 
+CREATE_TIMEOUT = httpx.Timeout(20.0, connect=5.0)
+GET_TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+POOL_LIMITS = httpx.Limits(
+    max_connections=20, max_keepalive_connections=10, keepalive_expiry=60.0
+)
+MAX_ATTEMPTS = 3
+LIST_PAGE_SIZE = 100
+RETRY_BASE_DELAY = 0.3
 
-class YooKassaAdapter:
-    def __init__(self) -> None:
-        self._base_url = "https://api.yookassa.ru/v3"
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class YooKassaAdapter(PaymentAdapter):
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport | None = None,
+        base_url: str | None = None,
+    ) -> None:
+        self._base_url = (base_url or settings.yookassa_api_url).rstrip("/")
+        self._transport = transport
+        self._client: httpx.AsyncClient | None = None
 
     def _auth_header(self) -> str:
         raw = f"{settings.yookassa_shop_id}:{settings.yookassa_secret_key}"
@@ -21,6 +52,51 @@ class YooKassaAdapter:
     def _format_amount(self, amount_rub: int) -> str:
         return f"{Decimal(amount_rub):.2f}"
 
+    def _get_client(self) -> httpx.AsyncClient:
+        # Created lazily so the client binds to the running event loop; kept
+        # open to reuse TCP/TLS connections between calls.
+        if self._client is None or self._client.is_closed:
+            http2 = settings.yookassa_http2 and _http2_available()
+            if settings.yookassa_http2 and not http2:
+                logger.warning("YOOKASSA_HTTP2 is set but h2 is not installed")
+            self._client = httpx.AsyncClient(
+                base_url=self._base_url,
+                limits=POOL_LIMITS,
+                http2=http2,
+                transport=self._transport,
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _request(
+        self, method: str, url: str, *, timeout: httpx.Timeout, **kwargs
+    ) -> httpx.Response:
+        # GETs are naturally idempotent and POSTs carry an Idempotence-Key, so
+        # transport errors and 5xx responses are safe to retry.
+        await before_network_io(f"YooKassa {method} {url}")
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            try:
+                response = await self._get_client().request(
+                    method, url, timeout=timeout, **kwargs
+                )
+                if response.status_code < 500 or attempt == MAX_ATTEMPTS:
+                    response.raise_for_status()
+                    return response
+            except httpx.TransportError:
+                if attempt == MAX_ATTEMPTS:
+                    raise
+            delay = RETRY_BASE_DELAY * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+            logger.warning(
+                "Retrying YooKassa request",
+                extra={"method": method, "url": url, "attempt": attempt},
+            )
+            await asyncio.sleep(delay)
+        raise AssertionError("unreachable")
+
     async def create_payment(
         self,
         amount_rub: int,
@@ -42,21 +118,76 @@ class YooKassaAdapter:
             "description": description,
             "metadata": metadata,
         }
-        async with httpx.AsyncClient(timeout=30) as client:
-            response = await client.post(
-                f"{self._base_url}/payments", headers=headers, json=payload
-            )
-            response.raise_for_status()
-            data = response.json()
+        response = await self._request(
+            "POST", "/payments", timeout=CREATE_TIMEOUT, headers=headers, json=payload
+        )
+        data = response.json()
         payment_id = data["id"]
         confirmation_url = data["confirmation"]["confirmation_url"]
         return payment_id, confirmation_url
 
-    async def get_payment(self, payment_id: str) -> dict:
+    async def get_payment(self, payment_id: str, *, fresh: bool = False) -> dict:
         headers = {"Authorization": self._auth_header()}
-        async with httpx.AsyncClient(timeout=30) as client:
-            response = await client.get(
-                f"{self._base_url}/payments/{payment_id}", headers=headers
-            )
-            response.raise_for_status()
-            return response.json()
+        response = await self._request(
+            "GET", f"/payments/{payment_id}", timeout=GET_TIMEOUT, headers=headers
+        )
+        return response.json()
+
+    async def list_payments(
+        self,
+        *,
+        created_since: datetime,
+        status: str | None = None,
+        cursor: str | None = None,
+    ) -> tuple[list[dict], str | None]:
+        headers = {"Authorization": self._auth_header()}
+        params = {
+            "created_at.gte": created_since.astimezone(timezone.utc).strftime(
+                "%Y-%m-%dT%H:%M:%S.000Z"
+            ),
+            "limit": LIST_PAGE_SIZE,
+        }
+        if status:
+            params["status"] = status
+        if cursor:
+            params["cursor"] = cursor
+        response = await self._request(
+            "GET", "/payments", timeout=GET_TIMEOUT, headers=headers, params=params
+        )
+        data = response.json()
+        return list(data.get("items") or []), data.get("next_cursor")
+
+
+def _is_provider_failure(exc: BaseException) -> bool:
+    # 4xx answers mean YooKassa is up; only outages count against the circuit.
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code >= 500
+    return isinstance(exc, httpx.TransportError)
+
+
+def is_rejected_request(exc: BaseException) -> bool:
+    """True when YooKassa refused the request itself; repeating it cannot help.
+
+    Answers are cached per Idempotence-Key, so a retry with the same key gets
+    the same refusal back.
+    """
+    return (
+        isinstance(exc, httpx.HTTPStatusError)
+        and 400 <= exc.response.status_code < 500
+        and exc.response.status_code != 429
+    )
+
+
+yookassa_breaker = CircuitBreaker(
+    "yookassa",
+    failure_threshold=settings.circuit_failure_threshold,
+    reset_seconds=settings.circuit_reset_seconds,
+    is_failure=_is_provider_failure,
+)
+
+# One adapter per process so every caller shares the connection pool, the
+# circuit breaker and concurrent status lookups of the same payment.
+yookassa_adapter = SingleFlightPaymentAdapter(
+    CircuitBreakerPaymentAdapter(YooKassaAdapter(), yookassa_breaker),
+    ttl_seconds=settings.payment_status_cache_seconds,
+)
@@ -0,0 +1,84 @@
+from collections.abc import Iterable
+from datetime import datetime
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.db.models import AccessOperation, AccessOperationStatus
+
+
+async def enqueue_access_operations(
+    session: AsyncSession,
+    user_id: int,
+    chat_ids: Iterable[int],
+    kind: str,
+    now: datetime,
+) -> None:
+    """Queue one operation per chat, replacing whatever was pending for it."""
+    for chat_id in chat_ids:
+        stmt = insert(AccessOperation).values(
+            user_id=user_id,
+            chat_id=chat_id,
+            kind=kind,
+            status=AccessOperationStatus.PENDING,
+            attempts=0,
+            next_attempt_at=now,
+            created_at=now,
+            updated_at=now,
+        )
+        await session.execute(
+            stmt.on_conflict_do_update(
+                constraint="uq_access_operations_user_chat",
+                set_={
+                    "kind": stmt.excluded.kind,
+                    "status": AccessOperationStatus.PENDING,
+                    "attempts": 0,
+                    "next_attempt_at": now,
+                    "last_error": None,
+                    "updated_at": now,
+                },
+            )
+        )
+
+
+async def claim_due_access_operations(
+    session: AsyncSession, now: datetime, limit: int, lease_until: datetime
+) -> list[AccessOperation]:
+    """Lease due operations until ``lease_until``.
+
+    The lease is written to next_attempt_at, so once the caller commits other
+    workers skip the rows without a lock being held.
+    """
+    result = await session.execute(
+        select(AccessOperation)
+        .where(AccessOperation.status == AccessOperationStatus.PENDING)
+        .where(AccessOperation.next_attempt_at <= now)
+        .order_by(AccessOperation.next_attempt_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    operations = list(result.scalars().all())
+    for operation in operations:
+        operation.next_attempt_at = lease_until
+    await session.flush()
+    return operations
+
+
+async def get_leased_operation(
+    session: AsyncSession, operation_id: int, lease_until: datetime
+) -> AccessOperation | None:
+    """Lock the operation if it still carries our lease.
+
+    A re-enqueue resets next_attempt_at, so the result of a superseded attempt
+    is dropped instead of overwriting the new operation.
+    """
+    result = await session.execute(
+        select(AccessOperation)
+        .where(AccessOperation.id == operation_id)
+        .where(AccessOperation.status == AccessOperationStatus.PENDING)
+        .where(AccessOperation.next_attempt_at == lease_until)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    )
+    return result.scalar_one_or_none()
@@ -1,4 +1,7 @@
-from sqlalchemy import select
+from collections.abc import Collection
+from datetime import datetime
+
+from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from bot.db.models import AuditLog
@@ -25,6 +28,33 @@ async def has_action_with_key(session: AsyncSession, action: str, key: str) -> b
     return result.scalar_one_or_none() is not None
 
 
+async def list_existing_action_keys(
+    session: AsyncSession, action: str, keys: Collection[str]
+) -> set[str]:
+    if not keys:
+        return set()
+    key_expr = AuditLog.payload["key"].astext
+    result = await session.execute(
+        select(key_expr)
+        .where(AuditLog.action == action)
+        .where(key_expr.in_(keys))
+        .distinct()
+    )
+    return set(result.scalars().all())
+
+
+async def count_actions_since(
+    session: AsyncSession, action: str, since: datetime
+) -> int:
+    result = await session.execute(
+        select(func.count())
+        .select_from(AuditLog)
+        .where(AuditLog.action == action)
+        .where(AuditLog.created_at >= since)
+    )
+    return int(result.scalar_one() or 0)
+
+
 async def list_audit_logs(session: AsyncSession, limit: int = 50) -> list[AuditLog]:
     result = await session.execute(
         select(AuditLog).order_by(AuditLog.created_at.desc()).limit(limit)
@@ -11,6 +11,13 @@ async def list_flows(session: AsyncSession) -> list[Flow]:
     return list(result.scalars().all())
 
 
+async def list_flows_ending_after(session: AsyncSession, now: datetime) -> list[Flow]:
+    result = await session.execute(
+        select(Flow).where(Flow.end_at >= now).order_by(Flow.start_at)
+    )
+    return list(result.scalars().all())
+
+
 async def get_flow_by_id(session: AsyncSession, flow_id: int) -> Flow | None:
     result = await session.execute(select(Flow).where(Flow.id == flow_id))
     return result.scalar_one_or_none()
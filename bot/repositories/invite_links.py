@@ -0,0 +1,87 @@
+from collections.abc import Iterable, Mapping
+from datetime import datetime
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.db.models import InviteLink
+
+
+async def get_reusable_links(
+    session: AsyncSession, user_id: int, valid_until: datetime
+) -> dict[int, str]:
+    """Return chat_id -> link for links still valid at ``valid_until``."""
+    result = await session.execute(
+        select(InviteLink.chat_id, InviteLink.invite_link).where(
+            InviteLink.user_id == user_id,
+            InviteLink.revoked_at.is_(None),
+            InviteLink.expires_at > valid_until,
+        )
+    )
+    return {chat_id: link for chat_id, link in result.all()}
+
+
+async def save_invite_links(
+    session: AsyncSession,
+    user_id: int,
+    links: Mapping[int, str],
+    expires_at: datetime,
+    now: datetime,
+) -> None:
+    """Store the current link per chat, replacing the previous one."""
+    for chat_id, link in links.items():
+        stmt = insert(InviteLink).values(
+            user_id=user_id,
+            chat_id=chat_id,
+            invite_link=link,
+            expires_at=expires_at,
+            created_at=now,
+        )
+        await session.execute(
+            stmt.on_conflict_do_update(
+                constraint="uq_invite_links_user_chat",
+                set_={
+                    "invite_link": link,
+                    "expires_at": expires_at,
+                    "created_at": now,
+                    "revoked_at": None,
+                },
+            )
+        )
+
+
+async def list_active_links(
+    session: AsyncSession,
+    user_id: int,
+    now: datetime,
+    chat_ids: Iterable[int] | None = None,
+) -> list[InviteLink]:
+    stmt = select(InviteLink).where(
+        InviteLink.user_id == user_id,
+        InviteLink.revoked_at.is_(None),
+        InviteLink.expires_at > now,
+    )
+    if chat_ids is not None:
+        stmt = stmt.where(InviteLink.chat_id.in_(list(chat_ids)))
+    result = await session.execute(stmt)
+    return list(result.scalars().all())
+
+
+async def mark_links_revoked(
+    session: AsyncSession, link_ids: Iterable[int], now: datetime
+) -> None:
+    link_ids = list(link_ids)
+    if not link_ids:
+        return
+    await session.execute(
+        update(InviteLink).where(InviteLink.id.in_(link_ids)).values(revoked_at=now)
+    )
+
+
+async def delete_expired_invite_links(session: AsyncSession, now: datetime) -> int:
+    # An expired link is dead in Telegram whether it was revoked or not.
+    result = await session.execute(
+        delete(InviteLink).where(InviteLink.expires_at <= now)
+    )
+    return result.rowcount or 0
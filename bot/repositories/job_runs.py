@@ -0,0 +1,52 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.db.models import JobRun, JobRunStatus
+
+
+async def start_job_run(session: AsyncSession, job_id: str) -> JobRun:
+    run = JobRun(job_id=job_id, status=JobRunStatus.RUNNING)
+    session.add(run)
+    await session.flush()
+    return run
+
+
+async def finish_job_run(
+    session: AsyncSession, run_id: int, status: str, error: str | None = None
+) -> None:
+    run = await session.get(JobRun, run_id)
+    if run is None:
+        return
+    run.status = status
+    run.finished_at = datetime.now(timezone.utc)
+    run.error = error
+
+
+async def fail_running_job_runs(session: AsyncSession, now: datetime) -> int:
+    """Close runs left running by a process that stopped mid-job."""
+    result = await session.execute(
+        update(JobRun)
+        .where(JobRun.status == JobRunStatus.RUNNING)
+        .values(
+            status=JobRunStatus.FAILED,
+            finished_at=now,
+            error="interrupted by shutdown",
+        )
+    )
+    return int(result.rowcount or 0)
+
+
+async def get_last_successful_runs(session: AsyncSession) -> dict[str, datetime]:
+    result = await session.execute(
+        select(JobRun.job_id, func.max(JobRun.started_at))
+        .where(JobRun.status == JobRunStatus.SUCCEEDED)
+        .group_by(JobRun.job_id)
+    )
+    return {job_id: started_at for job_id, started_at in result.all()}
+
+
+async def delete_job_runs_before(session: AsyncSession, cutoff: datetime) -> int:
+    result = await session.execute(delete(JobRun).where(JobRun.started_at < cutoff))
+    return int(result.rowcount or 0)
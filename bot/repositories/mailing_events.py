@@ -0,0 +1,129 @@
+from collections.abc import Iterable
+from datetime import date
+
+from sqlalchemy import case, delete, or_, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.db.models import Flow, MailingEvent, MailingEventStatus
+
+
+async def replace_planned_flow_events(
+    session: AsyncSession,
+    flow_id: int,
+    events: Iterable[tuple[date, str, str]],
+    today: date,
+) -> None:
+    """Rebuild not-yet-started events of a flow from today on.
+
+    Started and sent events are never touched, so a restart or a flow edit
+    cannot repeat or drop a mailing. An unchanged row keeps its pre-built
+    audience; a moved one has it cleared. Past unstarted rows are left for
+    catch-up or expiry.
+    """
+    rows = [
+        {
+            "flow_id": flow_id,
+            "send_on": send_on,
+            "template_key": template_key,
+            "audience": audience,
+            "status": MailingEventStatus.PLANNED,
+        }
+        for send_on, template_key, audience in events
+    ]
+    obsolete = (
+        delete(MailingEvent)
+        .where(MailingEvent.flow_id == flow_id)
+        .where(MailingEvent.status == MailingEventStatus.PLANNED)
+        .where(MailingEvent.sent_count.is_(None))
+        .where(MailingEvent.send_on >= today)
+    )
+    if rows:
+        obsolete = obsolete.where(
+            tuple_(MailingEvent.template_key, MailingEvent.audience).not_in(
+                [(row["template_key"], row["audience"]) for row in rows]
+            )
+        )
+    await session.execute(obsolete)
+    if not rows:
+        return
+    statement = insert(MailingEvent).values(rows)
+    await session.execute(
+        statement.on_conflict_do_update(
+            constraint="uq_mailing_events_flow_kind",
+            set_={
+                "send_on": statement.excluded.send_on,
+                "recipients": case(
+                    (
+                        MailingEvent.send_on == statement.excluded.send_on,
+                        MailingEvent.recipients,
+                    ),
+                    else_=None,
+                ),
+            },
+            where=(MailingEvent.status == MailingEventStatus.PLANNED)
+            & MailingEvent.sent_count.is_(None),
+        )
+    )
+
+
+async def list_planned_events_on(
+    session: AsyncSession, send_on: date
+) -> list[tuple[MailingEvent, Flow]]:
+    result = await session.execute(
+        select(MailingEvent, Flow)
+        .join(Flow, Flow.id == MailingEvent.flow_id)
+        .where(MailingEvent.status == MailingEventStatus.PLANNED)
+        .where(MailingEvent.send_on == send_on)
+        .order_by(MailingEvent.id)
+    )
+    return [(event, flow) for event, flow in result.all()]
+
+
+async def list_due_events(
+    session: AsyncSession, today: date, not_before: date
+) -> list[tuple[MailingEvent, Flow]]:
+    """Planned events due by ``today``; started ones first, whatever their age."""
+    result = await session.execute(
+        select(MailingEvent, Flow)
+        .join(Flow, Flow.id == MailingEvent.flow_id)
+        .where(MailingEvent.status == MailingEventStatus.PLANNED)
+        .where(MailingEvent.send_on <= today)
+        .where(
+            or_(
+                MailingEvent.send_on >= not_before,
+                MailingEvent.sent_count.is_not(None),
+            )
+        )
+        .order_by(
+            MailingEvent.sent_count.is_(None), MailingEvent.send_on, MailingEvent.id
+        )
+    )
+    return [(event, flow) for event, flow in result.all()]
+
+
+async def expire_stale_events(session: AsyncSession, not_before: date) -> list[int]:
+    """Expire planned events that never started and are due before ``not_before``."""
+    result = await session.execute(
+        update(MailingEvent)
+        .where(MailingEvent.status == MailingEventStatus.PLANNED)
+        .where(MailingEvent.send_on < not_before)
+        .where(MailingEvent.sent_count.is_(None))
+        .values(status=MailingEventStatus.EXPIRED)
+        .returning(MailingEvent.id)
+    )
+    return list(result.scalars().all())
+
+
+async def list_upcoming_events(
+    session: AsyncSession, since: date, limit: int = 10
+) -> list[tuple[MailingEvent, Flow]]:
+    result = await session.execute(
+        select(MailingEvent, Flow)
+        .join(Flow, Flow.id == MailingEvent.flow_id)
+        .where(MailingEvent.status == MailingEventStatus.PLANNED)
+        .where(MailingEvent.send_on >= since)
+        .order_by(MailingEvent.send_on, MailingEvent.id)
+        .limit(limit)
+    )
+    return [(event, flow) for event, flow in result.all()]
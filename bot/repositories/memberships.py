@@ -1,6 +1,7 @@
+from collections.abc import Collection
 from datetime import datetime
 
-from sqlalchemy import func, select, update
+from sqlalchemy import func, or_, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from bot.db.models import Membership, MembershipStatus
@@ -30,17 +31,45 @@ async def get_membership_by_flow(
     return result.scalar_one_or_none()
 
 
-async def list_memberships_to_expire(
+async def list_overdue_memberships(
     session: AsyncSession, now: datetime
 ) -> list[Membership]:
+    """Active rows whose grace period or pay-later deadline has passed."""
     result = await session.execute(
         select(Membership)
         .where(Membership.status == MembershipStatus.ACTIVE)
-        .where(Membership.grace_end_at < now)
+        .where(
+            or_(
+                Membership.grace_end_at < now,
+                Membership.pay_later_deadline_at <= now,
+            )
+        )
     )
     return list(result.scalars().all())
 
 
+async def get_next_access_deadline(
+    session: AsyncSession, now: datetime
+) -> datetime | None:
+    """Return the earliest grace or pay-later deadline that is still ahead."""
+    grace_result = await session.execute(
+        select(func.min(Membership.grace_end_at))
+        .where(Membership.status == MembershipStatus.ACTIVE)
+        .where(Membership.grace_end_at >= now)
+    )
+    pay_later_result = await session.execute(
+        select(func.min(Membership.pay_later_deadline_at))
+        .where(Membership.status == MembershipStatus.ACTIVE)
+        .where(Membership.pay_later_deadline_at > now)
+    )
+    deadlines = [
+        value
+        for value in (grace_result.scalar_one(), pay_later_result.scalar_one())
+        if value is not None
+    ]
+    return min(deadlines, default=None)
+
+
 async def get_latest_membership(
     session: AsyncSession, user_id: int
 ) -> Membership | None:
@@ -58,7 +87,28 @@ async def expire_all_active_memberships(session: AsyncSession, user_id: int) ->
         update(Membership)
         .where(Membership.user_id == user_id)
         .where(Membership.status == MembershipStatus.ACTIVE)
-        .values(status=MembershipStatus.EXPIRED)
+        .values(status=MembershipStatus.EXPIRED, version=Membership.version + 1)
+    )
+    return int(result.rowcount or 0)
+
+
+async def expire_due_memberships(
+    session: AsyncSession, membership_ids: Collection[int], now: datetime
+) -> int:
+    """Expire the given rows only if they are still active and overdue."""
+    if not membership_ids:
+        return 0
+    result = await session.execute(
+        update(Membership)
+        .where(Membership.id.in_(membership_ids))
+        .where(Membership.status == MembershipStatus.ACTIVE)
+        .where(
+            or_(
+                Membership.grace_end_at < now,
+                Membership.pay_later_deadline_at <= now,
+            )
+        )
+        .values(status=MembershipStatus.EXPIRED, version=Membership.version + 1)
     )
     return int(result.rowcount or 0)
 
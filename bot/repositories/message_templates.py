@@ -1,3 +1,5 @@
+from collections.abc import Collection
+
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -13,6 +15,17 @@ async def get_template_by_key(
     return result.scalar_one_or_none()
 
 
+async def get_templates_by_keys(
+    session: AsyncSession, keys: Collection[str]
+) -> dict[str, str]:
+    result = await session.execute(
+        select(MessageTemplate.key, MessageTemplate.text).where(
+            MessageTemplate.key.in_(keys)
+        )
+    )
+    return {key: text for key, text in result.all()}
+
+
 async def upsert_template(
     session: AsyncSession, key: str, text: str
 ) -> MessageTemplate:
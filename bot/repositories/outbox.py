@@ -0,0 +1,97 @@
+from datetime import datetime
+
+from sqlalchemy import delete, exists, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from bot.db.models import OutboxMessage, OutboxStatus
+
+
+async def add_outbox_message(
+    session: AsyncSession,
+    user_id: int,
+    kind: str,
+    payload: dict,
+    now: datetime,
+    *,
+    dedupe_key: str | None = None,
+) -> bool:
+    """Queue a side effect; return False when ``dedupe_key`` was queued before."""
+    result = await session.execute(
+        insert(OutboxMessage)
+        .values(
+            user_id=user_id,
+            kind=kind,
+            payload=payload,
+            dedupe_key=dedupe_key,
+            status=OutboxStatus.PENDING,
+            attempts=0,
+            next_attempt_at=now,
+            created_at=now,
+        )
+        .on_conflict_do_nothing(constraint="uq_outbox_dedupe_key")
+        .returning(OutboxMessage.id)
+    )
+    return result.scalar_one_or_none() is not None
+
+
+async def claim_next_outbox_message(
+    session: AsyncSession, now: datetime, lease_until: datetime
+) -> OutboxMessage | None:
+    # Only the oldest pending message of a user is eligible, so a user's
+    # messages are delivered in order even with several workers; one that is
+    # waiting for a retry holds back the later ones. The claim moves
+    # next_attempt_at to lease_until: once the caller commits, other workers
+    # skip the message without a lock being held.
+    earlier = aliased(OutboxMessage)
+    result = await session.execute(
+        select(OutboxMessage)
+        .where(OutboxMessage.status == OutboxStatus.PENDING)
+        .where(OutboxMessage.next_attempt_at <= now)
+        .where(
+            ~exists().where(
+                earlier.user_id == OutboxMessage.user_id,
+                earlier.status == OutboxStatus.PENDING,
+                earlier.id < OutboxMessage.id,
+            )
+        )
+        .order_by(OutboxMessage.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    )
+    message = result.scalar_one_or_none()
+    if message is not None:
+        message.next_attempt_at = lease_until
+        await session.flush()
+    return message
+
+
+async def reschedule_outbox_message(
+    session: AsyncSession,
+    message_id: int,
+    *,
+    attempts: int,
+    next_attempt_at: datetime,
+    error: str,
+    failed: bool,
+) -> None:
+    message = await session.get(OutboxMessage, message_id, with_for_update=True)
+    if message is None or message.status != OutboxStatus.PENDING:
+        return
+    message.attempts = attempts
+    message.next_attempt_at = next_attempt_at
+    message.last_error = error
+    if failed:
+        message.status = OutboxStatus.FAILED
+
+
+async def delete_sent_outbox_messages_before(
+    session: AsyncSession, cutoff: datetime
+) -> None:
+    await session.execute(
+        delete(OutboxMessage).where(
+            OutboxMessage.status == OutboxStatus.SENT,
+            OutboxMessage.sent_at < cutoff,
+        )
+    )
@@ -1,4 +1,7 @@
-from sqlalchemy import select
+from collections.abc import Collection
+from datetime import datetime
+
+from sqlalchemy import func, or_, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from bot.db.models import Payment, PaymentStatus
@@ -13,12 +16,129 @@ async def get_payment_by_external_id(
     return result.scalar_one_or_none()
 
 
-async def list_pending_payments(session: AsyncSession) -> list[Payment]:
-    result = await session.execute(
+async def list_pending_payments(
+    session: AsyncSession,
+    *,
+    after_id: int = 0,
+    limit: int | None = None,
+    created_before: datetime | None = None,
+) -> list[Payment]:
+    query = (
         select(Payment)
         .where(Payment.status == PaymentStatus.PENDING)
         .where(Payment.external_id.is_not(None))
         .where(Payment.external_id != "")
-        .order_by(Payment.created_at.asc())
+        .where(Payment.id > after_id)
+        .order_by(Payment.id.asc())
     )
+    if created_before is not None:
+        query = query.where(Payment.created_at < created_before)
+    if limit is not None:
+        query = query.limit(limit)
+    result = await session.execute(query)
     return list(result.scalars().all())
+
+
+async def get_oldest_pending_created_at(
+    session: AsyncSession, *, created_after: datetime | None = None
+) -> datetime | None:
+    query = (
+        select(func.min(Payment.created_at))
+        .where(Payment.status == PaymentStatus.PENDING)
+        .where(Payment.external_id.is_not(None))
+    )
+    if created_after is not None:
+        query = query.where(Payment.created_at >= created_after)
+    result = await session.execute(query)
+    return result.scalar_one_or_none()
+
+
+async def get_pending_payments_by_external_ids(
+    session: AsyncSession, external_ids: Collection[str]
+) -> dict[str, Payment]:
+    if not external_ids:
+        return {}
+    result = await session.execute(
+        select(Payment)
+        .where(Payment.external_id.in_(external_ids))
+        .where(Payment.status == PaymentStatus.PENDING)
+    )
+    return {payment.external_id: payment for payment in result.scalars().all()}
+
+
+async def fail_pending_payments(
+    session: AsyncSession, payment_ids: Collection[int]
+) -> set[int]:
+    """Mark still-pending payments as failed; return the ids actually changed."""
+    if not payment_ids:
+        return set()
+    result = await session.execute(
+        update(Payment)
+        .where(Payment.id.in_(payment_ids))
+        .where(Payment.status == PaymentStatus.PENDING)
+        .values(status=PaymentStatus.FAILED)
+        .returning(Payment.id)
+    )
+    return set(result.scalars().all())
+
+
+async def fail_unsent_payments(session: AsyncSession, now: datetime) -> set[int]:
+    """Fail expired pending payments whose provider payment was never created."""
+    result = await session.execute(
+        update(Payment)
+        .where(Payment.status == PaymentStatus.PENDING)
+        .where(Payment.external_id.is_(None))
+        .where(Payment.expires_at < now)
+        .values(status=PaymentStatus.FAILED)
+        .returning(Payment.id)
+    )
+    return set(result.scalars().all())
+
+
+async def get_payment_by_id(session: AsyncSession, payment_id: int) -> Payment | None:
+    result = await session.execute(
+        select(Payment)
+        .where(Payment.id == payment_id)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalar_one_or_none()
+
+
+async def transition_pending_payment(
+    session: AsyncSession, payment_id: int, status: str
+) -> bool:
+    """Compare-and-set a pending payment to ``status``; False if it moved on."""
+    result = await session.execute(
+        update(Payment)
+        .where(Payment.id == payment_id)
+        .where(Payment.status == PaymentStatus.PENDING)
+        .values(status=status)
+    )
+    return result.rowcount == 1
+
+
+async def attach_external_payment(
+    session: AsyncSession,
+    payment_id: int,
+    external_id: str,
+    confirmation_url: str,
+    now: datetime,
+) -> bool:
+    """Store the provider's payment on a still-pending local one.
+
+    A concurrent request that created the same payment with the same
+    idempotence key attaches the same id, so that also counts as success.
+    """
+    result = await session.execute(
+        update(Payment)
+        .where(Payment.id == payment_id)
+        .where(Payment.status == PaymentStatus.PENDING)
+        .where(or_(Payment.external_id.is_(None), Payment.external_id == external_id))
+        .values(
+            external_id=external_id,
+            confirmation_url=confirmation_url,
+            remote_status="pending",
+            remote_checked_at=now,
+        )
+    )
+    return result.rowcount == 1
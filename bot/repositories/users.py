@@ -1,4 +1,4 @@
-from sqlalchemy import func, select
+from sqlalchemy import func, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from bot.db.models import User
@@ -37,13 +37,43 @@ async def get_user_by_id(session: AsyncSession, user_id: int) -> User | None:
 
 
 async def lock_user_by_id(session: AsyncSession, user_id: int) -> User | None:
-    """Serialize payment, grant and revoke decisions for one Telegram user."""
+    """Serialize payment, grant and revoke decisions for one Telegram user.
+
+    Taking the lock bumps the user's version, so a checkout that read the
+    user's state without a lock sees that a decision was made meanwhile.
+    """
     result = await session.execute(
-        select(User).where(User.id == user_id).with_for_update()
+        update(User)
+        .where(User.id == user_id)
+        .values(version=User.version + 1)
+        .returning(User)
+        .execution_options(populate_existing=True)
     )
     return result.scalar_one_or_none()
 
 
+async def get_user_version(session: AsyncSession, user_id: int) -> int | None:
+    result = await session.execute(select(User.version).where(User.id == user_id))
+    return result.scalar_one_or_none()
+
+
+async def advance_user_version(
+    session: AsyncSession, user_id: int, expected: int
+) -> bool:
+    """Compare-and-set: bump the version only if it still equals ``expected``.
+
+    The row stays locked until the caller's transaction ends, so keep that
+    transaction free of network calls.
+    """
+    result = await session.execute(
+        update(User)
+        .where(User.id == user_id, User.version == expected)
+        .values(version=expected + 1)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
 async def get_user_by_tg_id(session: AsyncSession, tg_id: int) -> User | None:
     result = await session.execute(select(User).where(User.tg_id == tg_id))
     return result.scalar_one_or_none()
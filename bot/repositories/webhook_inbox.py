@@ -0,0 +1,69 @@
+from datetime import datetime
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.db.models import WebhookEvent, WebhookEventStatus
+
+
+async def add_webhook_event(
+    session: AsyncSession,
+    event: str,
+    payment_id: str,
+    payload: dict,
+    now: datetime,
+    *,
+    sender_verified: bool = False,
+) -> bool:
+    """Store an incoming notification; return False for a duplicate delivery."""
+    result = await session.execute(
+        insert(WebhookEvent)
+        .values(
+            event=event,
+            payment_id=payment_id,
+            payload=payload,
+            sender_verified=sender_verified,
+            status=WebhookEventStatus.PENDING,
+            attempts=0,
+            next_attempt_at=now,
+            received_at=now,
+        )
+        .on_conflict_do_nothing(constraint="uq_webhook_inbox_event_payment")
+        .returning(WebhookEvent.id)
+    )
+    return result.scalar_one_or_none() is not None
+
+
+async def claim_next_webhook_event(
+    session: AsyncSession, now: datetime
+) -> WebhookEvent | None:
+    # The row stays locked until the worker commits; other workers skip it.
+    result = await session.execute(
+        select(WebhookEvent)
+        .where(WebhookEvent.status == WebhookEventStatus.PENDING)
+        .where(WebhookEvent.next_attempt_at <= now)
+        .order_by(WebhookEvent.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    )
+    return result.scalar_one_or_none()
+
+
+async def reschedule_webhook_event(
+    session: AsyncSession,
+    event_id: int,
+    *,
+    attempts: int,
+    next_attempt_at: datetime,
+    error: str,
+    failed: bool,
+) -> None:
+    event = await session.get(WebhookEvent, event_id, with_for_update=True)
+    if event is None or event.status != WebhookEventStatus.PENDING:
+        return
+    event.attempts = attempts
+    event.next_attempt_at = next_attempt_at
+    event.last_error = error
+    if failed:
+        event.status = WebhookEventStatus.FAILED
@@ -0,0 +1,59 @@
+"""Wake the access jobs at the earliest upcoming membership deadline."""
+
+import logging
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.db.models import Membership
+from bot.repositories import memberships as membership_repo
+
+logger = logging.getLogger(__name__)
+
+WAKEUP_JOB_ID = "access_deadline_wakeup"
+# Expiry compares grace_end_at strictly with now, so wake just after it.
+WAKEUP_DELAY = timedelta(seconds=1)
+
+_scheduler = None
+_wakeup_job = None
+
+
+def bind(scheduler, wakeup_job) -> None:
+    global _scheduler, _wakeup_job
+    _scheduler = scheduler
+    _wakeup_job = wakeup_job
+
+
+# Memberships already store every deadline, so the queue head is derived from
+# them. Changing a membership may only pull the wakeup forward; an early wakeup
+# finds nothing due and re-arms itself from the database.
+def schedule_access_deadline(due_at: datetime | None) -> None:
+    if _scheduler is None or due_at is None:
+        return
+    run_at = max(due_at + WAKEUP_DELAY, datetime.now(timezone.utc))
+    job = _scheduler.get_job(WAKEUP_JOB_ID)
+    if job is None:
+        _scheduler.add_job(_wakeup_job, "date", run_date=run_at, id=WAKEUP_JOB_ID)
+    else:
+        # Jobs added before the scheduler starts have no next_run_time yet.
+        current = getattr(job, "next_run_time", None) or job.trigger.run_date
+        if current <= run_at:
+            return
+        _scheduler.reschedule_job(WAKEUP_JOB_ID, trigger="date", run_date=run_at)
+    logger.info("Access deadline wakeup scheduled", extra={"run_at": run_at})
+
+
+def schedule_membership_deadline(membership: Membership) -> None:
+    deadlines = [
+        value
+        for value in (membership.grace_end_at, membership.pay_later_deadline_at)
+        if value is not None
+    ]
+    schedule_access_deadline(min(deadlines, default=None))
+
+
+async def schedule_next_access_deadline(session: AsyncSession) -> None:
+    now = datetime.now(timezone.utc)
+    schedule_access_deadline(
+        await membership_repo.get_next_access_deadline(session, now)
+    )
@@ -1,34 +1,56 @@
+import asyncio
+import json
 import logging
 from collections import defaultdict
 from datetime import datetime, timedelta, timezone
 from zoneinfo import ZoneInfo
 
 from aiogram import Bot
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from bot.access_control.service import revoke_access
-from bot.db.models import Membership, MembershipStatus, Payment, PaymentStatus
+from bot.db.models import Membership, Payment, PaymentStatus
 from bot.payments.adapter import PaymentAdapter
 from bot.payments.verification import validate_remote_payment
-from bot.repositories import flows as flow_repo
 from bot.repositories import memberships as membership_repo
 from bot.repositories import payments as payment_repo
 from bot.repositories import users as user_repo
-from bot.repositories.audit_log import add_audit_log
-from bot.services.entitlements import has_valid_access
+from bot.repositories.audit_log import (
+    add_audit_log,
+    count_actions_since,
+    has_action_with_key,
+)
+from bot.services.access_operations import enqueue_failed_revoke
+from bot.services.entitlements import has_valid_access, users_with_valid_access
+from bot.services.invite_links import revoke_user_invite_links
 from bot.services.mailings import (
-    send_auto_end_mailings,
-    send_flow_mailings,
+    prepare_mailing_audiences,
+    send_due_mailings,
     send_pay_later_deadline_reminders,
 )
-from bot.services.payments import confirm_payment, notify_payment_status
+from bot.services.payments import (
+    confirm_payment,
+    notify_payment_status,
+    record_remote_snapshot,
+)
 from bot.services.settings import get_mailings_enabled
 from bot.services.texts import get_text
+from bot.utils.circuit_breaker import CircuitOpenError
+from bot.utils.job_budget import JobBudget, load_cursor, save_cursor
+from bot.utils.rate_limit import telegram_rate_limiter
 from config import settings
 
 logger = logging.getLogger(__name__)
 
+LIFECYCLE_JOB = "access_lifecycle"
+CHECK_PAYMENTS_JOB = "check_payments"
+PAYMENT_CHUNK_SIZE = 20
+RECONCILE_JOB = "reconcile_payments"
+RECONCILE_STATUSES = ("succeeded", "canceled")
+# Pending rows younger than this are reconciled through the provider list;
+# older ones would widen every listing and are looked up one by one instead.
+RECONCILE_LIST_WINDOW = timedelta(hours=6)
+
 
 def _pending_payment_deadline(payment: Payment) -> datetime:
     if payment.expires_at is not None:
@@ -46,18 +68,79 @@ def _is_revoke_jobs_enabled() -> bool:
     return settings.revoke_jobs_enabled
 
 
-def _is_mass_revoke_blocked(job_name: str, candidates_count: int) -> bool:
-    if candidates_count <= settings.max_revoke_per_run:
-        return False
-    logger.error(
-        "Mass revoke blocked by safety limit",
-        extra={
-            "job": job_name,
-            "candidates_count": candidates_count,
-            "max_revoke_per_run": settings.max_revoke_per_run,
-        },
+async def _alert_revoke_backlog(
+    session: AsyncSession,
+    bot: Bot,
+    *,
+    job: str,
+    backlog: int,
+    allowed: int,
+    now: datetime,
+) -> None:
+    key = f"revoke_backlog:{job}:{now:%Y-%m-%dT%H}"
+    if await has_action_with_key(session, "admin_alert_sent", key):
+        return
+    text = (
+        "⚠️ Автоматическое исключение: очередь превышает лимит безопасности.\n"
+        f"Задание: {job}\n"
+        f"Исключается за этот запуск: {allowed}\n"
+        f"Ожидают следующих запусков: {backlog}"
+    )
+    for tg_id in settings.admin_tg_ids:
+        await telegram_rate_limiter.acquire()
+        try:
+            await bot.send_message(tg_id, text)
+        except Exception:
+            logger.exception("Failed to alert admin about revoke backlog")
+    await add_audit_log(
+        session,
+        action="admin_alert_sent",
+        payload={"key": key, "job": job, "backlog": backlog, "allowed": allowed},
     )
-    return True
+
+
+async def _revoke_batch_size(
+    session: AsyncSession, bot: Bot, job: str, candidates_count: int, now: datetime
+) -> int:
+    """Return how many users this run may revoke without breaking safety limits."""
+    if candidates_count == 0:
+        return 0
+    revoked_last_hour = await count_actions_since(
+        session, "automatic_access_revoke", now - timedelta(hours=1)
+    )
+    allowed = max(
+        0,
+        min(
+            settings.max_revoke_per_run,
+            settings.max_revoke_per_hour - revoked_last_hour,
+        ),
+    )
+    if candidates_count > allowed:
+        logger.warning(
+            "Revoke backlog exceeds safety limit, processing oldest deadlines first",
+            extra={
+                "job": job,
+                "candidates_count": candidates_count,
+                "allowed": allowed,
+                "revoked_last_hour": revoked_last_hour,
+                "max_revoke_per_run": settings.max_revoke_per_run,
+                "max_revoke_per_hour": settings.max_revoke_per_hour,
+            },
+        )
+        await _alert_revoke_backlog(
+            session,
+            bot,
+            job=job,
+            backlog=candidates_count - allowed,
+            allowed=allowed,
+            now=now,
+        )
+    return allowed
+
+
+def _membership_deadline(membership: Membership) -> datetime:
+    deadlines = [membership.grace_end_at, membership.pay_later_deadline_at]
+    return min(value for value in deadlines if value is not None)
 
 
 def _group_memberships_by_user(
@@ -75,7 +158,7 @@ async def _record_automatic_revoke(
     job: str,
     user_id: int,
     tg_id: int,
-    memberships: list[Membership],
+    membership_ids: list[int],
 ) -> None:
     await add_audit_log(
         session,
@@ -84,271 +167,481 @@ async def _record_automatic_revoke(
             "job": job,
             "user_id": user_id,
             "tg_id": tg_id,
-            "membership_ids": [membership.id for membership in memberships],
+            "membership_ids": membership_ids,
         },
     )
 
 
-async def expire_memberships(session: AsyncSession, bot: Bot) -> None:
-    if not _is_revoke_jobs_enabled():
-        logger.warning("Revoke jobs disabled: expire_memberships skipped")
-        return
-    now = datetime.now(timezone.utc)
-    memberships = await membership_repo.list_memberships_to_expire(session, now)
-    grouped = _group_memberships_by_user(memberships)
-    revoke_user_ids = {
-        user_id
-        for user_id, stale in grouped.items()
-        if not await has_valid_access(
-            session,
-            user_id,
-            now,
-            exclude_membership_ids={membership.id for membership in stale},
-        )
-    }
-
-    if _is_mass_revoke_blocked("expire_memberships", len(revoke_user_ids)):
-        return
-
-    for user_id, stale in grouped.items():
+async def _revoke_user_access(
+    sessionmaker,
+    bot: Bot,
+    *,
+    user_id: int,
+    membership_ids: list[int],
+    now: datetime,
+    revoke_text: str | None = None,
+) -> None:
+    async with sessionmaker() as session:
         user = await user_repo.lock_user_by_id(session, user_id)
-        excluded_ids = {membership.id for membership in stale}
         # Recheck only after taking the same lock used by payment confirmation.
         # A payment committed while the job was building its candidate list must
         # protect the participant from a stale Telegram ban.
         keep_access = await has_valid_access(
-            session, user_id, now, exclude_membership_ids=excluded_ids
+            session, user_id, now, exclude_membership_ids=membership_ids
         )
         if keep_access or user is None:
-            for membership in stale:
-                membership.status = MembershipStatus.EXPIRED
+            await membership_repo.expire_due_memberships(session, membership_ids, now)
             await session.commit()
-            continue
+            return
 
         result = await revoke_access(bot, user.tg_id)
-        if result.successful:
-            for membership in stale:
-                membership.status = MembershipStatus.EXPIRED
-            if not result.protected:
-                await _record_automatic_revoke(
-                    session,
-                    job="expire_memberships",
+        if not result.channel_ok:
+            # Nothing changed in Telegram: keep all rows active so the next run
+            # retries instead of hiding the failure.
+            await session.commit()
+            return
+        if not result.group_ok:
+            # Only the group ban is retried; the channel ban already succeeded.
+            await enqueue_failed_revoke(session, user_id, result)
+
+        await membership_repo.expire_due_memberships(session, membership_ids, now)
+        if not result.protected:
+            await revoke_user_invite_links(session, bot, user_id)
+            await _record_automatic_revoke(
+                session,
+                job=LIFECYCLE_JOB,
+                user_id=user_id,
+                tg_id=user.tg_id,
+                membership_ids=membership_ids,
+            )
+            if revoke_text is not None:
+                await telegram_rate_limiter.acquire()
+                try:
+                    await bot.send_message(user.tg_id, revoke_text)
+                except Exception:
+                    logger.exception(
+                        "Failed to notify user on pay-later expiry",
+                        extra={"user_id": user_id},
+                    )
+        await session.commit()
+
+
+async def _run_revoke_pipeline(
+    sessionmaker,
+    bot: Bot,
+    *,
+    grouped: dict[int, list[Membership]],
+    now: datetime,
+    revoke_text: str,
+) -> None:
+    """Process independent users concurrently; Telegram calls share one limiter."""
+    semaphore = asyncio.Semaphore(max(1, settings.revoke_concurrency))
+
+    async def process(user_id: int, memberships: list[Membership]) -> None:
+        pay_later_overdue = any(
+            membership.pay_later_deadline_at is not None
+            and membership.pay_later_deadline_at <= now
+            for membership in memberships
+        )
+        async with semaphore:
+            try:
+                await _revoke_user_access(
+                    sessionmaker,
+                    bot,
                     user_id=user_id,
-                    tg_id=user.tg_id,
-                    memberships=stale,
+                    membership_ids=[membership.id for membership in memberships],
+                    now=now,
+                    revoke_text=revoke_text if pay_later_overdue else None,
                 )
-        await session.commit()
+            except Exception:
+                logger.exception(
+                    "Failed to process automatic revoke",
+                    extra={"job": LIFECYCLE_JOB, "user_id": user_id},
+                )
+
+    await asyncio.gather(
+        *(process(user_id, memberships) for user_id, memberships in grouped.items())
+    )
 
 
-async def enforce_pay_later_deadlines(session: AsyncSession, bot: Bot) -> None:
+async def process_access_lifecycle(
+    session: AsyncSession, bot: Bot, sessionmaker
+) -> int:
+    """Expire every overdue membership in one pass; return the revoke backlog.
+
+    One scan covers both ended grace periods and missed pay-later deadlines.
+    Users who keep access are expired with a single UPDATE, everybody else gets
+    exactly one locked revoke decision per run.
+    """
     if not _is_revoke_jobs_enabled():
-        logger.warning("Revoke jobs disabled: enforce_pay_later_deadlines skipped")
-        return
+        logger.warning("Revoke jobs disabled: access lifecycle skipped")
+        return 0
     now = datetime.now(timezone.utc)
+    memberships = await membership_repo.list_overdue_memberships(session, now)
+    grouped = _group_memberships_by_user(memberships)
+    keep_user_ids = await users_with_valid_access(
+        session,
+        grouped.keys(),
+        now,
+        exclude_membership_ids=[membership.id for membership in memberships],
+    )
+    await membership_repo.expire_due_memberships(
+        session,
+        [
+            membership.id
+            for user_id in keep_user_ids
+            for membership in grouped.get(user_id, ())
+        ],
+        now,
+    )
+
+    revoke_candidates = sorted(
+        (user_id for user_id in grouped if user_id not in keep_user_ids),
+        key=lambda user_id: min(map(_membership_deadline, grouped[user_id])),
+    )
+    allowed = await _revoke_batch_size(
+        session, bot, LIFECYCLE_JOB, len(revoke_candidates), now
+    )
     revoke_text = await get_text(session, "pay_later_access_revoked")
-    result = await session.execute(
-        select(Membership)
-        .where(Membership.status == MembershipStatus.ACTIVE)
-        .where(Membership.pay_later_deadline_at.is_not(None))
-        .where(Membership.pay_later_deadline_at <= now)
+    # Release the candidate snapshot before workers take per-user locks.
+    await session.commit()
+
+    await _run_revoke_pipeline(
+        sessionmaker,
+        bot,
+        grouped={user_id: grouped[user_id] for user_id in revoke_candidates[:allowed]},
+        now=now,
+        revoke_text=revoke_text,
     )
-    memberships = list(result.scalars().all())
-    grouped = _group_memberships_by_user(memberships)
-    revoke_candidate_ids = {
-        user_id
-        for user_id, overdue in grouped.items()
-        if not await has_valid_access(
+    logger.info(
+        "Access lifecycle run",
+        extra={
+            "overdue_memberships": len(memberships),
+            "users": len(grouped),
+            "kept_access": len(keep_user_ids),
+            "revoke_candidates": len(revoke_candidates),
+            "processed": min(allowed, len(revoke_candidates)),
+        },
+    )
+    return max(0, len(revoke_candidates) - allowed)
+
+
+async def _check_pending_payment(
+    session: AsyncSession,
+    adapter: PaymentAdapter,
+    external_id: str,
+    now: datetime,
+    remote: dict | None = None,
+) -> None:
+    payment = await payment_repo.get_payment_by_external_id(session, external_id)
+    if payment is None or payment.status != PaymentStatus.PENDING:
+        await session.commit()
+        return
+    if await user_repo.lock_user_by_id(session, payment.user_id) is None:
+        await session.commit()
+        return
+    payment = await payment_repo.get_payment_by_external_id(session, external_id)
+    if payment is None or payment.status != PaymentStatus.PENDING:
+        await session.commit()
+        return
+    if remote is None:
+        remote = await adapter.get_payment(payment.external_id)
+    validation_error = validate_remote_payment(
+        remote,
+        external_id=payment.external_id,
+        internal_payment_id=payment.id,
+        user_id=payment.user_id,
+        amount_rub=payment.amount_rub,
+        currency=payment.currency,
+    )
+    if validation_error:
+        payment.status = PaymentStatus.NEEDS_REVIEW
+        logger.error(
+            "Pending payment verification mismatch",
+            extra={
+                "payment_id": payment.id,
+                "external_id": payment.external_id,
+                "reason": validation_error,
+            },
+        )
+        await notify_payment_status(
             session,
-            user_id,
-            now,
-            exclude_membership_ids={membership.id for membership in overdue},
+            payment.user_id,
+            "payment_needs_review",
+            dedupe_key=f"payment:{payment.id}:payment_needs_review",
         )
-    }
-    if _is_mass_revoke_blocked(
-        "enforce_pay_later_deadlines", len(revoke_candidate_ids)
-    ):
+        await session.commit()
         return
-    for user_id, overdue in grouped.items():
-        user = await user_repo.lock_user_by_id(session, user_id)
-        excluded_ids = {membership.id for membership in overdue}
-        keep_access = await has_valid_access(
-            session, user_id, now, exclude_membership_ids=excluded_ids
-        )
-        if keep_access or user is None:
-            for membership in overdue:
-                membership.status = MembershipStatus.EXPIRED
-            await session.commit()
-            continue
 
-        result = await revoke_access(bot, user.tg_id)
-        if not result.successful:
-            # Keep all rows active so the next run retries instead of hiding a
-            # partial Telegram failure.
-            await session.commit()
-            continue
-
-        for membership in overdue:
-            membership.status = MembershipStatus.EXPIRED
-        if not result.protected:
-            await _record_automatic_revoke(
+    remote_status = remote.get("status")
+    status = {
+        "succeeded": PaymentStatus.PAID,
+        "canceled": PaymentStatus.FAILED,
+    }.get(remote_status, PaymentStatus.PENDING)
+    if status == PaymentStatus.PAID:
+        await confirm_payment(session, payment, paid_at=now)
+    elif status == PaymentStatus.FAILED:
+        payment.status = PaymentStatus.FAILED
+        if _expiration_notice_is_timely(payment, now):
+            await notify_payment_status(
                 session,
-                job="enforce_pay_later_deadlines",
-                user_id=user_id,
-                tg_id=user.tg_id,
-                memberships=overdue,
+                payment.user_id,
+                "payment_failed",
+                dedupe_key=f"payment:{payment.id}:payment_failed",
             )
-            try:
-                await bot.send_message(user.tg_id, revoke_text)
-            except Exception:
-                logger.exception(
-                    "Failed to notify user on pay-later expiry",
-                    extra={"user_id": user_id},
-                )
+    elif status == PaymentStatus.EXPIRED:
+        payment.status = PaymentStatus.EXPIRED
+        if _expiration_notice_is_timely(payment, now):
+            await notify_payment_status(
+                session,
+                payment.user_id,
+                "payment_expired",
+                dedupe_key=f"payment:{payment.id}:payment_expired",
+            )
+    else:
+        # Release the per-user row lock even when YooKassa is still pending.
+        record_remote_snapshot(payment, remote, now)
         await session.commit()
+        return
+
+    # Commit each processed payment independently so one failure
+    # does not keep previously handled payments in PENDING state.
+    await session.commit()
+
+
+async def _fail_unsent_payments(session: AsyncSession, now: datetime) -> None:
+    # Checkout commits the local row before calling YooKassa; if that call
+    # never succeeded there is nothing to poll, so the row only expires.
+    failed = await payment_repo.fail_unsent_payments(session, now)
+    await session.commit()
+    if failed:
+        logger.info("Unsent payments expired", extra={"payment_ids": sorted(failed)})
 
 
 async def check_pending_payments(
-    session: AsyncSession, bot: Bot, adapter: PaymentAdapter
+    session: AsyncSession,
+    adapter: PaymentAdapter,
+    budget: JobBudget | None = None,
 ) -> None:
+    """Poll pending payments in chunks, resuming where the last tick stopped."""
+    budget = budget or JobBudget(settings.job_time_budget_seconds)
     now = datetime.now(timezone.utc)
-    pending = await payment_repo.list_pending_payments(session)
-    for listed_payment in pending:
-        try:
-            payment = await payment_repo.get_payment_by_external_id(
-                session, listed_payment.external_id
-            )
-            if payment is None or payment.status != PaymentStatus.PENDING:
-                await session.commit()
-                continue
-            if await user_repo.lock_user_by_id(session, payment.user_id) is None:
-                await session.commit()
-                continue
-            payment = await payment_repo.get_payment_by_external_id(
-                session, listed_payment.external_id
-            )
-            if payment is None or payment.status != PaymentStatus.PENDING:
-                await session.commit()
-                continue
-            remote = await adapter.get_payment(payment.external_id)
-            validation_error = validate_remote_payment(
-                remote,
-                external_id=payment.external_id,
-                internal_payment_id=payment.id,
-                user_id=payment.user_id,
-                amount_rub=payment.amount_rub,
-                currency=payment.currency,
-            )
-            if validation_error:
-                payment.status = PaymentStatus.NEEDS_REVIEW
-                logger.error(
-                    "Pending payment verification mismatch",
-                    extra={
-                        "payment_id": payment.id,
-                        "external_id": payment.external_id,
-                        "reason": validation_error,
-                    },
-                )
-                await notify_payment_status(
-                    session,
-                    bot,
-                    payment.user_id,
-                    "payment_needs_review",
-                    dedupe_key=f"payment:{payment.id}:payment_needs_review",
+    await _fail_unsent_payments(session, now)
+    cursor = await load_cursor(session, CHECK_PAYMENTS_JOB)
+    after_id = int(cursor) if cursor else 0
+    processed = 0
+    stopped = False
+    while not budget.exhausted:
+        pending = await payment_repo.list_pending_payments(
+            session, after_id=after_id, limit=PAYMENT_CHUNK_SIZE
+        )
+        if not pending:
+            # Reached the end: the next tick starts a fresh pass.
+            after_id = 0
+            break
+        # Plain values: a rollback below expires the ORM rows.
+        for payment_id, external_id in [(p.id, p.external_id) for p in pending]:
+            if budget.exhausted:
+                break
+            try:
+                await _check_pending_payment(session, adapter, external_id, now)
+            except CircuitOpenError:
+                # The provider is down: keep the cursor here for the next tick.
+                await session.rollback()
+                stopped = True
+                break
+            except Exception:
+                await session.rollback()
+                logger.exception(
+                    "Failed to process pending payment",
+                    extra={"payment_id": payment_id, "external_id": external_id},
                 )
-                await session.commit()
-                continue
-
-            remote_status = remote.get("status")
-            status = {
-                "succeeded": PaymentStatus.PAID,
-                "canceled": PaymentStatus.FAILED,
-            }.get(remote_status, PaymentStatus.PENDING)
-            if status == PaymentStatus.PAID:
-                await confirm_payment(session, bot, payment, paid_at=now)
-            elif status == PaymentStatus.FAILED:
-                payment.status = PaymentStatus.FAILED
-                if _expiration_notice_is_timely(payment, now):
-                    await notify_payment_status(
-                        session,
-                        bot,
-                        payment.user_id,
-                        "payment_failed",
-                        dedupe_key=f"payment:{payment.id}:payment_failed",
-                    )
-            elif status == PaymentStatus.EXPIRED:
-                payment.status = PaymentStatus.EXPIRED
-                if _expiration_notice_is_timely(payment, now):
-                    await notify_payment_status(
-                        session,
-                        bot,
-                        payment.user_id,
-                        "payment_expired",
-                        dedupe_key=f"payment:{payment.id}:payment_expired",
-                    )
-            else:
-                # Release the per-user row lock even when YooKassa is still
-                # pending and no database values changed.
-                await session.commit()
-                continue
-
-            # Commit each processed payment independently so one failure
-            # does not keep previously handled payments in PENDING state.
-            await session.commit()
+            after_id = payment_id
+            processed += 1
+        if stopped:
+            break
+    await save_cursor(session, CHECK_PAYMENTS_JOB, str(after_id) if after_id else None)
+    await session.commit()
+    logger.info(
+        "Pending payments tick",
+        extra={"processed": processed, "cursor": after_id},
+    )
+
+
+async def _apply_listed_payments(
+    session: AsyncSession,
+    adapter: PaymentAdapter,
+    items: list[dict],
+    now: datetime,
+) -> int:
+    local = await payment_repo.get_pending_payments_by_external_ids(
+        session, [item["id"] for item in items if item.get("id")]
+    )
+    canceled: list[Payment] = []
+    # Successful and mismatching payments go through the per-payment path,
+    # which takes the user lock and grants access.
+    one_by_one: list[dict] = []
+    for item in items:
+        payment = local.get(item.get("id"))
+        if payment is None:
+            continue
+        validation_error = validate_remote_payment(
+            item,
+            external_id=payment.external_id,
+            internal_payment_id=payment.id,
+            user_id=payment.user_id,
+            amount_rub=payment.amount_rub,
+            currency=payment.currency,
+        )
+        if item.get("status") == "canceled" and not validation_error:
+            canceled.append(payment)
+        elif item.get("status") == "succeeded" or validation_error:
+            one_by_one.append(item)
+
+    failed_ids = await payment_repo.fail_pending_payments(
+        session, [payment.id for payment in canceled]
+    )
+    for payment in canceled:
+        if payment.id in failed_ids and _expiration_notice_is_timely(payment, now):
+            await notify_payment_status(
+                session,
+                payment.user_id,
+                "payment_failed",
+                dedupe_key=f"payment:{payment.id}:payment_failed",
+            )
+    await session.commit()
+
+    for item in one_by_one:
+        try:
+            await _check_pending_payment(session, adapter, item["id"], now, remote=item)
         except Exception:
             await session.rollback()
             logger.exception(
-                "Failed to process pending payment",
-                extra={"payment_id": payment.id, "external_id": payment.external_id},
+                "Failed to process listed payment", extra={"external_id": item["id"]}
             )
-
-
-async def send_scheduled_mailings(session: AsyncSession, bot: Bot) -> None:
-    now_utc = datetime.now(timezone.utc)
-    tz = ZoneInfo(settings.scheduler_timezone)
-    now_local_date = now_utc.astimezone(tz).date()
-    target_dates = {
-        now_local_date + timedelta(days=7),
-        now_local_date + timedelta(days=3),
+    return len(failed_ids) + len(one_by_one)
+
+
+def _new_reconcile_pass(now: datetime, oldest_recent: datetime | None) -> dict:
+    # A small margin covers clock skew between us and the provider.
+    since = oldest_recent - timedelta(minutes=5) if oldest_recent else None
+    return {
+        "since": since.isoformat() if since else None,
+        "list_start": (now - RECONCILE_LIST_WINDOW).isoformat(),
+        "status": 0,
+        "page": None,
+        "stale_after_id": 0,
     }
 
-    enabled = await get_mailings_enabled(session)
-    if not enabled:
-        logger.info("Scheduled mailings disabled, skipping")
-        return
-    flows = await flow_repo.list_flows(session)
-    matched_flows = []
-    for flow in flows:
-        flow_start_local_date = flow.start_at.astimezone(tz).date()
-        if flow_start_local_date not in target_dates:
-            continue
 
-        matched_flows.append(flow)
-    matched_flows_meta = [
-        {
-            "id": f.id,
-            "start_at": f.start_at.isoformat(),
-            "end_at": f.end_at.isoformat(),
-            "is_free": f.is_free,
-        }
-        for f in matched_flows
-    ]
+async def _save_reconcile_state(session: AsyncSession, state: dict | None) -> None:
+    await save_cursor(session, RECONCILE_JOB, json.dumps(state) if state else None)
+    await session.commit()
+
 
+async def reconcile_pending_payments(
+    session: AsyncSession,
+    adapter: PaymentAdapter,
+    budget: JobBudget | None = None,
+) -> None:
+    """Reconcile pending payments from the provider's paginated list.
+
+    Payments still pending remotely are not listed, so a run costs a few
+    pages instead of one request per local pending row. Only pending rows from
+    the last RECONCILE_LIST_WINDOW set the list window; older rows are looked
+    up one by one. The window, list status, page cursor and lookup position
+    are persisted, so a pass cut off by the budget resumes on the next tick.
+    """
+    budget = budget or JobBudget(settings.job_time_budget_seconds)
+    now = datetime.now(timezone.utc)
+    await _fail_unsent_payments(session, now)
+    saved = await load_cursor(session, RECONCILE_JOB)
+    if saved:
+        state = json.loads(saved)
+    else:
+        oldest_recent = await payment_repo.get_oldest_pending_created_at(
+            session, created_after=now - RECONCILE_LIST_WINDOW
+        )
+        state = _new_reconcile_pass(now, oldest_recent)
+    pages = 0
+    changed = 0
+    if state["since"] is None:
+        state["status"] = len(RECONCILE_STATUSES)
+    created_since = datetime.fromisoformat(state["since"]) if state["since"] else None
+    while state["status"] < len(RECONCILE_STATUSES) and not budget.exhausted:
+        items, page = await adapter.list_payments(
+            created_since=created_since,
+            status=RECONCILE_STATUSES[state["status"]],
+            cursor=state["page"],
+        )
+        pages += 1
+        changed += await _apply_listed_payments(session, adapter, items, now)
+        if page:
+            state["page"] = page
+        else:
+            state["status"] += 1
+            state["page"] = None
+        await _save_reconcile_state(session, state)
+
+    finished = False
+    list_start = datetime.fromisoformat(state["list_start"])
+    while state["status"] >= len(RECONCILE_STATUSES) and not budget.exhausted:
+        # Rows older than the list window fall back to point lookups.
+        stale = await payment_repo.list_pending_payments(
+            session,
+            after_id=state["stale_after_id"],
+            created_before=list_start,
+            limit=PAYMENT_CHUNK_SIZE,
+        )
+        if not stale:
+            finished = True
+            break
+        stopped = False
+        for payment_id, external_id in [(p.id, p.external_id) for p in stale]:
+            if budget.exhausted:
+                break
+            try:
+                await _check_pending_payment(session, adapter, external_id, now)
+            except CircuitOpenError:
+                await session.rollback()
+                stopped = True
+                break
+            except Exception:
+                await session.rollback()
+                logger.exception(
+                    "Failed to process pending payment",
+                    extra={"external_id": external_id},
+                )
+            state["stale_after_id"] = payment_id
+        await _save_reconcile_state(session, state)
+        if stopped:
+            break
+    if finished:
+        await _save_reconcile_state(session, None)
     logger.info(
-        "Scheduled start mailings tick",
+        "Pending payments reconciled",
         extra={
-            "enabled": enabled,
-            "tz": settings.scheduler_timezone,
-            "now_local_date": str(now_local_date),
-            "target_dates_local": [str(d) for d in target_dates],
-            "matched_flows": matched_flows_meta,
+            "created_since": state["since"],
+            "pages": pages,
+            "changed": changed,
+            "finished": finished,
         },
     )
 
-    for flow in matched_flows:
-        await send_flow_mailings(session, bot, flow.id, flow.start_at)
+
+async def prepare_mailings(session: AsyncSession) -> None:
+    if not await get_mailings_enabled(session):
+        return
+    await prepare_mailing_audiences(session, datetime.now(timezone.utc))
     await session.commit()
 
 
+async def calendar_mailings(session: AsyncSession, bot: Bot) -> None:
+    if not await get_mailings_enabled(session):
+        return
+    await send_due_mailings(session, bot, datetime.now(timezone.utc))
+
+
 async def auto_mailings(bot: Bot, sessionmaker) -> None:
     async with sessionmaker() as session:
         enabled = await get_mailings_enabled(session)
@@ -358,7 +651,7 @@ async def auto_mailings(bot: Bot, sessionmaker) -> None:
         tz = ZoneInfo(settings.scheduler_timezone)
         now_local_date = now.astimezone(tz).date()
         logger.info(
-            "Auto end mailings tick",
+            "Auto mailings tick",
             extra={
                 "enabled": enabled,
                 "tz": settings.scheduler_timezone,
@@ -366,6 +659,5 @@ async def auto_mailings(bot: Bot, sessionmaker) -> None:
                 "now_utc": now.isoformat(),
             },
         )
-        await send_auto_end_mailings(session, bot, now)
         await send_pay_later_deadline_reminders(session, bot, now)
         await session.commit()
@@ -1,73 +1,190 @@
 import logging
+from datetime import datetime, timedelta, timezone
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
+from bot.db.models import JobRunStatus
 from bot.db.session import AsyncSessionLocal
-from bot.scheduler import jobs
+from bot.payments.yookassa_adapter import yookassa_breaker
+from bot.repositories import job_runs as job_run_repo
+from bot.repositories import outbox as outbox_repo
+from bot.scheduler import deadlines, jobs
+from bot.services.access_operations import process_access_operations
+from bot.services.invite_links import purge_expired_invite_links
+from bot.utils.circuit_breaker import CircuitBreaker
+from bot.utils.telegram_session import telegram_breaker
 from config import settings
 
 logger = logging.getLogger(__name__)
 
+JOB_RUN_RETENTION = timedelta(days=30)
+# Sent rows keep their dedupe keys this long.
+OUTBOX_RETENTION = timedelta(days=30)
+REVOKE_BACKLOG_RETRY = timedelta(minutes=15)
+
+
+def _tracked(job_id: str, func):
+    """Record every run so a restart can resume the schedule from history."""
+
+    async def runner():
+        async with AsyncSessionLocal() as session:
+            run = await job_run_repo.start_job_run(session, job_id)
+            await session.commit()
+            run_id = run.id
+        status = JobRunStatus.SUCCEEDED
+        error = None
+        try:
+            await func()
+        except Exception as exc:
+            status = JobRunStatus.FAILED
+            error = repr(exc)
+            raise
+        finally:
+            async with AsyncSessionLocal() as session:
+                await job_run_repo.finish_job_run(session, run_id, status, error)
+                await session.commit()
+
+    return runner
+
+
+def _dependency_down(breaker: CircuitBreaker) -> bool:
+    # An open circuit would make every item of the run fail fast; the next
+    # regular tick tries again.
+    if breaker.is_open:
+        logger.warning(
+            "Job skipped while dependency is down",
+            extra={"dependency": breaker.name, **breaker.snapshot()},
+        )
+        return True
+    return False
+
 
 def setup_scheduler(bot, payment_adapter=None) -> AsyncIOScheduler:
-    scheduler = AsyncIOScheduler(timezone=settings.scheduler_timezone)
+    scheduler = AsyncIOScheduler(
+        timezone=settings.scheduler_timezone,
+        job_defaults={
+            "coalesce": True,
+            "max_instances": 1,
+            "misfire_grace_time": settings.scheduler_misfire_grace_seconds,
+        },
+    )
 
     async def _with_session(coro):
         async with AsyncSessionLocal() as session:
-            await coro(session)
+            return await coro(session)
+
+    def _retry_access_lifecycle_later() -> None:
+        deadlines.schedule_access_deadline(
+            datetime.now(timezone.utc) + REVOKE_BACKLOG_RETRY
+        )
+
+    async def _run_access_lifecycle() -> bool:
+        """Return False when the run was skipped because Telegram is down."""
+        if _dependency_down(telegram_breaker):
+            _retry_access_lifecycle_later()
+            return False
+        backlog = await _with_session(
+            lambda s: jobs.process_access_lifecycle(s, bot, AsyncSessionLocal)
+        )
+        # Users held back by the safety limits are retried soon instead of
+        # waiting for the next sweep.
+        if backlog:
+            _retry_access_lifecycle_later()
+        return True
 
-    async def _expire_memberships_job():
-        await _with_session(lambda s: jobs.expire_memberships(s, bot))
+    async def _access_lifecycle_job():
+        await _run_access_lifecycle()
 
-    async def _enforce_pay_later_deadlines_job():
-        await _with_session(lambda s: jobs.enforce_pay_later_deadlines(s, bot))
+    async def _access_deadline_job():
+        if await _run_access_lifecycle():
+            await _with_session(deadlines.schedule_next_access_deadline)
 
-    async def _send_scheduled_mailings_job():
-        await _with_session(lambda s: jobs.send_scheduled_mailings(s, bot))
+    async def _access_operations_job():
+        if _dependency_down(telegram_breaker):
+            return
+        await _with_session(lambda s: process_access_operations(s, bot))
+
+    async def _calendar_mailings_job():
+        if _dependency_down(telegram_breaker):
+            return
+        await _with_session(lambda s: jobs.calendar_mailings(s, bot))
+
+    async def _prepare_mailings_job():
+        await _with_session(jobs.prepare_mailings)
 
     async def _auto_mailings_job():
+        if _dependency_down(telegram_breaker):
+            return
         await jobs.auto_mailings(bot, AsyncSessionLocal)
 
+    async def _invite_links_sweep_job():
+        await _with_session(purge_expired_invite_links)
+
     async def _check_payments_job():
-        await _with_session(
-            lambda s: jobs.check_pending_payments(s, bot, payment_adapter)
-        )
+        if _dependency_down(yookassa_breaker):
+            return
+        if settings.payment_reconciliation == "list":
+            check = jobs.reconcile_pending_payments
+        else:
+            check = jobs.check_pending_payments
+        await _with_session(lambda s: check(s, payment_adapter))
 
     if settings.revoke_jobs_enabled:
-        scheduler.add_job(
-            _expire_memberships_job,
-            "interval",
-            minutes=30,
-            id="expire_memberships",
-            replace_existing=True,
+        # Deadlines are handled by the wakeup job; the sweep only catches rows
+        # changed without scheduling a wakeup (manual SQL, scripts).
+        deadlines.bind(
+            scheduler, _tracked(deadlines.WAKEUP_JOB_ID, _access_deadline_job)
         )
         scheduler.add_job(
-            _enforce_pay_later_deadlines_job,
+            _tracked(jobs.LIFECYCLE_JOB, _access_lifecycle_job),
             "interval",
-            minutes=30,
-            id="enforce_pay_later_deadlines",
+            minutes=settings.access_sweep_interval_minutes,
+            id=jobs.LIFECYCLE_JOB,
             replace_existing=True,
         )
     else:
         logger.warning("Revoke jobs are disabled via REVOKE_JOBS_ENABLED=false")
     scheduler.add_job(
-        _send_scheduled_mailings_job,
+        _tracked("access_operations", _access_operations_job),
         "interval",
-        hours=12,
-        id="send_mailings",
+        minutes=1,
+        id="access_operations",
         replace_existing=True,
     )
     scheduler.add_job(
-        _auto_mailings_job,
+        _tracked("auto_mailings", _auto_mailings_job),
         "cron",
         hour=10,
         minute=0,
         id="auto_mailings",
         replace_existing=True,
     )
+    # Runs often so a mailing cut off by the time budget resumes quickly.
+    scheduler.add_job(
+        _tracked("calendar_mailings", _calendar_mailings_job),
+        "interval",
+        minutes=5,
+        id="calendar_mailings",
+        replace_existing=True,
+    )
+    scheduler.add_job(
+        _tracked("prepare_mailings", _prepare_mailings_job),
+        "cron",
+        hour=22,
+        minute=0,
+        id="prepare_mailings",
+        replace_existing=True,
+    )
+    scheduler.add_job(
+        _tracked("invite_links_sweep", _invite_links_sweep_job),
+        "interval",
+        hours=1,
+        id="invite_links_sweep",
+        replace_existing=True,
+    )
     if payment_adapter is not None:
         scheduler.add_job(
-            _check_payments_job,
+            _tracked("check_payments", _check_payments_job),
             "interval",
             minutes=10,
             id="check_payments",
@@ -75,3 +192,70 @@ def setup_scheduler(bot, payment_adapter=None) -> AsyncIOScheduler:
         )
 
     return scheduler
+
+
+def _latest_fire_time(trigger, last_run: datetime, now: datetime):
+    """Return the last fire time in (last_run, now] and the first one after."""
+    latest = None
+    fire_time = trigger.get_next_fire_time(last_run, now)
+    while fire_time is not None and fire_time <= now:
+        latest = fire_time
+        fire_time = trigger.get_next_fire_time(fire_time, now)
+    return latest, fire_time
+
+
+def plan_catch_up(
+    scheduler: AsyncIOScheduler, last_runs: dict[str, datetime], now: datetime
+) -> dict[str, datetime]:
+    """Return next run times derived from the persisted run history.
+
+    Interval jobs keep their cadence across restarts instead of starting a
+    fresh interval. If runs were missed since the last success, the latest
+    missed fire time decides: it runs immediately if it is still within the
+    misfire grace period, and earlier misses are coalesced into it.
+    """
+    grace = timedelta(seconds=settings.scheduler_misfire_grace_seconds)
+    planned: dict[str, datetime] = {}
+    for job in scheduler.get_jobs():
+        last_run = last_runs.get(job.id)
+        if last_run is None:
+            continue
+        missed_at, due_at = _latest_fire_time(job.trigger, last_run, now)
+        if missed_at is not None:
+            if now - missed_at > grace:
+                logger.warning(
+                    "Missed scheduler run is outside the grace period",
+                    extra={"job": job.id, "due_at": missed_at.isoformat()},
+                )
+                continue
+            due_at = now
+        if due_at is None:
+            continue
+        planned[job.id] = due_at
+    return planned
+
+
+async def restore_job_schedule(scheduler: AsyncIOScheduler) -> None:
+    now = datetime.now(timezone.utc)
+    async with AsyncSessionLocal() as session:
+        # Nothing runs yet, so a running row was cut off by the last shutdown.
+        interrupted = await job_run_repo.fail_running_job_runs(session, now)
+        if interrupted:
+            logger.warning(
+                "Interrupted scheduler runs marked as failed",
+                extra={"count": interrupted},
+            )
+        last_runs = await job_run_repo.get_last_successful_runs(session)
+        await job_run_repo.delete_job_runs_before(session, now - JOB_RUN_RETENTION)
+        await outbox_repo.delete_sent_outbox_messages_before(
+            session, now - OUTBOX_RETENTION
+        )
+        await session.commit()
+        if settings.revoke_jobs_enabled:
+            await deadlines.schedule_next_access_deadline(session)
+    for job_id, due_at in plan_catch_up(scheduler, last_runs, now).items():
+        scheduler.modify_job(job_id, next_run_time=due_at)
+        logger.info(
+            "Scheduler job resumed from run history",
+            extra={"job": job_id, "next_run_time": due_at.isoformat()},
+        )
@@ -0,0 +1,214 @@
+import logging
+from datetime import datetime, timedelta, timezone
+
+from aiogram import Bot
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.access_control.service import (
+    AccessChangeResult,
+    ban_in_chat,
+    grant_in_chat,
+    revoke_invite_link,
+)
+from bot.db.models import AccessOperation, AccessOperationKind, AccessOperationStatus
+from bot.repositories import access_operations as access_operation_repo
+from bot.repositories import users as user_repo
+from bot.services.entitlements import has_valid_access
+from bot.services.invite_links import (
+    grant_access_with_links,
+    load_reusable_links,
+    remember_invite_links,
+)
+from bot.services.texts import get_text
+from bot.ui.keyboards import access_links_kb
+from bot.utils.rate_limit import telegram_rate_limiter
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+RETRY_BATCH_SIZE = 20
+RETRY_BASE_DELAY = timedelta(seconds=30)
+RETRY_MAX_DELAY = timedelta(hours=1)
+# Longer than a batch of Telegram calls takes, so a lease never expires while
+# its operation is still running.
+CLAIM_LEASE = timedelta(minutes=10)
+
+
+def retry_delay(attempts: int) -> timedelta:
+    return min(RETRY_BASE_DELAY * 2 ** max(0, attempts - 1), RETRY_MAX_DELAY)
+
+
+async def enqueue_failed_grant(
+    session: AsyncSession, user_id: int, result: AccessChangeResult
+) -> None:
+    chat_ids = []
+    if not result.channel_ok:
+        chat_ids.append(settings.primary_channel_id)
+    if not result.group_ok:
+        chat_ids.append(settings.secondary_discussion_id)
+    await access_operation_repo.enqueue_access_operations(
+        session,
+        user_id,
+        chat_ids,
+        AccessOperationKind.GRANT,
+        datetime.now(timezone.utc),
+    )
+
+
+async def grant_access_or_enqueue(
+    session: AsyncSession, bot: Bot, user_id: int, tg_id: int
+) -> AccessChangeResult:
+    """Grant access, queueing a retry for every chat Telegram refused."""
+    result = await grant_access_with_links(session, bot, user_id, tg_id)
+    if not result.successful:
+        await enqueue_failed_grant(session, user_id, result)
+    return result
+
+
+async def enqueue_failed_revoke(
+    session: AsyncSession, user_id: int, result: AccessChangeResult
+) -> None:
+    # revoke_access stops after a failed channel ban, so only the group half
+    # can be left behind.
+    if result.channel_ok and not result.group_ok:
+        await access_operation_repo.enqueue_access_operations(
+            session,
+            user_id,
+            [settings.secondary_discussion_id],
+            AccessOperationKind.BAN,
+            datetime.now(timezone.utc),
+        )
+
+
+async def _send_retry_link(
+    session: AsyncSession, bot: Bot, operation: AccessOperation, tg_id: int, link: str
+) -> None:
+    if operation.chat_id == settings.primary_channel_id:
+        kb = access_links_kb(link, None)
+    else:
+        kb = access_links_kb(None, link)
+    text = await get_text(session, "access_link_retry")
+    await session.commit()
+    await telegram_rate_limiter.acquire()
+    try:
+        await bot.send_message(tg_id, text, reply_markup=kb)
+    except Exception:
+        logger.exception(
+            "Failed to send retried access link",
+            extra={"user_id": operation.user_id, "chat_id": operation.chat_id},
+        )
+
+
+async def _run_operation(
+    session: AsyncSession,
+    bot: Bot,
+    user_id: int,
+    chat_id: int,
+    kind: str,
+    now: datetime,
+) -> tuple[str, tuple[int, str] | None]:
+    """Return the outcome and, for a grant, the user's tg_id and issued link.
+
+    The decision is taken under the user lock, which is released before
+    Telegram is called.
+    """
+    user = await user_repo.lock_user_by_id(session, user_id)
+    if user is None:
+        return AccessOperationStatus.CANCELED, None
+    # Access may have changed since the operation was queued: a payment makes a
+    # pending ban stale, an expiry makes a pending grant stale.
+    keep_access = await has_valid_access(session, user.id, now)
+    tg_id = user.tg_id
+    if kind == AccessOperationKind.BAN:
+        if keep_access or tg_id in settings.admin_tg_ids:
+            return AccessOperationStatus.CANCELED, None
+        await session.commit()
+        if await ban_in_chat(bot, chat_id, tg_id):
+            return AccessOperationStatus.DONE, None
+        return AccessOperationStatus.PENDING, None
+
+    if not keep_access:
+        return AccessOperationStatus.CANCELED, None
+    known = await load_reusable_links(session, user.id, now)
+    await session.commit()
+    link = await grant_in_chat(bot, chat_id, tg_id, known.get(chat_id))
+    if link is None:
+        return AccessOperationStatus.PENDING, None
+    # A revoke or expiry may have landed during the call: without the link the
+    # unban alone lets nobody in.
+    user = await user_repo.lock_user_by_id(session, user_id)
+    if user is None or not await has_valid_access(session, user.id, now):
+        await session.commit()
+        await revoke_invite_link(bot, chat_id, link)
+        return AccessOperationStatus.CANCELED, None
+    await remember_invite_links(session, user.id, {chat_id: link}, known, now)
+    return AccessOperationStatus.DONE, (tg_id, link)
+
+
+def _apply_result(
+    operation: AccessOperation, status: str, now: datetime, error: str | None
+) -> None:
+    if error is not None:
+        operation.last_error = error
+    if status != AccessOperationStatus.PENDING:
+        operation.status = status
+        return
+    operation.attempts += 1
+    if operation.attempts >= settings.access_retry_max_attempts:
+        operation.status = AccessOperationStatus.FAILED
+        logger.error(
+            "Access operation gave up",
+            extra={
+                "operation_id": operation.id,
+                "user_id": operation.user_id,
+                "chat_id": operation.chat_id,
+                "kind": operation.kind,
+            },
+        )
+        return
+    operation.next_attempt_at = now + retry_delay(operation.attempts)
+
+
+async def process_access_operations(session: AsyncSession, bot: Bot) -> int:
+    """Retry due per-chat operations; return how many were finished.
+
+    Every operation runs in its own short transactions, so no row or user lock
+    is held across Telegram calls.
+    """
+    now = datetime.now(timezone.utc)
+    lease_until = now + CLAIM_LEASE
+    operations = await access_operation_repo.claim_due_access_operations(
+        session, now, RETRY_BATCH_SIZE, lease_until
+    )
+    await session.commit()
+    finished = 0
+    # Plain values: a rollback below expires every claimed row.
+    claimed = [(op.id, op.user_id, op.chat_id, op.kind) for op in operations]
+    for operation_id, user_id, chat_id, kind in claimed:
+        issued = error = None
+        try:
+            status, issued = await _run_operation(
+                session, bot, user_id, chat_id, kind, now
+            )
+        except Exception as exc:
+            await session.rollback()
+            logger.exception(
+                "Access operation crashed",
+                extra={"operation_id": operation_id, "kind": kind},
+            )
+            status, error = AccessOperationStatus.PENDING, repr(exc)
+
+        operation = await access_operation_repo.get_leased_operation(
+            session, operation_id, lease_until
+        )
+        if operation is None:
+            await session.commit()
+            continue
+        _apply_result(operation, status, now, error)
+        await session.commit()
+        if status != AccessOperationStatus.PENDING:
+            finished += 1
+        if issued is not None:
+            tg_id, link = issued
+            await _send_retry_link(session, bot, operation, tg_id, link)
+    return finished
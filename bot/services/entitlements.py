@@ -51,3 +51,43 @@ async def has_valid_access(
         .limit(1)
     )
     return (await session.execute(paid_query)).scalar_one_or_none() is not None
+
+
+async def users_with_valid_access(
+    session: AsyncSession,
+    user_ids: Collection[int],
+    now: datetime,
+    *,
+    exclude_membership_ids: Collection[int] = (),
+) -> set[int]:
+    """Batch form of :func:`has_valid_access` for many users at once."""
+    if not user_ids:
+        return set()
+    exempt = await session.execute(
+        select(User.id).where(User.id.in_(user_ids)).where(User.access_exempt.is_(True))
+    )
+    protected = set(exempt.scalars().all())
+
+    membership_query = (
+        select(Membership.user_id)
+        .where(Membership.user_id.in_(user_ids))
+        .where(Membership.status == MembershipStatus.ACTIVE)
+        .where(Membership.grace_end_at >= now)
+        .distinct()
+    )
+    if exclude_membership_ids:
+        membership_query = membership_query.where(
+            Membership.id.notin_(exclude_membership_ids)
+        )
+    protected.update((await session.execute(membership_query)).scalars().all())
+
+    paid_query = (
+        select(Payment.user_id)
+        .join(Flow, Payment.flow_id == Flow.id)
+        .where(Payment.user_id.in_(user_ids))
+        .where(Payment.status == PaymentStatus.PAID)
+        .where(Flow.end_at > now)
+        .distinct()
+    )
+    protected.update((await session.execute(paid_query)).scalars().all())
+    return protected
@@ -0,0 +1,101 @@
+import asyncio
+import logging
+from collections.abc import Iterable, Mapping
+from datetime import datetime, timedelta, timezone
+
+from aiogram import Bot
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.access_control.service import (
+    INVITE_LINK_TTL,
+    AccessChangeResult,
+    grant_access,
+    revoke_invite_link,
+)
+from bot.repositories import invite_links as invite_link_repo
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+async def load_reusable_links(
+    session: AsyncSession, user_id: int, now: datetime
+) -> dict[int, str]:
+    # A link about to expire is not worth sending: the user may open it late.
+    valid_until = now + timedelta(minutes=settings.invite_link_min_remaining_minutes)
+    return await invite_link_repo.get_reusable_links(session, user_id, valid_until)
+
+
+async def remember_invite_links(
+    session: AsyncSession,
+    user_id: int,
+    issued: Mapping[int, str | None],
+    known: Mapping[int, str],
+    now: datetime,
+) -> None:
+    """Store links created just now; reused ones keep their original expiry."""
+    created = {
+        chat_id: link
+        for chat_id, link in issued.items()
+        if link is not None and link != known.get(chat_id)
+    }
+    if created:
+        await invite_link_repo.save_invite_links(
+            session, user_id, created, now + INVITE_LINK_TTL, now
+        )
+
+
+async def grant_access_with_links(
+    session: AsyncSession, bot: Bot, user_id: int, tg_id: int
+) -> AccessChangeResult:
+    """grant_access that hands out the user's still-valid links again.
+
+    The session is only used before and after the Telegram calls.
+    """
+    now = datetime.now(timezone.utc)
+    known = await load_reusable_links(session, user_id, now)
+    result = await grant_access(bot, tg_id, known)
+    await remember_invite_links(
+        session,
+        user_id,
+        {
+            settings.primary_channel_id: result.channel_link,
+            settings.secondary_discussion_id: result.group_link,
+        },
+        known,
+        now,
+    )
+    return result
+
+
+async def revoke_user_invite_links(
+    session: AsyncSession,
+    bot: Bot,
+    user_id: int,
+    chat_ids: Iterable[int] | None = None,
+) -> int:
+    """Revoke the user's live links in Telegram; return how many were revoked.
+
+    Links that failed to revoke stay active and expire on their own; join
+    requests are still checked against the user's access.
+    """
+    now = datetime.now(timezone.utc)
+    links = await invite_link_repo.list_active_links(session, user_id, now, chat_ids)
+    if not links:
+        return 0
+    revoked = await asyncio.gather(
+        *(revoke_invite_link(bot, link.chat_id, link.invite_link) for link in links)
+    )
+    link_ids = [link.id for link, ok in zip(links, revoked) if ok]
+    await invite_link_repo.mark_links_revoked(session, link_ids, now)
+    return len(link_ids)
+
+
+async def purge_expired_invite_links(session: AsyncSession) -> int:
+    deleted = await invite_link_repo.delete_expired_invite_links(
+        session, datetime.now(timezone.utc)
+    )
+    await session.commit()
+    if deleted:
+        logger.info("Expired invite links deleted", extra={"count": deleted})
+    return deleted
@@ -1,6 +1,6 @@
 import asyncio
 import logging
-from datetime import datetime, time, timedelta, timezone
+from datetime import date, datetime, time, timedelta, timezone
 from zoneinfo import ZoneInfo
 
 from aiogram import Bot
@@ -10,6 +10,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from bot.admin.templates import DEFAULT_TEMPLATES
 from bot.db.models import (
     Flow,
+    MailingEvent,
+    MailingEventStatus,
     Membership,
     MembershipStatus,
     Payment,
@@ -17,9 +19,18 @@ from bot.db.models import (
     User,
 )
 from bot.repositories import flows as flow_repo
-from bot.repositories.audit_log import add_audit_log, has_action_with_key
-from bot.repositories.message_templates import get_template_by_key
-from bot.services.settings import get_mailings_enabled
+from bot.repositories import mailing_events as mailing_event_repo
+from bot.repositories.audit_log import (
+    add_audit_log,
+    has_action_with_key,
+    list_existing_action_keys,
+)
+from bot.repositories.message_templates import (
+    get_template_by_key,
+    get_templates_by_keys,
+)
+from bot.utils.job_budget import JobBudget
+from bot.utils.telegram_session import telegram_breaker
 from config import settings
 
 logger = logging.getLogger(__name__)
@@ -122,56 +133,6 @@ async def _get_template_text(session: AsyncSession, key: str) -> str:
     return DEFAULT_TEMPLATES.get(key, "")
 
 
-async def send_flow_mailings(
-    session: AsyncSession, bot: Bot, flow_id: int, flow_start: datetime
-) -> tuple[int, int]:
-    tz = ZoneInfo(settings.scheduler_timezone)
-    now_utc = datetime.now(timezone.utc)
-    enabled = await get_mailings_enabled(session)
-    now_local_date = now_utc.astimezone(tz).date()
-    flow_start_local_date = flow_start.astimezone(tz).date()
-    days_before = (flow_start_local_date - now_local_date).days
-
-    if days_before not in (7, 3):
-        return 0, 0
-
-    flow = await flow_repo.get_flow_by_id(session, flow_id)
-    already_in_target_flow = await _get_flow_participant_user_ids(session, flow_id)
-    active_ids = await _get_active_user_ids(session, now_utc)
-    former_ids = await _get_former_user_ids(session)
-    active_ids = [uid for uid in active_ids if uid not in already_in_target_flow]
-    former_ids = [uid for uid in former_ids if uid not in already_in_target_flow]
-
-    active_key = f"flow:{flow_id}:active:{days_before}"
-    former_key = f"flow:{flow_id}:former:{days_before}"
-
-    active_text = await _get_template_text(session, f"mailing_active_{days_before}")
-    former_text = await _get_template_text(session, f"mailing_former_{days_before}")
-
-    # Критично: рассылки должны быть идемпотентными и с анти-спам ограничением.
-    sent_active = await _send_bulk(session, bot, active_ids, active_text, active_key)
-    sent_former = await _send_bulk(session, bot, former_ids, former_text, former_key)
-    logger.info(
-        "Flow start mailings sent",
-        extra={
-            "enabled": enabled,
-            "tz": settings.scheduler_timezone,
-            "now_local_date": str(now_local_date),
-            "flow_start_local_date": str(flow_start_local_date),
-            "flow_id": flow_id,
-            "days_before": days_before,
-            "flow_start_at": flow_start.isoformat(),
-            "flow_end_at": flow.end_at.isoformat() if flow else None,
-            "active_users_count": len(active_ids),
-            "former_users_count": len(former_ids),
-            "excluded_already_in_target_flow": len(already_in_target_flow),
-            "sent_active": sent_active,
-            "sent_former": sent_former,
-        },
-    )
-    return sent_active, sent_former
-
-
 async def send_custom_broadcast(
     session: AsyncSession, bot: Bot, audience: str, text: str
 ) -> int:
@@ -232,145 +193,262 @@ async def _get_current_unpaid_transition_user_ids(
     return result
 
 
-async def send_auto_end_mailings(session: AsyncSession, bot: Bot, now: datetime) -> int:
+MAILING_SEND_TIME = time(10, 0)
+MAILING_CHUNK_SIZE = 20
+# Unstarted events missed by more than this (downtime, failing job, open
+# breaker) are expired instead of arriving days late.
+MAILING_CATCH_UP_DAYS = 2
+
+MAILING_AUDIENCE_ACTIVE = "active"
+MAILING_AUDIENCE_FORMER = "former"
+MAILING_AUDIENCE_FLOW = "flow"
+
+MAILING_AUDIENCE_LABELS = {
+    MAILING_AUDIENCE_ACTIVE: "активные",
+    MAILING_AUDIENCE_FORMER: "бывшие",
+    MAILING_AUDIENCE_FLOW: "участницы потока",
+}
+
+# (days before start, template, audience) for every flow.
+_START_MAILINGS = [
+    (7, "mailing_active_7", MAILING_AUDIENCE_ACTIVE),
+    (7, "mailing_former_7", MAILING_AUDIENCE_FORMER),
+    (3, "mailing_active_3", MAILING_AUDIENCE_ACTIVE),
+    (3, "mailing_former_3", MAILING_AUDIENCE_FORMER),
+]
+# (days before end, template) for the flow's own participants.
+_FREE_END_MAILINGS = [(7, "free_end_minus_7"), (3, "free_end_minus_3")]
+_PAID_END_MAILINGS = [(3, "paid_end_minus_3"), (1, "paid_end_minus_1")]
+
+
+def plan_flow_mailing_events(flow: Flow) -> list[tuple[date, str, str]]:
+    """Return (local send date, template, audience) for every flow mailing."""
     tz = ZoneInfo(settings.scheduler_timezone)
-    now_utc = now.astimezone(timezone.utc)
-    enabled = await get_mailings_enabled(session)
-    today_local = now_utc.astimezone(tz).date()
-    window_start = datetime.combine(today_local - timedelta(days=7), time.min, tz)
-    window_end = datetime.combine(today_local + timedelta(days=1), time.max, tz)
-    result = await session.execute(
-        select(Flow).where(Flow.end_at >= window_start, Flow.end_at <= window_end)
+    start_local = flow.start_at.astimezone(tz).date()
+    end_local = flow.end_at.astimezone(tz).date()
+    events = [
+        (start_local - timedelta(days=days), template_key, audience)
+        for days, template_key, audience in _START_MAILINGS
+    ]
+    end_mailings = _FREE_END_MAILINGS if flow.is_free else _PAID_END_MAILINGS
+    events.extend(
+        (end_local - timedelta(days=days), template_key, MAILING_AUDIENCE_FLOW)
+        for days, template_key in end_mailings
+    )
+    return events
+
+
+async def schedule_flow_mailings(
+    session: AsyncSession, flow: Flow, now: datetime | None = None
+) -> None:
+    """Materialize the mailing calendar of a created or edited flow."""
+    now = now or datetime.now(timezone.utc)
+    today_local = now.astimezone(ZoneInfo(settings.scheduler_timezone)).date()
+    await mailing_event_repo.replace_planned_flow_events(
+        session,
+        flow.id,
+        [event for event in plan_flow_mailing_events(flow) if event[0] >= today_local],
+        today_local,
     )
-    flows = list(result.scalars().all())
-    total_sent = 0
-    sent_flows = 0
-    for flow in flows:
-        end_date_local = flow.end_at.astimezone(tz).date()
-        template_key: str | None = None
-        if flow.is_free:
-            if today_local == end_date_local - timedelta(days=7):
-                template_key = "free_end_minus_7"
-            elif today_local == end_date_local - timedelta(days=3):
-                template_key = "free_end_minus_3"
-        else:
-            if today_local == end_date_local - timedelta(days=3):
-                template_key = "paid_end_minus_3"
-            elif today_local == end_date_local - timedelta(days=1):
-                template_key = "paid_end_minus_1"
-
-        if not template_key:
-            continue
 
-        key = f"auto:{template_key}:{flow.id}:{today_local}"
-        if await has_action_with_key(session, "mailing_sent", key):
-            continue
 
-        user_ids = await _get_active_flow_user_ids(session, flow.id, now_utc)
-        next_paid_flow = await flow_repo.get_next_paid_flow(session, flow.end_at)
-        already_in_next_paid_flow: set[int] = set()
-        if next_paid_flow is not None:
-            already_in_next_paid_flow = await _get_flow_participant_user_ids(
-                session, next_paid_flow.id
-            )
-            user_ids = [uid for uid in user_ids if uid not in already_in_next_paid_flow]
-        if not user_ids:
-            await add_audit_log(
-                session, action="mailing_sent", payload={"key": key, "count": 0}
-            )
-            continue
+async def sync_mailing_calendar(session: AsyncSession) -> None:
+    # Picks up flows created before the calendar existed and timezone changes.
+    now = datetime.now(timezone.utc)
+    for flow in await flow_repo.list_flows_ending_after(session, now):
+        await schedule_flow_mailings(session, flow, now)
+
+
+async def _build_event_audience(
+    session: AsyncSession, event: MailingEvent, flow: Flow, now: datetime
+) -> list[int]:
+    if event.audience == MAILING_AUDIENCE_ACTIVE:
+        return await _get_active_user_ids(session, now)
+    if event.audience == MAILING_AUDIENCE_FORMER:
+        return await _get_former_user_ids(session)
+    return await _get_active_flow_user_ids(session, flow.id, now)
+
+
+async def _event_exclusions(
+    session: AsyncSession, event: MailingEvent, flow: Flow
+) -> set[int]:
+    # Evaluated at send time even for pre-built audiences: somebody who paid
+    # overnight must not get the reminder.
+    if event.audience != MAILING_AUDIENCE_FLOW:
+        return await _get_flow_participant_user_ids(session, flow.id)
+    next_paid_flow = await flow_repo.get_next_paid_flow(session, flow.end_at)
+    if next_paid_flow is None:
+        return set()
+    return await _get_flow_participant_user_ids(session, next_paid_flow.id)
 
-        text = await _get_template_text(session, template_key)
-        sent = await _send_bulk(
+
+async def prepare_mailing_audiences(session: AsyncSession, now: datetime) -> int:
+    """Pre-build recipient lists of tomorrow's mailings."""
+    tz = ZoneInfo(settings.scheduler_timezone)
+    tomorrow_local = now.astimezone(tz).date() + timedelta(days=1)
+    events = await mailing_event_repo.list_planned_events_on(session, tomorrow_local)
+    for event, flow in events:
+        event.recipients = await _build_event_audience(session, event, flow, now)
+    logger.info(
+        "Mailing audiences prepared",
+        extra={"send_on": str(tomorrow_local), "events": len(events)},
+    )
+    return len(events)
+
+
+async def send_due_mailings(
+    session: AsyncSession, bot: Bot, now: datetime, budget: JobBudget | None = None
+) -> int:
+    """Send calendar events due by the local today, within a time budget.
+
+    Events missed by up to MAILING_CATCH_UP_DAYS are still sent. Progress is
+    stored on the event, so an unfinished mailing continues on a later tick,
+    even after midnight, instead of holding the scheduler.
+    """
+    budget = budget or JobBudget(settings.job_time_budget_seconds)
+    tz = ZoneInfo(settings.scheduler_timezone)
+    now_local = now.astimezone(tz)
+    if now_local.time() < MAILING_SEND_TIME:
+        return 0
+    today_local = now_local.date()
+    not_before = today_local - timedelta(days=MAILING_CATCH_UP_DAYS)
+    expired = await mailing_event_repo.expire_stale_events(session, not_before)
+    if expired:
+        logger.warning(
+            "Calendar mailings expired unsent",
+            extra={"event_ids": expired, "not_before": str(not_before)},
+        )
+    await session.commit()
+    events = await mailing_event_repo.list_due_events(session, today_local, not_before)
+    total_sent = 0
+    finished = 0
+    for event, flow in events:
+        if budget.exhausted:
+            break
+        if event.sent_count is None:
+            # First tick for this event: freeze the audience so later chunks
+            # work through a stable list.
+            user_ids = event.recipients
+            if user_ids is None:
+                user_ids = await _build_event_audience(session, event, flow, now)
+            excluded = await _event_exclusions(session, event, flow)
+            event.recipients = [uid for uid in user_ids if uid not in excluded]
+            event.cursor = 0
+            event.sent_count = 0
+            await session.commit()
+        text = await _get_template_text(session, event.template_key)
+        recipients = event.recipients or []
+        # Stop between chunks once Telegram is known to be down; the rest of
+        # the audience is sent by a later tick.
+        while (
+            event.cursor < len(recipients)
+            and not budget.exhausted
+            and not telegram_breaker.is_open
+        ):
+            chunk = recipients[event.cursor : event.cursor + MAILING_CHUNK_SIZE]
+            sent = await _send_bulk(
+                session, bot, chunk, text, mailing_key=None, idempotent=False
+            )
+            event.cursor += len(chunk)
+            event.sent_count += sent
+            total_sent += sent
+            await session.commit()
+        if event.cursor < len(recipients):
+            break
+
+        event.status = MailingEventStatus.SENT
+        event.sent_at = datetime.now(timezone.utc)
+        await add_audit_log(
             session,
-            bot,
-            user_ids,
-            text,
-            mailing_key=key,
-            idempotent=True,
+            "mailing_sent",
+            {"key": f"mailing_event:{event.id}", "count": event.sent_count},
         )
-        total_sent += sent
-        sent_flows += 1
+        await session.commit()
+        finished += 1
         logger.info(
-            "Auto end mailing sent",
+            "Calendar mailing sent",
             extra={
-                "enabled": enabled,
-                "tz": settings.scheduler_timezone,
-                "today_local": str(today_local),
-                "template_key": template_key,
+                "event_id": event.id,
                 "flow_id": flow.id,
-                "flow_start_at": flow.start_at.isoformat(),
-                "flow_end_at": flow.end_at.isoformat(),
-                "end_date_local": str(end_date_local),
-                "next_paid_flow_id": next_paid_flow.id if next_paid_flow else None,
-                "excluded_already_in_next_paid": len(already_in_next_paid_flow),
-                "recipients_count": len(user_ids),
-                "sent": sent,
+                "template_key": event.template_key,
+                "audience": event.audience,
+                "recipients_count": len(recipients),
+                "sent": event.sent_count,
             },
         )
     logger.info(
-        "Auto end mailings run",
+        "Calendar mailings tick",
         extra={
-            "enabled": enabled,
             "tz": settings.scheduler_timezone,
             "today_local": str(today_local),
-            "window_start_local": str(window_start),
-            "window_end_local": str(window_end),
-            "flows_considered": len(flows),
-            "sent_flows": sent_flows,
-            "total_sent": total_sent,
+            "events": len(events),
+            "expired": len(expired),
+            "finished": finished,
+            "sent": total_sent,
         },
     )
     return total_sent
 
 
+PAY_LATER_REMINDER_TEMPLATES = {
+    0: "pay_later_deadline_today",
+    1: "pay_later_deadline_minus_1",
+}
+
+
 async def send_pay_later_deadline_reminders(
     session: AsyncSession, bot: Bot, now: datetime
 ) -> int:
     tz = ZoneInfo(settings.scheduler_timezone)
     now_utc = now.astimezone(timezone.utc)
     today_local = now_utc.astimezone(tz).date()
+    # Deadlines falling on the local "today" or "tomorrow", as a UTC range the
+    # database can filter on.
+    window_start = datetime.combine(today_local, time.min, tz)
+    window_end = datetime.combine(today_local + timedelta(days=2), time.min, tz)
 
     result = await session.execute(
-        select(Membership)
+        select(
+            Membership.id,
+            Membership.user_id,
+            Membership.pay_later_deadline_at,
+            User.tg_id,
+        )
+        .join(User, User.id == Membership.user_id)
         .where(Membership.status == MembershipStatus.ACTIVE)
-        .where(Membership.pay_later_deadline_at.is_not(None))
+        .where(Membership.pay_later_deadline_at >= window_start)
+        .where(Membership.pay_later_deadline_at < window_end)
     )
-    memberships = list(result.scalars().all())
+    candidates = []
+    for membership_id, user_id, deadline, tg_id in result.all():
+        days_left = (deadline.astimezone(tz).date() - today_local).days
+        template_key = PAY_LATER_REMINDER_TEMPLATES[days_left]
+        key = f"auto:{template_key}:membership:{membership_id}:{today_local}"
+        candidates.append((key, template_key, membership_id, user_id, tg_id))
+
+    already_sent = await list_existing_action_keys(
+        session, "mailing_sent", [candidate[0] for candidate in candidates]
+    )
+    candidates = [c for c in candidates if c[0] not in already_sent]
+    texts = {}
+    if candidates:
+        template_keys = list(PAY_LATER_REMINDER_TEMPLATES.values())
+        stored = await get_templates_by_keys(session, template_keys)
+        texts = {
+            key: stored.get(key, DEFAULT_TEMPLATES.get(key, ""))
+            for key in template_keys
+        }
 
     sent = 0
-    for membership in memberships:
-        deadline = membership.pay_later_deadline_at
-        if deadline is None:
-            continue
-        deadline_local = deadline.astimezone(tz).date()
-        template_key: str | None = None
-        if today_local == deadline_local - timedelta(days=1):
-            template_key = "pay_later_deadline_minus_1"
-        elif today_local == deadline_local:
-            template_key = "pay_later_deadline_today"
-
-        if template_key is None:
-            continue
-
-        key = f"auto:{template_key}:membership:{membership.id}:{today_local}"
-        if await has_action_with_key(session, "mailing_sent", key):
-            continue
-
-        user = await session.get(User, membership.user_id)
-        if user is None:
-            await add_audit_log(session, "mailing_sent", {"key": key, "count": 0})
-            continue
-
-        text = await _get_template_text(session, template_key)
+    for key, template_key, membership_id, user_id, tg_id in candidates:
         try:
-            await bot.send_message(user.tg_id, text)
+            await bot.send_message(tg_id, texts[template_key])
             sent += 1
             await add_audit_log(session, "mailing_sent", {"key": key, "count": 1})
         except Exception:
             logger.warning(
                 "Failed to deliver pay-later reminder",
-                extra={"user_id": membership.user_id, "membership_id": membership.id},
+                extra={"user_id": user_id, "membership_id": membership_id},
                 exc_info=True,
             )
             await add_audit_log(session, "mailing_sent", {"key": key, "count": 0})
@@ -380,7 +458,8 @@ async def send_pay_later_deadline_reminders(
         extra={
             "tz": settings.scheduler_timezone,
             "today_local": str(today_local),
-            "memberships_checked": len(memberships),
+            "already_sent": len(already_sent),
+            "candidates": len(candidates),
             "sent": sent,
         },
     )
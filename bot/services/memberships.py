@@ -5,6 +5,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from bot.db.models import Membership, MembershipStatus, Payment
 from bot.repositories import memberships as membership_repo
+from bot.scheduler.deadlines import schedule_membership_deadline
 from bot.services.flows import get_next_paid_flow
 from bot.services.settings import get_effective_settings
 
@@ -48,6 +49,7 @@ async def upsert_membership_for_flow(
             last_payment_id=payment.id,
         )
         session.add(membership)
+        schedule_membership_deadline(membership)
         return membership
 
     membership.status = MembershipStatus.ACTIVE
@@ -55,6 +57,7 @@ async def upsert_membership_for_flow(
     membership.access_end_at = access_end_at
     membership.grace_end_at = compute_grace_end(access_end_at, effective.grace_days)
     membership.last_payment_id = payment.id
+    schedule_membership_deadline(membership)
     return membership
 
 
@@ -75,6 +78,7 @@ async def apply_pay_later(
     membership.pay_later_deadline_at = deadline
     membership.access_end_at = max(membership.access_end_at, deadline)
     membership.grace_end_at = deadline + timedelta(days=effective.grace_days)
+    schedule_membership_deadline(membership)
 
     return True, f"Отсрочка активна до {deadline.strftime('%d.%m.%Y')}."
 
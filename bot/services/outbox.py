@@ -0,0 +1,255 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session
+
+from bot.access_control.service import revoke_invite_link
+from bot.db.models import OutboxKind, OutboxMessage, OutboxStatus
+from bot.repositories import outbox as outbox_repo
+from bot.repositories import users as user_repo
+from bot.services.access_operations import grant_access_or_enqueue
+from bot.services.entitlements import has_valid_access
+from bot.services.texts import get_text
+from bot.ui.keyboards import access_links_kb
+from bot.utils.rate_limit import telegram_rate_limiter
+from bot.utils.telegram_session import telegram_breaker
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+RETRY_BASE_DELAY = timedelta(seconds=10)
+RETRY_MAX_DELAY = timedelta(minutes=30)
+IDLE_POLL_SECONDS = 5.0
+# Longer than one delivery can take, so a lease never expires mid-delivery.
+CLAIM_LEASE = timedelta(minutes=5)
+# Set on a session that queued messages, so its commit wakes the dispatchers.
+_ENQUEUED = "outbox_enqueued"
+
+_dispatchers: set["OutboxDispatcher"] = set()
+
+
+def retry_delay(attempts: int) -> timedelta:
+    return min(RETRY_BASE_DELAY * 2 ** max(0, attempts - 1), RETRY_MAX_DELAY)
+
+
+async def enqueue_outbox(
+    session: AsyncSession,
+    user_id: int,
+    kind: str,
+    payload: dict | None = None,
+    *,
+    dedupe_key: str | None = None,
+) -> bool:
+    """Queue a side effect in the caller's transaction; delivered after commit."""
+    added = await outbox_repo.add_outbox_message(
+        session,
+        user_id,
+        kind,
+        payload or {},
+        datetime.now(timezone.utc),
+        dedupe_key=dedupe_key,
+    )
+    if added:
+        session.info[_ENQUEUED] = True
+    return added
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_after_commit(session: Session) -> None:
+    if session.info.pop(_ENQUEUED, False):
+        for dispatcher in list(_dispatchers):
+            dispatcher.wake()
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_after_rollback(session: Session, previous_transaction) -> None:
+    session.info.pop(_ENQUEUED, None)
+
+
+async def _send(bot: Bot, tg_id: int, text: str, reply_markup=None) -> None:
+    await telegram_rate_limiter.acquire()
+    try:
+        await bot.send_message(tg_id, text, reply_markup=reply_markup)
+    except TelegramForbiddenError:
+        # The user blocked the bot: retrying cannot deliver it.
+        logger.warning("Outbox message not delivered: bot blocked", exc_info=True)
+
+
+async def _grant_paid_access(
+    session: AsyncSession, bot: Bot, user_id: int, now: datetime
+) -> dict | None:
+    """Grant access unless it ended meanwhile; return the links or None.
+
+    Delivery may run long after the payment committed, so access is checked
+    under the user lock before and after the Telegram calls, neither of which
+    holds the lock.
+    """
+    user = await user_repo.lock_user_by_id(session, user_id)
+    if user is None or not await has_valid_access(session, user.id, now):
+        return None
+    tg_id = user.tg_id
+    await session.commit()
+    result = await grant_access_or_enqueue(session, bot, user_id, tg_id)
+    user = await user_repo.lock_user_by_id(session, user_id)
+    if user is None or not await has_valid_access(session, user.id, now):
+        await session.rollback()
+        for chat_id, link in (
+            (settings.primary_channel_id, result.channel_link),
+            (settings.secondary_discussion_id, result.group_link),
+        ):
+            if link:
+                await revoke_invite_link(bot, chat_id, link)
+        return None
+    return {"channel": result.channel_link, "group": result.group_link}
+
+
+async def deliver_outbox_message(
+    session: AsyncSession, bot: Bot, message: OutboxMessage
+) -> None:
+    """Perform one message's Telegram side effects; the caller marks it sent.
+
+    The grant of a PAID_ACCESS message is committed and recorded on the message
+    before the notice goes out, so a failed send is retried without unbanning
+    and issuing links again.
+    """
+    if message.kind == OutboxKind.PAID_ACCESS:
+        if "links" not in message.payload:
+            links = await _grant_paid_access(
+                session, bot, message.user_id, datetime.now(timezone.utc)
+            )
+            message.payload = {**message.payload, "links": links}
+            await session.commit()
+        links = message.payload["links"]
+        if links is None:
+            logger.info(
+                "Paid access not delivered: access ended before delivery",
+                extra={"message_id": message.id, "user_id": message.user_id},
+            )
+            return
+        kb = access_links_kb(links["channel"], links["group"])
+        template_key = (
+            "payment_success" if kb is not None else "payment_success_no_links"
+        )
+    elif message.kind == OutboxKind.PAYMENT_NOTICE:
+        kb = None
+        template_key = message.payload["template_key"]
+    else:
+        logger.error(
+            "Unknown outbox message kind",
+            extra={"message_id": message.id, "kind": message.kind},
+        )
+        return
+    user = await user_repo.get_user_by_id(session, message.user_id)
+    if user is None:
+        return
+    text = await get_text(session, template_key)
+    await session.commit()
+    await _send(bot, user.tg_id, text, kb)
+
+
+class OutboxDispatcher:
+    """Pool of workers delivering queued side effects after their commit."""
+
+    def __init__(
+        self,
+        bot: Bot,
+        sessionmaker: async_sessionmaker,
+        workers: int | None = None,
+    ) -> None:
+        self._bot = bot
+        self._sessionmaker = sessionmaker
+        self._workers = max(1, workers or settings.outbox_workers)
+        self._wakeup = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+
+    def wake(self) -> None:
+        self._wakeup.set()
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        _dispatchers.add(self)
+        self._tasks = [
+            asyncio.create_task(self._run(), name=f"outbox-{index}")
+            for index in range(self._workers)
+        ]
+
+    async def stop(self) -> None:
+        _dispatchers.discard(self)
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if await self.process_next():
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Outbox worker failed")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), IDLE_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def process_next(self) -> bool:
+        """Deliver one due message; return False when nothing is due."""
+        if telegram_breaker.is_open:
+            # Every delivery would fail fast and burn an attempt.
+            return False
+        async with self._sessionmaker() as session:
+            now = datetime.now(timezone.utc)
+            message = await outbox_repo.claim_next_outbox_message(
+                session, now, now + CLAIM_LEASE
+            )
+            if message is None:
+                return False
+            # The lease keeps other workers off the message; no lock is held
+            # during delivery.
+            await session.commit()
+            message_id = message.id
+            attempts = message.attempts + 1
+            try:
+                await deliver_outbox_message(session, self._bot, message)
+            except Exception as exc:
+                await session.rollback()
+                await self._reschedule(session, message_id, attempts, exc)
+                return True
+            message.status = OutboxStatus.SENT
+            message.attempts = attempts
+            message.sent_at = now
+            await session.commit()
+            return True
+
+    async def _reschedule(
+        self, session: AsyncSession, message_id: int, attempts: int, exc: Exception
+    ) -> None:
+        failed = attempts >= settings.outbox_max_attempts
+        logger.warning(
+            "Failed to deliver outbox message",
+            extra={"message_id": message_id, "attempts": attempts},
+            exc_info=exc,
+        )
+        if failed:
+            logger.error(
+                "Outbox message gave up after retries",
+                extra={"message_id": message_id, "attempts": attempts},
+            )
+        await outbox_repo.reschedule_outbox_message(
+            session,
+            message_id,
+            attempts=attempts,
+            next_attempt_at=datetime.now(timezone.utc) + retry_delay(attempts),
+            error=str(exc)[:1000],
+            failed=failed,
+        )
+        await session.commit()
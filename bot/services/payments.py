@@ -1,42 +1,37 @@
 import logging
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 
-from aiogram import Bot, types
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from bot.access_control.service import AccessChangeResult, grant_access
-from bot.db.models import Payment, PaymentStatus
+from bot.db.models import OutboxKind, Payment, PaymentStatus
 from bot.repositories import flows as flow_repo
 from bot.repositories import memberships as membership_repo
 from bot.repositories import users as user_repo
-from bot.repositories.audit_log import add_audit_log, has_action_with_key
 from bot.services import memberships as membership_service
+from bot.services.outbox import enqueue_outbox
 from bot.services.promos import apply_promo_to_price
 from bot.services.settings import get_effective_settings
-from bot.services.texts import get_text
-from bot.ui.keyboards import access_links_kb
+from config import settings
 
 logger = logging.getLogger(__name__)
 
 
-async def _notify_success_with_links_fallback(
-    session: AsyncSession,
-    bot: Bot,
-    user_id: int,
-    channel_link: str | None,
-    group_link: str | None,
-    dedupe_key: str | None = None,
-) -> None:
-    kb = access_links_kb(channel_link, group_link)
-    template_key = "payment_success" if kb is not None else "payment_success_no_links"
-    await notify_payment_status(
-        session,
-        bot,
-        user_id,
-        template_key,
-        kb,
-        dedupe_key=dedupe_key,
-    )
+def record_remote_snapshot(payment: Payment, remote: dict, now: datetime) -> None:
+    payment.remote_status = remote.get("status")
+    payment.remote_checked_at = now
+    confirmation_url = (remote.get("confirmation") or {}).get("confirmation_url")
+    if confirmation_url:
+        payment.confirmation_url = confirmation_url
+
+
+def has_fresh_pending_snapshot(payment: Payment, now: datetime) -> bool:
+    """Whether the stored snapshot is recent enough to show the invoice again."""
+    if payment.remote_status != "pending" or not payment.confirmation_url:
+        return False
+    if payment.remote_checked_at is None:
+        return False
+    window = timedelta(seconds=settings.payment_snapshot_fresh_seconds)
+    return now - payment.remote_checked_at <= window
 
 
 async def calculate_price_rub(
@@ -55,37 +50,18 @@ async def calculate_price_rub(
 
 async def notify_payment_status(
     session: AsyncSession,
-    bot: Bot,
     user_id: int,
     template_key: str,
-    reply_markup: types.InlineKeyboardMarkup | None = None,
     dedupe_key: str | None = None,
 ) -> None:
-    if dedupe_key and await has_action_with_key(
-        session, "payment_notice_sent", dedupe_key
-    ):
-        return
-    user = await user_repo.get_user_by_id(session, user_id)
-    if not user:
-        return
-    text = await get_text(session, template_key)
-    try:
-        await bot.send_message(user.tg_id, text, reply_markup=reply_markup)
-        if dedupe_key:
-            await add_audit_log(
-                session,
-                action="payment_notice_sent",
-                payload={
-                    "key": dedupe_key,
-                    "user_id": user_id,
-                    "template_key": template_key,
-                },
-            )
-    except Exception:
-        logger.exception(
-            "Failed to send payment status message",
-            extra={"user_id": user_id, "template_key": template_key},
-        )
+    """Queue a payment status message; it is sent once the caller commits."""
+    await enqueue_outbox(
+        session,
+        user_id,
+        OutboxKind.PAYMENT_NOTICE,
+        {"template_key": template_key},
+        dedupe_key=dedupe_key,
+    )
 
 
 async def resolve_flow_for_payment(
@@ -116,28 +92,26 @@ async def resolve_early_full_payment_flow(
 
 async def confirm_payment(
     session: AsyncSession,
-    bot: Bot,
     payment: Payment,
     paid_at: datetime | None = None,
     *,
     notify_user: bool = True,
-) -> AccessChangeResult | None:
+) -> bool:
+    """Mark the payment paid; return True when the user is owed access.
+
+    Telegram is not called while the user row is locked: with ``notify_user``
+    the grant and the success message are queued in the outbox, otherwise the
+    caller grants access itself after committing.
+    """
     # Automatic expiry jobs use the same row lock before revoking Telegram
     # access. Whichever decision starts second must see the first one's commit.
     user = await user_repo.lock_user_by_id(session, payment.user_id)
     if payment.status == PaymentStatus.PAID:
-        if user:
-            links = await grant_access(bot, user.tg_id)
-            if notify_user:
-                await _notify_success_with_links_fallback(
-                    session,
-                    bot,
-                    payment.user_id,
-                    links.channel_link,
-                    links.group_link,
-                )
-            return links
-        return None
+        if user is None:
+            return False
+        if notify_user:
+            await enqueue_outbox(session, user.id, OutboxKind.PAID_ACCESS)
+        return True
 
     paid_at = paid_at or datetime.now(timezone.utc)
     early_flow_id = await resolve_early_full_payment_flow(session, payment, paid_at)
@@ -156,12 +130,11 @@ async def confirm_payment(
         if notify_user:
             await notify_payment_status(
                 session,
-                bot,
                 payment.user_id,
                 "payment_needs_review",
                 dedupe_key=f"payment:{payment.id}:payment_needs_review",
             )
-        return None
+        return False
 
     payment.status = PaymentStatus.PAID
     payment.paid_at = paid_at
@@ -177,12 +150,11 @@ async def confirm_payment(
         if notify_user:
             await notify_payment_status(
                 session,
-                bot,
                 payment.user_id,
                 "payment_needs_review",
                 dedupe_key=f"payment:{payment.id}:payment_needs_review",
             )
-        return None
+        return False
     access_start_at = paid_at if early_flow_id else flow.start_at
     membership = await membership_service.upsert_membership_for_flow(
         session=session,
@@ -193,19 +165,14 @@ async def confirm_payment(
         payment=payment,
     )
 
-    links = None
-    if user:
-        links = await grant_access(bot, user.tg_id)
-        if notify_user:
-            await _notify_success_with_links_fallback(
-                session,
-                bot,
-                payment.user_id,
-                links.channel_link,
-                links.group_link,
-                dedupe_key=f"payment:{payment.id}:payment_success",
-            )
+    if user and notify_user:
+        await enqueue_outbox(
+            session,
+            user.id,
+            OutboxKind.PAID_ACCESS,
+            dedupe_key=f"payment:{payment.id}:payment_success",
+        )
     if membership.pay_later_deadline_at:
         membership.pay_later_deadline_at = None
         membership.pay_later_used_at = None
-    return links
+    return user is not None
@@ -0,0 +1,108 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+
+
+class CircuitState(str):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, name: str, retry_in: float) -> None:
+        super().__init__(f"{name} circuit is open, retry in {retry_in:.0f}s")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Fail fast while a dependency keeps failing.
+
+    ``failure_threshold`` consecutive failures open the circuit and calls are
+    refused for ``reset_seconds``. After that one probe call is let through
+    (half-open): success closes the circuit, failure opens it again. Errors
+    for which ``is_failure`` returns False mean the dependency answered and
+    count as success.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        failure_threshold: int,
+        reset_seconds: float,
+        is_failure: Callable[[BaseException], bool] = lambda exc: True,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.name = name
+        self._threshold = max(1, failure_threshold)
+        self._reset_seconds = reset_seconds
+        self._is_failure = is_failure
+        self._clock = clock
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return CircuitState.CLOSED
+        if self._clock() - self._opened_at < self._reset_seconds:
+            return CircuitState.OPEN
+        return CircuitState.HALF_OPEN
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == CircuitState.OPEN
+
+    def snapshot(self) -> dict:
+        state = self.state
+        data = {"state": state, "failures": self._failures}
+        if state == CircuitState.OPEN:
+            data["retry_in"] = round(self._retry_in(), 1)
+        return data
+
+    async def call(self, func: Callable[..., Awaitable[T]], *args, **kwargs) -> T:
+        self._before_call()
+        try:
+            result = await func(*args, **kwargs)
+        except asyncio.CancelledError:
+            self._probing = False
+            raise
+        except BaseException as exc:
+            if self._is_failure(exc):
+                self._record_failure()
+            else:
+                self._record_success()
+            raise
+        self._record_success()
+        return result
+
+    def _retry_in(self) -> float:
+        if self._opened_at is None:
+            return 0.0
+        return max(0.0, self._reset_seconds - (self._clock() - self._opened_at))
+
+    def _before_call(self) -> None:
+        state = self.state
+        if state == CircuitState.OPEN:
+            raise CircuitOpenError(self.name, self._retry_in())
+        if state == CircuitState.HALF_OPEN:
+            # Only one probe at a time; everybody else keeps failing fast.
+            if self._probing:
+                raise CircuitOpenError(self.name, 0.0)
+            self._probing = True
+
+    def _record_success(self) -> None:
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def _record_failure(self) -> None:
+        self._failures += 1
+        if self._probing or self._failures >= self._threshold:
+            self._opened_at = self._clock()
+        self._probing = False
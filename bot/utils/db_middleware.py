@@ -1,22 +1,45 @@
 from typing import Any, Awaitable, Callable, Dict
 
 from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
 from aiogram.types import TelegramObject
 
+from bot.db.io_guard import bind_session
+from bot.db.replica import read_only_session
 from bot.db.session import AsyncSessionLocal
 
 
+def _handler_name(data: Dict[str, Any]) -> str:
+    handler = data.get("handler")
+    callback = getattr(handler, "callback", None)
+    return getattr(callback, "__qualname__", "handler")
+
+
 class DbSessionMiddleware(BaseMiddleware):
+    """One session per update; its connection is only held between queries.
+
+    The session checks out a pool connection on its first query and returns it
+    on commit or rollback; network calls made while it is bound end read-only
+    transactions first (see bot.db.io_guard). Handlers registered with
+    ``flags={"read_only": True}`` get a read-only session that may be served
+    by the replica (see bot.db.replica).
+    """
+
     async def __call__(
         self,
         handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
         event: TelegramObject,
         data: Dict[str, Any],
     ) -> Any:
+        if get_flag(data, "read_only"):
+            async with read_only_session(_handler_name(data)) as session:
+                data["session"] = session
+                return await handler(event, data)
         async with AsyncSessionLocal() as session:
             data["session"] = session
-            try:
-                return await handler(event, data)
-            except Exception:
-                await session.rollback()
-                raise
+            with bind_session(session, _handler_name(data)):
+                try:
+                    return await handler(event, data)
+                except Exception:
+                    await session.rollback()
+                    raise
@@ -0,0 +1,29 @@
+"""Wall-clock budgets and resumable cursors for chunked scheduler jobs."""
+
+import time
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.repositories.app_settings import get_setting, set_setting
+
+
+class JobBudget:
+    def __init__(self, seconds: float):
+        self.deadline = time.monotonic() + seconds
+
+    @property
+    def exhausted(self) -> bool:
+        return time.monotonic() >= self.deadline
+
+
+def _cursor_key(job_id: str) -> str:
+    return f"job_cursor:{job_id}"
+
+
+async def load_cursor(session: AsyncSession, job_id: str) -> str | None:
+    return await get_setting(session, _cursor_key(job_id)) or None
+
+
+async def save_cursor(session: AsyncSession, job_id: str, value: str | None) -> None:
+    # An empty value means the next tick starts from the beginning.
+    await set_setting(session, _cursor_key(job_id), value or "")
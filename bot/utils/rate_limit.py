@@ -0,0 +1,27 @@
+import asyncio
+
+from config import settings
+
+
+class AsyncRateLimiter:
+    """Space out calls evenly so concurrent workers share one request budget."""
+
+    def __init__(self, rate_per_second: float) -> None:
+        self._interval = 1 / rate_per_second if rate_per_second > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if not self._interval:
+            return
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            now = loop.time()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self._interval
+        delay = slot - now
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+telegram_rate_limiter = AsyncRateLimiter(settings.telegram_rate_limit_per_second)
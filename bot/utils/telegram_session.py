@@ -0,0 +1,55 @@
+import asyncio
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.exceptions import TelegramNetworkError, TelegramServerError
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import TelegramType
+
+from bot.db.io_guard import before_network_io
+from bot.utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from config import settings
+
+
+class TelegramCircuitOpenError(TelegramNetworkError):
+    """Raised instead of calling Telegram while its circuit is open.
+
+    A TelegramAPIError, so existing handlers treat it like any other failed
+    Telegram call.
+    """
+
+
+def _is_telegram_failure(exc: BaseException) -> bool:
+    # Client errors (bad request, forbidden, flood control) mean Telegram
+    # answered; only transport problems and 5xx count against the circuit.
+    return isinstance(
+        exc, (TelegramNetworkError, TelegramServerError, asyncio.TimeoutError)
+    )
+
+
+telegram_breaker = CircuitBreaker(
+    "telegram",
+    failure_threshold=settings.circuit_failure_threshold,
+    reset_seconds=settings.circuit_reset_seconds,
+    is_failure=_is_telegram_failure,
+)
+
+
+class CircuitBreakerSession(AiohttpSession):
+    def __init__(self, breaker: CircuitBreaker = telegram_breaker, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.breaker = breaker
+
+    async def make_request(
+        self,
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+        timeout: int | None = None,
+    ) -> TelegramType:
+        await before_network_io(f"Telegram {type(method).__name__}")
+        try:
+            return await self.breaker.call(
+                super().make_request, bot, method, timeout=timeout
+            )
+        except CircuitOpenError as exc:
+            raise TelegramCircuitOpenError(method=method, message=str(exc)) from exc
@@ -1,34 +1,91 @@
 import logging
-from datetime import datetime, timedelta, timezone
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
 
 from fastapi import FastAPI, Request, Response
 from fastapi.responses import JSONResponse
 from sqlalchemy import text
 
-from bot.db.models import PaymentStatus
-from bot.db.session import AsyncSessionLocal
-from bot.payments.verification import validate_remote_payment
-from bot.payments.yookassa_adapter import YooKassaAdapter
-from bot.repositories.payments import get_payment_by_external_id
-from bot.repositories.users import lock_user_by_id
-from bot.services.payments import confirm_payment, notify_payment_status
+from bot.db.pool import pool_metrics
+from bot.db.session import AsyncSessionLocal, engine
+from bot.payments.adapter import PaymentAdapter
+from bot.payments.yookassa_adapter import yookassa_adapter, yookassa_breaker
+from bot.repositories.webhook_inbox import add_webhook_event
+from bot.services.outbox import OutboxDispatcher
+from bot.utils.circuit_breaker import CircuitState
+from bot.utils.telegram_session import telegram_breaker
+from bot.webhooks.inbox import WebhookInbox
+from bot.webhooks.sender import is_trusted_sender, parse_networks, resolve_client_ip
+from config import settings
 
 logger = logging.getLogger(__name__)
 
 
-def create_app(bot) -> FastAPI:
-    app = FastAPI()
-    adapter = YooKassaAdapter()
+def create_app(bot, adapter: PaymentAdapter | None = None) -> FastAPI:
+    adapter = adapter or yookassa_adapter
+    inbox = WebhookInbox(adapter, AsyncSessionLocal)
+    outbox = OutboxDispatcher(bot, AsyncSessionLocal)
+    yookassa_networks = parse_networks(settings.yookassa_webhook_networks)
+    trusted_proxies = parse_networks(settings.trusted_proxies)
+
+    def _sender_verified(request: Request) -> bool:
+        if not settings.yookassa_webhook_trust_ip:
+            return False
+        address = resolve_client_ip(
+            request.client.host if request.client else None,
+            request.headers.get("x-forwarded-for"),
+            trusted_proxies,
+        )
+        return is_trusted_sender(address, yookassa_networks)
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        inbox.start()
+        outbox.start()
+        try:
+            yield
+        finally:
+            await inbox.stop()
+            await outbox.stop()
+
+    app = FastAPI(lifespan=lifespan)
+    app.state.inbox = inbox
+    app.state.outbox = outbox
 
     @app.get("/api/healthz")
     async def healthcheck() -> JSONResponse:
+        # External services do not fail the check: restarting the bot does
+        # not bring YooKassa or Telegram back.
+        dependencies = {
+            breaker.name: breaker.snapshot()
+            for breaker in (yookassa_breaker, telegram_breaker)
+        }
+        pool = pool_metrics.snapshot(engine.pool)
         try:
             async with AsyncSessionLocal() as session:
                 await session.execute(text("SELECT 1"))
         except Exception:
             logger.exception("Healthcheck database query failed")
-            return JSONResponse({"status": "unavailable"}, status_code=503)
-        return JSONResponse({"status": "ok"})
+            return JSONResponse(
+                {
+                    "status": "unavailable",
+                    "dependencies": dependencies,
+                    "database_pool": pool,
+                },
+                status_code=503,
+            )
+        # Every connection busy before the check means callers are queueing.
+        saturated = pool["checked_out"] >= pool["size"] + pool["max_overflow"]
+        degraded = saturated or any(
+            item["state"] != CircuitState.CLOSED for item in dependencies.values()
+        )
+        return JSONResponse(
+            {
+                "status": "degraded" if degraded else "ok",
+                "dependencies": dependencies,
+                "database_pool": pool,
+            }
+        )
 
     @app.post("/api/yookassa/webhook")
     async def yookassa_webhook(request: Request) -> Response:
@@ -40,90 +97,30 @@ def create_app(bot) -> FastAPI:
         if not isinstance(payload, dict):
             return Response(status_code=400)
         event = payload.get("event")
-        obj = payload.get("object") or {}
-        payment_id = obj.get("id")
-        if not payment_id:
+        obj = payload.get("object")
+        payment_id = obj.get("id") if isinstance(obj, dict) else None
+        if not isinstance(event, str) or not isinstance(payment_id, str):
             return Response(status_code=200)
 
-        async with AsyncSessionLocal() as session:
-            payment = await get_payment_by_external_id(session, payment_id)
-            if not payment:
-                return Response(status_code=200)
-            if await lock_user_by_id(session, payment.user_id) is None:
-                return Response(status_code=200)
-            # The user lock serializes this webhook with checkout, manual
-            # refresh, automatic expiry and admin access changes.
-            payment = await get_payment_by_external_id(session, payment_id)
-            if not payment:
-                return Response(status_code=200)
-
-            if payment.status in {
-                PaymentStatus.PAID,
-                PaymentStatus.NEEDS_REVIEW,
-            }:
-                return Response(status_code=200)
-            if event == "payment.canceled" and payment.status in {
-                PaymentStatus.FAILED,
-                PaymentStatus.EXPIRED,
-            }:
-                return Response(status_code=200)
-
-            if event in {"payment.succeeded", "payment.canceled"}:
-                try:
-                    remote = await adapter.get_payment(payment_id)
-                except Exception as exc:
-                    logger.exception("Failed to verify payment", exc_info=exc)
-                    # Ask YooKassa to retry instead of acknowledging an event
-                    # that could not be verified.
-                    return Response(status_code=503)
-                expected_status = (
-                    "succeeded" if event == "payment.succeeded" else "canceled"
-                )
-                if remote.get("status") != expected_status:
-                    return Response(status_code=200)
-                validation_error = validate_remote_payment(
-                    remote,
-                    external_id=payment_id,
-                    internal_payment_id=payment.id,
-                    user_id=payment.user_id,
-                    amount_rub=payment.amount_rub,
-                    currency=payment.currency,
-                )
-                if validation_error:
-                    logger.warning(
-                        "Payment verification mismatch",
-                        extra={
-                            "payment_id": payment_id,
-                            "local_payment_id": payment.id,
-                            "local_user_id": payment.user_id,
-                            "reason": validation_error,
-                        },
-                    )
-                    return Response(status_code=200)
-
-            if event == "payment.succeeded":
-                await confirm_payment(
-                    session, bot, payment, paid_at=datetime.now(timezone.utc)
-                )
-                await session.commit()
-                return Response(status_code=200)
-
-            if event == "payment.canceled":
-                payment.status = PaymentStatus.FAILED
-                deadline = payment.expires_at or payment.created_at + timedelta(
-                    hours=24
+        # Verification and access changes run in the inbox workers, so a slow
+        # YooKassa or Telegram call never holds the notification open.
+        try:
+            async with AsyncSessionLocal() as session:
+                inserted = await add_webhook_event(
+                    session,
+                    event[:64],
+                    payment_id[:128],
+                    payload,
+                    datetime.now(timezone.utc),
+                    sender_verified=_sender_verified(request),
                 )
-                if deadline >= datetime.now(timezone.utc) - timedelta(days=1):
-                    await notify_payment_status(
-                        session,
-                        bot,
-                        payment.user_id,
-                        "payment_failed",
-                        dedupe_key=f"payment:{payment.id}:payment_failed",
-                    )
                 await session.commit()
-                return Response(status_code=200)
-
+        except Exception:
+            logger.exception("Failed to store webhook event")
+            # YooKassa retries the notification until it is stored.
+            return Response(status_code=503)
+        if inserted:
+            inbox.wake()
         return Response(status_code=200)
 
     return app
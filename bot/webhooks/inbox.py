@@ -0,0 +1,224 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from bot.db.models import PaymentStatus, WebhookEventStatus
+from bot.payments.adapter import PaymentAdapter
+from bot.payments.verification import validate_remote_payment
+from bot.repositories import webhook_inbox as webhook_inbox_repo
+from bot.repositories.payments import get_payment_by_external_id
+from bot.repositories.users import lock_user_by_id
+from bot.services.payments import confirm_payment, notify_payment_status
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+RETRY_BASE_DELAY = timedelta(seconds=10)
+RETRY_MAX_DELAY = timedelta(minutes=30)
+IDLE_POLL_SECONDS = 5.0
+
+
+class WebhookRetry(Exception):
+    """The event could not be verified yet and must be processed again."""
+
+
+def retry_delay(attempts: int) -> timedelta:
+    return min(RETRY_BASE_DELAY * 2 ** max(0, attempts - 1), RETRY_MAX_DELAY)
+
+
+async def process_webhook_event(
+    session: AsyncSession,
+    adapter: PaymentAdapter,
+    event: str,
+    payment_id: str,
+    delivered: dict | None = None,
+) -> None:
+    """Apply one YooKassa notification; the caller commits.
+
+    ``delivered`` is the payment object from a notification whose sender was
+    verified; without it the payment is always re-read from the API.
+    """
+    payment = await get_payment_by_external_id(session, payment_id)
+    if not payment:
+        return
+    if await lock_user_by_id(session, payment.user_id) is None:
+        return
+    # The user lock serializes this event with checkout, manual refresh,
+    # automatic expiry and admin access changes.
+    payment = await get_payment_by_external_id(session, payment_id)
+    if not payment:
+        return
+
+    if payment.status in {PaymentStatus.PAID, PaymentStatus.NEEDS_REVIEW}:
+        return
+    if event == "payment.canceled" and payment.status in {
+        PaymentStatus.FAILED,
+        PaymentStatus.EXPIRED,
+    }:
+        return
+    if event not in {"payment.succeeded", "payment.canceled"}:
+        return
+
+    expected_status = "succeeded" if event == "payment.succeeded" else "canceled"
+
+    def check(remote: dict) -> str | None:
+        if remote.get("status") != expected_status:
+            return "status_mismatch"
+        return validate_remote_payment(
+            remote,
+            external_id=payment_id,
+            internal_payment_id=payment.id,
+            user_id=payment.user_id,
+            amount_rub=payment.amount_rub,
+            currency=payment.currency,
+        )
+
+    # An object delivered from a YooKassa address is as good as a lookup; any
+    # doubt about it is settled by asking the API.
+    if isinstance(delivered, dict) and not check(delivered):
+        remote = delivered
+    else:
+        try:
+            # The event announces a state change: a shared lookup that started
+            # before it could still report the old status.
+            remote = await adapter.get_payment(payment_id, fresh=True)
+        except Exception as exc:
+            raise WebhookRetry(repr(exc)) from exc
+        if remote.get("status") != expected_status:
+            return
+    validation_error = check(remote)
+    if validation_error:
+        logger.warning(
+            "Payment verification mismatch",
+            extra={
+                "payment_id": payment_id,
+                "local_payment_id": payment.id,
+                "local_user_id": payment.user_id,
+                "reason": validation_error,
+            },
+        )
+        return
+
+    now = datetime.now(timezone.utc)
+    if event == "payment.succeeded":
+        await confirm_payment(session, payment, paid_at=now)
+        return
+
+    payment.status = PaymentStatus.FAILED
+    deadline = payment.expires_at or payment.created_at + timedelta(hours=24)
+    if deadline >= now - timedelta(days=1):
+        await notify_payment_status(
+            session,
+            payment.user_id,
+            "payment_failed",
+            dedupe_key=f"payment:{payment.id}:payment_failed",
+        )
+
+
+class WebhookInbox:
+    """Pool of workers draining the webhook inbox table."""
+
+    def __init__(
+        self,
+        adapter: PaymentAdapter,
+        sessionmaker: async_sessionmaker,
+        workers: int | None = None,
+    ) -> None:
+        self._adapter = adapter
+        self._sessionmaker = sessionmaker
+        self._workers = max(1, workers or settings.webhook_workers)
+        self._wakeup = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+
+    def wake(self) -> None:
+        self._wakeup.set()
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._tasks = [
+            asyncio.create_task(self._run(), name=f"webhook-inbox-{index}")
+            for index in range(self._workers)
+        ]
+
+    async def stop(self) -> None:
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if await self.process_next():
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Webhook inbox worker failed")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), IDLE_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def process_next(self) -> bool:
+        """Process one due event; return False when the inbox is drained."""
+        async with self._sessionmaker() as session:
+            now = datetime.now(timezone.utc)
+            event = await webhook_inbox_repo.claim_next_webhook_event(session, now)
+            if event is None:
+                return False
+            event_id = event.id
+            attempts = event.attempts + 1
+            try:
+                await process_webhook_event(
+                    session,
+                    self._adapter,
+                    event.event,
+                    event.payment_id,
+                    _delivered_object(event),
+                )
+            except Exception as exc:
+                await session.rollback()
+                await self._reschedule(session, event_id, attempts, exc)
+                return True
+            event.status = WebhookEventStatus.PROCESSED
+            event.attempts = attempts
+            event.processed_at = now
+            await session.commit()
+            return True
+
+    async def _reschedule(
+        self, session: AsyncSession, event_id: int, attempts: int, exc: Exception
+    ) -> None:
+        failed = attempts >= settings.webhook_max_attempts
+        if isinstance(exc, WebhookRetry):
+            logger.warning(
+                "Failed to verify webhook event",
+                extra={"event_id": event_id, "attempts": attempts},
+            )
+        else:
+            logger.exception("Failed to process webhook event", exc_info=exc)
+        if failed:
+            logger.error(
+                "Webhook event gave up after retries",
+                extra={"event_id": event_id, "attempts": attempts},
+            )
+        await webhook_inbox_repo.reschedule_webhook_event(
+            session,
+            event_id,
+            attempts=attempts,
+            next_attempt_at=datetime.now(timezone.utc) + retry_delay(attempts),
+            error=str(exc)[:1000],
+            failed=failed,
+        )
+        await session.commit()
+
+
+def _delivered_object(event) -> dict | None:
+    if not event.sender_verified or not isinstance(event.payload, dict):
+        return None
+    return event.payload.get("object")
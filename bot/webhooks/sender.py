@@ -0,0 +1,55 @@
+import ipaddress
+from ipaddress import IPv4Address, IPv4Network, IPv6Address, IPv6Network
+
+IPAddress = IPv4Address | IPv6Address
+IPNetwork = IPv4Network | IPv6Network
+
+
+def parse_networks(raw: str) -> tuple[IPNetwork, ...]:
+    return tuple(
+        ipaddress.ip_network(item.strip(), strict=False)
+        for item in raw.split(",")
+        if item.strip()
+    )
+
+
+def _parse_address(value: str | None) -> IPAddress | None:
+    if not value:
+        return None
+    try:
+        return ipaddress.ip_address(value.strip())
+    except ValueError:
+        return None
+
+
+def _in_networks(address: IPAddress, networks: tuple[IPNetwork, ...]) -> bool:
+    return any(address in network for network in networks)
+
+
+def resolve_client_ip(
+    peer: str | None,
+    forwarded_for: str | None,
+    trusted_proxies: tuple[IPNetwork, ...],
+) -> IPAddress | None:
+    """Return the address that connected to the first untrusted hop.
+
+    X-Forwarded-For is only honoured while every hop to its right is a trusted
+    proxy, so a client cannot spoof its address by sending the header itself.
+    """
+    address = _parse_address(peer)
+    if address is None or not _in_networks(address, trusted_proxies):
+        return address
+    hops = [hop for hop in (forwarded_for or "").split(",") if hop.strip()]
+    for hop in reversed(hops):
+        address = _parse_address(hop)
+        if address is None:
+            return None
+        if not _in_networks(address, trusted_proxies):
+            return address
+    return address
+
+
+def is_trusted_sender(
+    address: IPAddress | None, allowed: tuple[IPNetwork, ...]
+) -> bool:
+    return address is not None and _in_networks(address, allowed)
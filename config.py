@@ -25,6 +25,23 @@ class Settings:
 
     # DB
     database_url: str = _get_env("DATABASE_URL")
+    # What a handler that awaits Telegram or YooKassa with uncommitted writes
+    # gets: "warn", "raise" or "off" (which also stops releasing read-only
+    # transactions before network calls).
+    db_io_guard: str = _get_env("DB_IO_GUARD", "warn")
+    # Connections kept open, extra ones allowed under bursts, and seconds a
+    # caller waits for a free one before failing.
+    db_pool_size: int = int(_get_env("DB_POOL_SIZE", "5"))
+    db_max_overflow: int = int(_get_env("DB_MAX_OVERFLOW", "10"))
+    db_pool_timeout: float = float(_get_env("DB_POOL_TIMEOUT", "30"))
+    # Connections older than this are reopened instead of being checked with a
+    # ping on every checkout; DB_POOL_PRE_PING=true restores the ping.
+    db_pool_recycle: int = int(_get_env("DB_POOL_RECYCLE", "1800"))
+    db_pool_pre_ping: bool = _get_env("DB_POOL_PRE_PING", "false").lower() == "true"
+    # Optional streaming replica for read-only screens; it is skipped while it
+    # lags more than REPLICA_MAX_LAG_SECONDS or does not answer.
+    database_replica_url: str = _get_env("DATABASE_REPLICA_URL", "")
+    replica_max_lag_seconds: float = float(_get_env("REPLICA_MAX_LAG_SECONDS", "5"))
 
     # Business rules
     intro_price_rub: int = int(_get_env("INTRO_PRICE_RUB", "2990"))
@@ -47,11 +64,69 @@ class Settings:
         _get_env("REVOKE_JOBS_ENABLED", "false").lower() == "true"
     )
     max_revoke_per_run: int = int(_get_env("MAX_REVOKE_PER_RUN", "30"))
+    max_revoke_per_hour: int = int(_get_env("MAX_REVOKE_PER_HOUR", "60"))
+    revoke_concurrency: int = int(_get_env("REVOKE_CONCURRENCY", "5"))
+    access_retry_max_attempts: int = int(_get_env("ACCESS_RETRY_MAX_ATTEMPTS", "8"))
+    # A stored invite link is handed out again only while it stays valid at
+    # least this long.
+    invite_link_min_remaining_minutes: int = int(
+        _get_env("INVITE_LINK_MIN_REMAINING_MINUTES", "60")
+    )
+    access_sweep_interval_minutes: int = int(
+        _get_env("ACCESS_SWEEP_INTERVAL_MINUTES", "360")
+    )
+    job_time_budget_seconds: int = int(_get_env("JOB_TIME_BUDGET_SECONDS", "120"))
+    scheduler_misfire_grace_seconds: int = int(
+        _get_env("SCHEDULER_MISFIRE_GRACE_SECONDS", "21600")
+    )
+
+    # Telegram API
+    telegram_rate_limit_per_second: float = float(
+        _get_env("TELEGRAM_RATE_LIMIT_PER_SECOND", "20")
+    )
+
+    # Consecutive YooKassa or Telegram outages that open a circuit breaker,
+    # and how long calls then fail fast before a probe is let through.
+    circuit_failure_threshold: int = int(_get_env("CIRCUIT_FAILURE_THRESHOLD", "5"))
+    circuit_reset_seconds: float = float(_get_env("CIRCUIT_RESET_SECONDS", "30"))
 
     # YooKassa
     yookassa_shop_id: str = _get_env("YOO_KASSA_SHOP_ID")
     yookassa_secret_key: str = _get_env("YOO_KASSA_SECRET_KEY")
     public_base_url: str = _get_env("PUBLIC_BASE_URL", "https://club-probujdenie.ru")
+    # Points at scripts/fake_yookassa.py for load tests.
+    yookassa_api_url: str = _get_env("YOOKASSA_API_URL", "https://api.yookassa.ru/v3")
+    # "list" reconciles through the paginated payments list, "lookup" checks
+    # every pending payment separately.
+    payment_reconciliation: str = _get_env("PAYMENT_RECONCILIATION", "list")
+    payment_status_cache_seconds: float = float(
+        _get_env("PAYMENT_STATUS_CACHE_SECONDS", "2")
+    )
+    # Workers draining the webhook inbox and attempts before an event is failed.
+    webhook_workers: int = int(_get_env("WEBHOOK_WORKERS", "4"))
+    webhook_max_attempts: int = int(_get_env("WEBHOOK_MAX_ATTEMPTS", "10"))
+    outbox_workers: int = int(_get_env("OUTBOX_WORKERS", "2"))
+    outbox_max_attempts: int = int(_get_env("OUTBOX_MAX_ATTEMPTS", "10"))
+    # Trust the delivered payment object when the webhook comes from one of
+    # YOOKASSA_WEBHOOK_NETWORKS, skipping the confirming API lookup. Behind
+    # Nginx the client address is taken from X-Forwarded-For, but only when
+    # the connection comes from TRUSTED_PROXIES.
+    yookassa_webhook_trust_ip: bool = (
+        _get_env("YOOKASSA_WEBHOOK_TRUST_IP", "false").lower() == "true"
+    )
+    # https://yookassa.ru/developers/using-api/webhooks#ip
+    yookassa_webhook_networks: str = _get_env(
+        "YOOKASSA_WEBHOOK_NETWORKS",
+        "185.71.76.0/27,185.71.77.0/27,77.75.153.0/25,77.75.156.11,"
+        "77.75.156.35,77.75.154.128/25,2a02:5180::/32",
+    )
+    trusted_proxies: str = _get_env("TRUSTED_PROXIES", "127.0.0.1,::1")
+    # A pending invoice checked this recently is shown again without a lookup.
+    payment_snapshot_fresh_seconds: int = int(
+        _get_env("PAYMENT_SNAPSHOT_FRESH_SECONDS", "60")
+    )
+    # HTTP/2 needs the optional h2 package (pip install httpx[http2]).
+    yookassa_http2: bool = _get_env("YOOKASSA_HTTP2", "false").lower() == "true"
 
     def __post_init__(self):
         admin_ids_raw = _get_env("ADMIN_TG_IDS", "")
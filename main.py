@@ -10,10 +10,12 @@ from bot.handlers.join_requests import router as join_requests_router
 from bot.handlers.membership import router as membership_router
 from bot.handlers.menu import router as menu_router
 from bot.handlers.start import router as start_router
-from bot.payments.yookassa_adapter import YooKassaAdapter
-from bot.scheduler.setup import setup_scheduler
+from bot.payments.yookassa_adapter import yookassa_adapter
+from bot.scheduler.setup import restore_job_schedule, setup_scheduler
 from bot.services.flows import ensure_seed_flows
+from bot.services.mailings import sync_mailing_calendar
 from bot.utils.db_middleware import DbSessionMiddleware
+from bot.utils.telegram_session import CircuitBreakerSession
 from bot.webhooks.app import create_app
 from config import settings
 
@@ -21,13 +23,15 @@ from config import settings
 async def on_startup() -> None:
     async with AsyncSessionLocal() as session:
         await ensure_seed_flows(session)
+        await session.flush()
+        await sync_mailing_calendar(session)
         await session.commit()
 
 
 async def main() -> None:
     logging.basicConfig(level=logging.INFO)
 
-    bot = Bot(token=settings.bot_token)
+    bot = Bot(token=settings.bot_token, session=CircuitBreakerSession())
     dp = Dispatcher()
     dp.message.middleware(DbSessionMiddleware())
     dp.callback_query.middleware(DbSessionMiddleware())
@@ -41,11 +45,11 @@ async def main() -> None:
 
     await on_startup()
 
-    payment_adapter = YooKassaAdapter()
-    scheduler = setup_scheduler(bot, payment_adapter=payment_adapter)
+    scheduler = setup_scheduler(bot, payment_adapter=yookassa_adapter)
+    await restore_job_schedule(scheduler)
     scheduler.start()
 
-    app = create_app(bot)
+    app = create_app(bot, yookassa_adapter)
     server_config = uvicorn.Config(app, host="127.0.0.1", port=8000, log_level="info")
     server = uvicorn.Server(server_config)
 
@@ -54,6 +58,7 @@ async def main() -> None:
     finally:
         if scheduler.running:
             scheduler.shutdown(wait=False)
+        await yookassa_adapter.aclose()
         await bot.session.close()
 
 
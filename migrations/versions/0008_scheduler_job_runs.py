@@ -0,0 +1,39 @@
+"""scheduler job run history
+
+Revision ID: 0008_scheduler_job_runs
+Revises: 0007_user_access_exempt
+Create Date: 2026-10-18
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0008_scheduler_job_runs"
+down_revision = "0007_user_access_exempt"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "scheduler_job_runs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("job_id", sa.String(length=64), nullable=False),
+        sa.Column(
+            "status",
+            sa.Enum("running", "succeeded", "failed", name="job_run_status"),
+            nullable=False,
+        ),
+        sa.Column("started_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+    )
+    op.create_index(
+        "ix_scheduler_job_runs_job_id", "scheduler_job_runs", ["job_id"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_scheduler_job_runs_job_id", table_name="scheduler_job_runs")
+    op.drop_table("scheduler_job_runs")
+    op.execute("DROP TYPE IF EXISTS job_run_status")
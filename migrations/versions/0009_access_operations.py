@@ -0,0 +1,60 @@
+"""access operation retry queue
+
+Revision ID: 0009_access_operations
+Revises: 0008_scheduler_job_runs
+Create Date: 2026-10-18
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0009_access_operations"
+down_revision = "0008_scheduler_job_runs"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "access_operations",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("chat_id", sa.BigInteger(), nullable=False),
+        sa.Column(
+            "kind",
+            sa.Enum("ban", "grant", name="access_operation_kind"),
+            nullable=False,
+        ),
+        sa.Column(
+            "status",
+            sa.Enum(
+                "pending",
+                "done",
+                "canceled",
+                "failed",
+                name="access_operation_status",
+            ),
+            nullable=False,
+        ),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("next_attempt_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+        sa.UniqueConstraint(
+            "user_id", "chat_id", name="uq_access_operations_user_chat"
+        ),
+    )
+    op.create_index(
+        "ix_access_operations_due",
+        "access_operations",
+        ["status", "next_attempt_at"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_access_operations_due", table_name="access_operations")
+    op.drop_table("access_operations")
+    op.execute("DROP TYPE IF EXISTS access_operation_status")
+    op.execute("DROP TYPE IF EXISTS access_operation_kind")
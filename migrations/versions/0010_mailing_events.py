@@ -0,0 +1,52 @@
+"""materialized mailing calendar
+
+Revision ID: 0010_mailing_events
+Revises: 0009_access_operations
+Create Date: 2026-10-18
+"""
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+revision = "0010_mailing_events"
+down_revision = "0009_access_operations"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Rows are generated from the flows table on bot startup.
+    op.create_table(
+        "mailing_events",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("flow_id", sa.Integer(), sa.ForeignKey("flows.id"), nullable=False),
+        sa.Column("send_on", sa.Date(), nullable=False),
+        sa.Column("template_key", sa.String(length=128), nullable=False),
+        sa.Column("audience", sa.String(length=32), nullable=False),
+        sa.Column(
+            "status",
+            sa.Enum("planned", "sent", name="mailing_event_status"),
+            nullable=False,
+        ),
+        sa.Column("recipients", postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column("sent_count", sa.Integer(), nullable=True),
+        sa.Column("sent_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.UniqueConstraint(
+            "flow_id", "template_key", "audience", name="uq_mailing_events_flow_kind"
+        ),
+    )
+    op.create_index(
+        "ix_mailing_events_flow_id", "mailing_events", ["flow_id"], unique=False
+    )
+    op.create_index(
+        "ix_mailing_events_send_on", "mailing_events", ["send_on"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_mailing_events_send_on", table_name="mailing_events")
+    op.drop_index("ix_mailing_events_flow_id", table_name="mailing_events")
+    op.drop_table("mailing_events")
+    op.execute("DROP TYPE IF EXISTS mailing_event_status")
@@ -0,0 +1,25 @@
+"""mailing event send cursor
+
+Revision ID: 0011_mailing_event_cursor
+Revises: 0010_mailing_events
+Create Date: 2026-10-18
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0011_mailing_event_cursor"
+down_revision = "0010_mailing_events"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "mailing_events",
+        sa.Column("cursor", sa.Integer(), nullable=False, server_default="0"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("mailing_events", "cursor")
@@ -0,0 +1,50 @@
+"""webhook inbox
+
+Revision ID: 0012_webhook_inbox
+Revises: 0011_mailing_event_cursor
+Create Date: 2026-10-18
+"""
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+revision = "0012_webhook_inbox"
+down_revision = "0011_mailing_event_cursor"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "webhook_inbox",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("event", sa.String(length=64), nullable=False),
+        sa.Column("payment_id", sa.String(length=128), nullable=False),
+        sa.Column("payload", postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column(
+            "status",
+            sa.Enum("pending", "processed", "failed", name="webhook_event_status"),
+            nullable=False,
+        ),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("next_attempt_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("received_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("processed_at", sa.DateTime(timezone=True), nullable=True),
+        sa.UniqueConstraint(
+            "event", "payment_id", name="uq_webhook_inbox_event_payment"
+        ),
+    )
+    op.create_index(
+        "ix_webhook_inbox_due",
+        "webhook_inbox",
+        ["status", "next_attempt_at"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_webhook_inbox_due", table_name="webhook_inbox")
+    op.drop_table("webhook_inbox")
+    op.execute("DROP TYPE IF EXISTS webhook_event_status")
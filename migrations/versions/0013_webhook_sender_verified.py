@@ -0,0 +1,30 @@
+"""webhook inbox sender verification
+
+Revision ID: 0013_webhook_sender_verified
+Revises: 0012_webhook_inbox
+Create Date: 2026-10-18
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0013_webhook_sender_verified"
+down_revision = "0012_webhook_inbox"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "webhook_inbox",
+        sa.Column(
+            "sender_verified",
+            sa.Boolean(),
+            nullable=False,
+            server_default=sa.text("false"),
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("webhook_inbox", "sender_verified")
@@ -0,0 +1,31 @@
+"""payment remote snapshot
+
+Revision ID: 0014_payment_remote_snapshot
+Revises: 0013_webhook_sender_verified
+Create Date: 2026-10-18
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0014_payment_remote_snapshot"
+down_revision = "0013_webhook_sender_verified"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("payments", sa.Column("confirmation_url", sa.Text(), nullable=True))
+    op.add_column(
+        "payments", sa.Column("remote_status", sa.String(length=32), nullable=True)
+    )
+    op.add_column(
+        "payments",
+        sa.Column("remote_checked_at", sa.DateTime(timezone=True), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("payments", "remote_checked_at")
+    op.drop_column("payments", "remote_status")
+    op.drop_column("payments", "confirmation_url")
@@ -0,0 +1,75 @@
+"""indexes for hot query shapes
+
+Revision ID: 0015_hot_query_indexes
+Revises: 0014_payment_remote_snapshot
+Create Date: 2026-10-18
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0015_hot_query_indexes"
+down_revision = "0014_payment_remote_snapshot"
+branch_labels = None
+depends_on = None
+
+# (name, table, columns, partial index predicate)
+INDEXES = [
+    ("ix_users_username_lower", "users", [sa.text("lower(username)")], None),
+    (
+        "ix_memberships_status_grace_end",
+        "memberships",
+        ["status", "grace_end_at"],
+        None,
+    ),
+    (
+        "ix_memberships_user_status_access_end",
+        "memberships",
+        ["user_id", "status", "access_end_at"],
+        None,
+    ),
+    (
+        "ix_memberships_active_pay_later_deadline",
+        "memberships",
+        ["pay_later_deadline_at"],
+        "status = 'active'",
+    ),
+    ("ix_payments_pending", "payments", ["id"], "status = 'pending'"),
+    (
+        "ix_payments_user_status_flow",
+        "payments",
+        ["user_id", "status", "flow_id"],
+        None,
+    ),
+    ("ix_audit_log_created_at", "audit_log", ["created_at"], None),
+    (
+        "ix_audit_log_action_key",
+        "audit_log",
+        ["action", sa.text("(payload ->> 'key')")],
+        None,
+    ),
+]
+
+
+def upgrade() -> None:
+    # CONCURRENTLY keeps the tables writable while the indexes are built, but
+    # it cannot run inside the migration transaction. An interrupted build
+    # leaves an INVALID index behind: drop it before running this again.
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                postgresql_concurrently=True,
+                postgresql_where=sa.text(where) if where else None,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _columns, _where in reversed(INDEXES):
+            op.drop_index(
+                name, table_name=table, postgresql_concurrently=True, if_exists=True
+            )
@@ -0,0 +1,40 @@
+"""invite links
+
+Revision ID: 0016_invite_links
+Revises: 0015_hot_query_indexes
+Create Date: 2026-10-18
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0016_invite_links"
+down_revision = "0015_hot_query_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "invite_links",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("chat_id", sa.BigInteger(), nullable=False),
+        sa.Column("invite_link", sa.String(length=255), nullable=False),
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("revoked_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.UniqueConstraint("user_id", "chat_id", name="uq_invite_links_user_chat"),
+    )
+    op.create_index(
+        "ix_invite_links_user_id", "invite_links", ["user_id"], unique=False
+    )
+    op.create_index(
+        "ix_invite_links_expires_at", "invite_links", ["expires_at"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_invite_links_expires_at", table_name="invite_links")
+    op.drop_index("ix_invite_links_user_id", table_name="invite_links")
+    op.drop_table("invite_links")
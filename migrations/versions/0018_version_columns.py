@@ -0,0 +1,30 @@
+"""user and membership versions
+
+Revision ID: 0018_version_columns
+Revises: 0017_outbox
+Create Date: 2026-10-18
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0018_version_columns"
+down_revision = "0017_outbox"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "users",
+        sa.Column("version", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.add_column(
+        "memberships",
+        sa.Column("version", sa.Integer(), nullable=False, server_default="0"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("memberships", "version")
+    op.drop_column("users", "version")
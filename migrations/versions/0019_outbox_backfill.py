@@ -0,0 +1,56 @@
+"""backfill outbox dedupe keys from the audit log
+
+Payment notices used to be deduplicated through payment_notice_sent audit
+entries. Copying their keys into outbox as sent rows keeps still-pending
+payments from getting the same notice again after the switch.
+
+Revision ID: 0019_outbox_backfill
+Revises: 0018_version_columns
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+
+revision = "0019_outbox_backfill"
+down_revision = "0018_version_columns"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        INSERT INTO outbox (user_id, kind, payload, dedupe_key, status, attempts,
+                            next_attempt_at, created_at, sent_at)
+        SELECT DISTINCT ON (a.payload ->> 'key')
+               u.id,
+               'payment_notice',
+               jsonb_build_object('template_key', a.payload ->> 'template_key'),
+               a.payload ->> 'key',
+               'sent',
+               1,
+               a.created_at,
+               a.created_at,
+               a.created_at
+        FROM audit_log AS a
+        JOIN users AS u ON u.id = (a.payload ->> 'user_id')::int
+        WHERE a.action = 'payment_notice_sent'
+          AND a.payload ->> 'key' IS NOT NULL
+        ORDER BY a.payload ->> 'key', a.created_at
+        ON CONFLICT ON CONSTRAINT uq_outbox_dedupe_key DO NOTHING
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute(
+        """
+        DELETE FROM outbox AS o
+        USING audit_log AS a
+        WHERE a.action = 'payment_notice_sent'
+          AND o.dedupe_key = a.payload ->> 'key'
+          AND o.status = 'sent'
+          AND o.attempts = 1
+          AND o.sent_at = a.created_at
+        """
+    )
@@ -0,0 +1,22 @@
+"""add expired mailing event status
+
+Revision ID: 0020_mailing_event_expired
+Revises: 0019_outbox_backfill
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+
+revision = "0020_mailing_event_expired"
+down_revision = "0019_outbox_backfill"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("ALTER TYPE mailing_event_status ADD VALUE IF NOT EXISTS 'expired'")
+
+
+def downgrade() -> None:
+    # PostgreSQL does not support removing enum values safely in-place.
+    pass
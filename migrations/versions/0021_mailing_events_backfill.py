@@ -0,0 +1,75 @@
+"""mark calendar mailings already sent by the legacy jobs
+
+Before the calendar, start mailings were deduplicated by
+flow:{flow_id}:{active|former}:{days} audit keys and end-of-flow reminders by
+auto:{template}:{flow_id}:{date} keys. Matching calendar events are marked
+sent so deploy day does not repeat them. Backfilled rows keep sent_count NULL;
+the calendar itself always records a count.
+
+Revision ID: 0021_mailing_events_backfill
+Revises: 0020_mailing_event_expired
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+
+revision = "0021_mailing_events_backfill"
+down_revision = "0020_mailing_event_expired"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        WITH legacy AS (
+            SELECT split_part(a.payload ->> 'key', ':', 2)::int AS flow_id,
+                   'mailing_' || split_part(a.payload ->> 'key', ':', 3) || '_'
+                       || split_part(a.payload ->> 'key', ':', 4) AS template_key,
+                   split_part(a.payload ->> 'key', ':', 3) AS audience,
+                   a.created_at::date AS send_on,
+                   a.created_at
+            FROM audit_log AS a
+            WHERE a.action = 'mailing_sent'
+              AND a.payload ->> 'key' ~ '^flow:[0-9]+:(active|former):(7|3)$'
+            UNION ALL
+            SELECT split_part(a.payload ->> 'key', ':', 3)::int,
+                   split_part(a.payload ->> 'key', ':', 2),
+                   'flow',
+                   split_part(a.payload ->> 'key', ':', 4)::date,
+                   a.created_at
+            FROM audit_log AS a
+            WHERE a.action = 'mailing_sent'
+              AND a.payload ->> 'key'
+                  ~ '^auto:[a-z0-9_]+:[0-9]+:[0-9]{4}-[0-9]{2}-[0-9]{2}$'
+        )
+        INSERT INTO mailing_events (flow_id, send_on, template_key, audience,
+                                    status, sent_at, created_at)
+        SELECT DISTINCT ON (l.flow_id, l.template_key, l.audience)
+               l.flow_id,
+               l.send_on,
+               l.template_key,
+               l.audience,
+               'sent'::mailing_event_status,
+               l.created_at,
+               l.created_at
+        FROM legacy AS l
+        JOIN flows AS f ON f.id = l.flow_id
+        ORDER BY l.flow_id, l.template_key, l.audience, l.created_at
+        ON CONFLICT ON CONSTRAINT uq_mailing_events_flow_kind DO UPDATE
+        SET status = 'sent', sent_at = EXCLUDED.sent_at
+        WHERE mailing_events.status = 'planned'
+          AND mailing_events.sent_count IS NULL
+        """
+    )
+
+
+def downgrade() -> None:
+    # Rows the calendar sent itself always have a count.
+    op.execute(
+        """
+        UPDATE mailing_events
+        SET status = 'planned', sent_at = NULL
+        WHERE status = 'sent' AND sent_count IS NULL
+        """
+    )
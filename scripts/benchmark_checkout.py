@@ -0,0 +1,237 @@
+"""Benchmark checkout end to end against the local fake YooKassa.
+
+Every simulated user goes through the real checkout handler, is marked paid
+by the fake provider, whose webhook is served by the real webhook app and
+inbox workers, and is waited on until confirm_payment marks the payment paid.
+Telegram is replaced by a stub, so no messages are sent.
+
+    python scripts/fake_yookassa.py --port 8081 &
+    YOOKASSA_API_URL=http://127.0.0.1:8081/v3 \\
+        python scripts/benchmark_checkout.py --users 200 --concurrency 50
+
+The script writes users and payments to DATABASE_URL: use a disposable
+database with a flow open for sales.
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import httpx
+import uvicorn
+from sqlalchemy import select
+
+from bot.db.models import Payment, PaymentStatus, User
+from bot.db.pool import pool_metrics
+from bot.db.session import AsyncSessionLocal, engine
+from bot.handlers.menu import _send_personal_payment_link
+from bot.payments.yookassa_adapter import yookassa_adapter
+from bot.webhooks.app import create_app
+from config import settings
+
+STAGES = ("checkout", "payment", "webhook", "confirm", "total")
+CONFIRM_POLL_SECONDS = 0.05
+
+
+class StubBot:
+    """Answers the Telegram calls made during checkout and confirmation."""
+
+    def __init__(self, latency_ms: float) -> None:
+        self._latency = latency_ms / 1000
+        self.calls = 0
+
+    async def _call(self, result):
+        self.calls += 1
+        if self._latency:
+            await asyncio.sleep(self._latency)
+        return result
+
+    async def unban_chat_member(self, **kwargs):
+        return await self._call(True)
+
+    async def ban_chat_member(self, **kwargs):
+        return await self._call(True)
+
+    async def create_chat_invite_link(self, **kwargs):
+        link = f"https://t.me/+bench{kwargs.get('chat_id')}"
+        return await self._call(SimpleNamespace(invite_link=link))
+
+    async def send_message(self, *args, **kwargs):
+        return await self._call(SimpleNamespace(message_id=1))
+
+
+class BenchResponder:
+    def __init__(self, bot: StubBot) -> None:
+        self.bot = bot
+        self.texts: list[str] = []
+
+    async def answer(self, text: str, reply_markup=None):
+        self.texts.append(text)
+        return SimpleNamespace(message_id=1)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument(
+        "--fake-url",
+        default=settings.yookassa_api_url.removesuffix("/v3"),
+        help="Base URL of scripts/fake_yookassa.py",
+    )
+    parser.add_argument("--webhook-port", type=int, default=8000)
+    parser.add_argument("--tg-id-base", type=int, default=9_000_000_000)
+    parser.add_argument("--telegram-latency-ms", type=float, default=0.0)
+    parser.add_argument("--confirm-timeout", type=float, default=30.0)
+    return parser.parse_args()
+
+
+def percentile(values: list[float], share: float) -> float:
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(share * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def _latest_payment(tg_id: int) -> tuple[int, str] | None:
+    async with AsyncSessionLocal() as session:
+        row = (
+            await session.execute(
+                select(Payment.id, Payment.external_id)
+                .join(User, User.id == Payment.user_id)
+                .where(User.tg_id == tg_id, Payment.external_id.is_not(None))
+                .order_by(Payment.id.desc())
+                .limit(1)
+            )
+        ).first()
+    return tuple(row) if row else None
+
+
+async def _wait_paid(payment_id: int, timeout: float) -> bool:
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        async with AsyncSessionLocal() as session:
+            status = await session.scalar(
+                select(Payment.status).where(Payment.id == payment_id)
+            )
+        if status == PaymentStatus.PAID:
+            return True
+        await asyncio.sleep(CONFIRM_POLL_SECONDS)
+    return False
+
+
+async def simulate_user(
+    index: int,
+    args: argparse.Namespace,
+    bot: StubBot,
+    fake: httpx.AsyncClient,
+    timings: dict[str, list[float]],
+    errors: dict[str, int],
+) -> None:
+    tg_id = args.tg_id_base + index
+    tg_user = SimpleNamespace(
+        id=tg_id, username=f"bench{index}", first_name="Bench", last_name=None
+    )
+    started = time.perf_counter()
+
+    async with AsyncSessionLocal() as session:
+        await _send_personal_payment_link(session, tg_user, BenchResponder(bot))
+    checkout_done = time.perf_counter()
+    payment = await _latest_payment(tg_id)
+    if payment is None:
+        errors["checkout"] = errors.get("checkout", 0) + 1
+        return
+    payment_id, external_id = payment
+
+    response = await fake.post(
+        f"/control/payments/{external_id}/status", json={"status": "succeeded"}
+    )
+    paid_done = time.perf_counter()
+    result = response.json()
+    if result.get("webhook_status") != 200:
+        errors["webhook"] = errors.get("webhook", 0) + 1
+        return
+
+    if not await _wait_paid(payment_id, args.confirm_timeout):
+        errors["confirm"] = errors.get("confirm", 0) + 1
+        return
+    finished = time.perf_counter()
+
+    timings["checkout"].append(checkout_done - started)
+    timings["payment"].append(paid_done - checkout_done)
+    timings["webhook"].append(result["webhook_ms"] / 1000)
+    timings["confirm"].append(finished - paid_done)
+    timings["total"].append(finished - started)
+
+
+def report(
+    timings: dict[str, list[float]], errors: dict[str, int], elapsed: float
+) -> None:
+    completed = len(timings["total"])
+    print(f"completed: {completed}, failed: {sum(errors.values())} {errors or ''}")
+    print(f"elapsed: {elapsed:.2f}s, throughput: {completed / elapsed:.2f} users/s")
+    print(f"{'stage':<10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for stage in STAGES:
+        values = timings[stage]
+        if not values:
+            continue
+        row = [percentile(values, share) * 1000 for share in (0.5, 0.95, 0.99)]
+        row.append(max(values) * 1000)
+        print(f"{stage:<10}" + "".join(f"{value:>10.1f}" for value in row))
+
+
+async def main() -> None:
+    args = parse_args()
+    if "api.yookassa.ru" in settings.yookassa_api_url:
+        raise SystemExit("Point YOOKASSA_API_URL at scripts/fake_yookassa.py first")
+    if args.users < 1 or args.concurrency < 1:
+        raise SystemExit("--users and --concurrency must be positive")
+
+    bot = StubBot(args.telegram_latency_ms)
+    server = uvicorn.Server(
+        uvicorn.Config(
+            create_app(bot, yookassa_adapter),
+            host="127.0.0.1",
+            port=args.webhook_port,
+            log_level="warning",
+        )
+    )
+    serve = asyncio.create_task(server.serve())
+    while not server.started:
+        if serve.done():
+            raise SystemExit("Webhook server failed to start")
+        await asyncio.sleep(0.05)
+
+    timings: dict[str, list[float]] = {stage: [] for stage in STAGES}
+    errors: dict[str, int] = {}
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def run_one(index: int, fake: httpx.AsyncClient) -> None:
+        async with semaphore:
+            try:
+                await simulate_user(index, args, bot, fake, timings, errors)
+            except Exception as exc:
+                key = type(exc).__name__
+                errors[key] = errors.get(key, 0) + 1
+
+    try:
+        async with httpx.AsyncClient(base_url=args.fake_url, timeout=60.0) as fake:
+            started = time.perf_counter()
+            await asyncio.gather(*(run_one(i, fake) for i in range(args.users)))
+            elapsed = time.perf_counter() - started
+    finally:
+        server.should_exit = True
+        await serve
+        await yookassa_adapter.aclose()
+
+    report(timings, errors, elapsed)
+    print(f"stubbed Telegram calls: {bot.calls}")
+    print(f"database pool: {pool_metrics.snapshot(engine.pool)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
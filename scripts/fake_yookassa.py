@@ -0,0 +1,272 @@
+"""Local stand-in for the YooKassa payments API used for load tests.
+
+Run it and point the bot at it:
+
+    python scripts/fake_yookassa.py --port 8081 --latency-ms 150 --error-rate 0.02
+    YOOKASSA_API_URL=http://127.0.0.1:8081/v3 python main.py
+
+Payments are kept in memory. A payment changes status either through the
+control API (POST /control/payments/{id}/status) or automatically with
+--auto-status/--auto-after; every transition posts a notification to
+--webhook-url.
+
+Tests serve the same app in process through ``httpx.ASGITransport``.
+"""
+
+import argparse
+import asyncio
+import itertools
+import random
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+TERMINAL_STATUSES = {"succeeded", "canceled"}
+EVENTS = {"succeeded": "payment.succeeded", "canceled": "payment.canceled"}
+
+
+class FakeProvider:
+    def __init__(
+        self,
+        *,
+        webhook_url: str,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        auto_status: str | None = None,
+        auto_after: float = 0.0,
+    ) -> None:
+        self.webhook_url = webhook_url
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.auto_status = auto_status
+        self.auto_after = auto_after
+        self.payments: dict[str, dict] = {}
+        self._by_idempotence_key: dict[str, str] = {}
+        self._ids = itertools.count(1)
+        self._client: httpx.AsyncClient | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def simulate_network(self) -> JSONResponse | None:
+        """Sleep for the configured latency; maybe return an injected 5xx."""
+        delay = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        if self.error_rate and random.random() < self.error_rate:
+            return JSONResponse(
+                {"type": "error", "code": "internal_server_error"}, status_code=500
+            )
+        return None
+
+    def create(self, body: dict, idempotence_key: str | None) -> dict:
+        if idempotence_key and idempotence_key in self._by_idempotence_key:
+            return self.payments[self._by_idempotence_key[idempotence_key]]
+        payment_id = f"fake-{next(self._ids)}"
+        payment = {
+            "id": payment_id,
+            "status": "pending",
+            "paid": False,
+            "amount": body.get("amount", {}),
+            "description": body.get("description"),
+            "metadata": body.get("metadata") or {},
+            "created_at": _timestamp(),
+            "confirmation": {
+                "type": "redirect",
+                "confirmation_url": f"https://fake.yookassa.local/pay/{payment_id}",
+            },
+            "test": True,
+        }
+        self.payments[payment_id] = payment
+        if idempotence_key:
+            self._by_idempotence_key[idempotence_key] = payment_id
+        if self.auto_status:
+            self._spawn(self._auto_transition(payment_id))
+        return payment
+
+    def add_payment(self, status: str, created_at: datetime, **metadata) -> dict:
+        """Seed a payment that was created at ``created_at`` in ``status``."""
+        payment = self.create(
+            {"amount": {"value": "2990.00", "currency": "RUB"}, "metadata": metadata},
+            None,
+        )
+        payment["status"] = status
+        payment["paid"] = status == "succeeded"
+        payment["created_at"] = _timestamp(created_at)
+        return payment
+
+    def list_payments(self, params) -> dict:
+        items = sorted(self.payments.values(), key=lambda p: p["created_at"])
+        since = params.get("created_at.gte")
+        if since:
+            items = [p for p in items if p["created_at"] >= since]
+        status = params.get("status")
+        if status:
+            items = [p for p in items if p["status"] == status]
+        offset = int(params.get("cursor") or 0)
+        limit = int(params.get("limit") or 10)
+        body = {"type": "list", "items": items[offset : offset + limit]}
+        if offset + limit < len(items):
+            body["next_cursor"] = str(offset + limit)
+        return body
+
+    async def transition(
+        self, payment_id: str, status: str, *, notify: bool = True
+    ) -> dict:
+        """Move a payment to ``status`` and deliver the webhook if asked."""
+        payment = self.payments[payment_id]
+        payment["status"] = status
+        payment["paid"] = status == "succeeded"
+        if status == "succeeded":
+            payment["captured_at"] = _timestamp()
+        result = {"payment": payment, "webhook_status": None, "webhook_ms": None}
+        if notify and status in EVENTS:
+            started = time.perf_counter()
+            result["webhook_status"] = await self.fire_webhook(payment)
+            result["webhook_ms"] = (time.perf_counter() - started) * 1000
+        return result
+
+    async def fire_webhook(self, payment: dict) -> int | None:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=10.0)
+        payload = {
+            "type": "notification",
+            "event": EVENTS[payment["status"]],
+            "object": payment,
+        }
+        try:
+            response = await self._client.post(self.webhook_url, json=payload)
+        except httpx.HTTPError:
+            return None
+        return response.status_code
+
+    async def aclose(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        if self._client is not None:
+            await self._client.aclose()
+
+    async def _auto_transition(self, payment_id: str) -> None:
+        await asyncio.sleep(self.auto_after)
+        if self.payments[payment_id]["status"] not in TERMINAL_STATUSES:
+            await self.transition(payment_id, self.auto_status)
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+
+def _timestamp(moment: datetime | None = None) -> str:
+    moment = (moment or datetime.now(timezone.utc)).astimezone(timezone.utc)
+    return moment.strftime("%Y-%m-%dT%H:%M:%S.") + f"{moment.microsecond // 1000:03d}Z"
+
+
+def create_fake_app(provider: FakeProvider) -> FastAPI:
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        try:
+            yield
+        finally:
+            await provider.aclose()
+
+    app = FastAPI(lifespan=lifespan)
+
+    @app.post("/v3/payments")
+    async def create_payment(request: Request) -> JSONResponse:
+        if error := await provider.simulate_network():
+            return error
+        payment = provider.create(
+            await request.json(), request.headers.get("idempotence-key")
+        )
+        return JSONResponse(payment)
+
+    @app.get("/v3/payments")
+    async def list_payments(request: Request) -> JSONResponse:
+        if error := await provider.simulate_network():
+            return error
+        return JSONResponse(provider.list_payments(request.query_params))
+
+    @app.get("/v3/payments/{payment_id}")
+    async def get_payment(payment_id: str) -> JSONResponse:
+        if error := await provider.simulate_network():
+            return error
+        payment = provider.payments.get(payment_id)
+        if payment is None:
+            return JSONResponse({"type": "error", "code": "not_found"}, 404)
+        return JSONResponse(payment)
+
+    @app.post("/control/payments/{payment_id}/status")
+    async def set_status(payment_id: str, request: Request) -> JSONResponse:
+        body = await request.json()
+        if payment_id not in provider.payments:
+            return JSONResponse({"error": "not_found"}, 404)
+        result = await provider.transition(
+            payment_id, body["status"], notify=body.get("notify", True)
+        )
+        return JSONResponse(result)
+
+    @app.post("/control/config")
+    async def configure(request: Request) -> JSONResponse:
+        body = await request.json()
+        for key in ("latency_ms", "jitter_ms", "error_rate", "auto_after"):
+            if key in body:
+                setattr(provider, key, float(body[key]))
+        if "auto_status" in body:
+            provider.auto_status = body["auto_status"]
+        return JSONResponse(
+            {
+                "latency_ms": provider.latency_ms,
+                "jitter_ms": provider.jitter_ms,
+                "error_rate": provider.error_rate,
+                "auto_status": provider.auto_status,
+                "auto_after": provider.auto_after,
+            }
+        )
+
+    return app
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument(
+        "--webhook-url", default="http://127.0.0.1:8000/api/yookassa/webhook"
+    )
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="Share of API calls with a 500"
+    )
+    parser.add_argument(
+        "--auto-status",
+        choices=sorted(EVENTS),
+        help="Move every new payment to this status automatically",
+    )
+    parser.add_argument("--auto-after", type=float, default=1.0)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    provider = FakeProvider(
+        webhook_url=args.webhook_url,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        auto_status=args.auto_status,
+        auto_after=args.auto_after,
+    )
+    uvicorn.run(
+        create_fake_app(provider), host=args.host, port=args.port, log_level="warning"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from bot.db.models import AccessOperationKind, AccessOperationStatus
+from bot.services import access_operations
+
+NOW = datetime.now(timezone.utc)
+
+
+class FakeSession:
+    def __init__(self, events=None, loaded=()):
+        self.commits = 0
+        self.events = events if events is not None else []
+        self.loaded = loaded
+
+    async def commit(self):
+        self.commits += 1
+        self.events.append("commit")
+
+    async def rollback(self):
+        self.events.append("rollback")
+        for row in self.loaded:
+            row.expired = True
+
+
+class ExpiringOperation(SimpleNamespace):
+    """Row whose attributes, like an expired ORM object, need a lazy load."""
+
+    def __getattribute__(self, name):
+        state = object.__getattribute__(self, "__dict__")
+        if name != "__dict__" and state.get("expired"):
+            raise RuntimeError(f"lazy load of {name} outside the greenlet")
+        return super().__getattribute__(name)
+
+
+def _operation(kind, *, attempts=0):
+    return SimpleNamespace(
+        id=1,
+        user_id=20,
+        chat_id=-1002,
+        kind=kind,
+        status=AccessOperationStatus.PENDING,
+        attempts=attempts,
+        next_attempt_at=NOW,
+        last_error=None,
+    )
+
+
+def _patch(monkeypatch, operations, *, has_access):
+    async def claim(_session, now, limit, lease_until):
+        for operation in operations:
+            operation.next_attempt_at = lease_until
+        return operations
+
+    async def leased(_session, operation_id, lease_until):
+        for operation in operations:
+            if vars(operation)["id"] != operation_id:
+                continue
+            # populate_existing refreshes an expired row.
+            vars(operation).pop("expired", None)
+            if operation.next_attempt_at == lease_until:
+                return operation
+        return None
+
+    async def lock_user(_session, user_id):
+        return SimpleNamespace(id=user_id, tg_id=1020)
+
+    async def access(*args, **kwargs):
+        if callable(has_access):
+            return has_access()
+        return has_access
+
+    async def no_links(*args, **kwargs):
+        return {}
+
+    async def remember(*args, **kwargs):
+        return None
+
+    monkeypatch.setattr(
+        access_operations.access_operation_repo, "claim_due_access_operations", claim
+    )
+    monkeypatch.setattr(
+        access_operations.access_operation_repo, "get_leased_operation", leased
+    )
+    monkeypatch.setattr(access_operations.user_repo, "lock_user_by_id", lock_user)
+    monkeypatch.setattr(access_operations, "has_valid_access", access)
+    monkeypatch.setattr(access_operations, "load_reusable_links", no_links)
+    monkeypatch.setattr(access_operations, "remember_invite_links", remember)
+
+
+def test_retry_delay_backs_off_exponentially_up_to_cap():
+    assert access_operations.retry_delay(1) == timedelta(seconds=30)
+    assert access_operations.retry_delay(3) == timedelta(minutes=2)
+    assert access_operations.retry_delay(20) == timedelta(hours=1)
+
+
+def test_pending_ban_is_canceled_once_user_paid(monkeypatch):
+    operation = _operation(AccessOperationKind.BAN)
+
+    async def should_not_ban(*args, **kwargs):
+        raise AssertionError("paid user must not be banned")
+
+    _patch(monkeypatch, [operation], has_access=True)
+    monkeypatch.setattr(access_operations, "ban_in_chat", should_not_ban)
+
+    session = FakeSession()
+    asyncio.run(access_operations.process_access_operations(session, object()))
+
+    assert operation.status == AccessOperationStatus.CANCELED
+    # The claim and the result are committed separately.
+    assert session.commits == 2
+
+
+def test_failed_retry_is_rescheduled_with_backoff(monkeypatch):
+    operation = _operation(AccessOperationKind.BAN, attempts=1)
+    banned = []
+
+    events = []
+
+    async def failed_ban(_bot, chat_id, tg_id):
+        events.append("ban")
+        banned.append(chat_id)
+        return False
+
+    _patch(monkeypatch, [operation], has_access=False)
+    monkeypatch.setattr(access_operations, "ban_in_chat", failed_ban)
+
+    finished = asyncio.run(
+        access_operations.process_access_operations(FakeSession(events), object())
+    )
+
+    assert finished == 0
+    assert banned == [-1002]
+    # Claim, decision under the user lock, Telegram, then the recorded result.
+    assert events == ["commit", "commit", "ban", "commit"]
+    assert operation.status == AccessOperationStatus.PENDING
+    assert operation.attempts == 2
+    assert operation.next_attempt_at >= NOW + timedelta(minutes=1)
+
+
+def test_retried_grant_sends_only_the_recovered_link(monkeypatch):
+    operation = _operation(AccessOperationKind.GRANT)
+    sent = []
+
+    async def grant(_bot, chat_id, tg_id, known_link=None):
+        return "https://t.me/+group"
+
+    async def text(*args, **kwargs):
+        return "ready"
+
+    class FakeBot:
+        async def send_message(self, tg_id, text, reply_markup=None):
+            sent.append([row[0].url for row in reply_markup.inline_keyboard[:-1]])
+
+    _patch(monkeypatch, [operation], has_access=True)
+    monkeypatch.setattr(access_operations, "grant_in_chat", grant)
+    monkeypatch.setattr(access_operations, "get_text", text)
+
+    finished = asyncio.run(
+        access_operations.process_access_operations(FakeSession(), FakeBot())
+    )
+
+    assert finished == 1
+    assert operation.status == AccessOperationStatus.DONE
+    assert sent == [["https://t.me/+group"]]
+
+
+def test_grant_is_undone_when_access_ends_during_the_call(monkeypatch):
+    operation = _operation(AccessOperationKind.GRANT)
+    checks = iter([True, False])
+    revoked = []
+
+    async def grant(_bot, chat_id, tg_id, known_link=None):
+        return "https://t.me/+group"
+
+    async def revoke(_bot, chat_id, link):
+        revoked.append((chat_id, link))
+        return True
+
+    class SilentBot:
+        async def send_message(self, *args, **kwargs):
+            raise AssertionError("no link for a revoked user")
+
+    _patch(monkeypatch, [operation], has_access=lambda: next(checks))
+    monkeypatch.setattr(access_operations, "grant_in_chat", grant)
+    monkeypatch.setattr(access_operations, "revoke_invite_link", revoke)
+
+    asyncio.run(access_operations.process_access_operations(FakeSession(), SilentBot()))
+
+    assert operation.status == AccessOperationStatus.CANCELED
+    assert revoked == [(-1002, "https://t.me/+group")]
+
+
+def test_superseded_operation_keeps_its_new_state(monkeypatch):
+    operation = _operation(AccessOperationKind.BAN)
+
+    async def ban_and_requeue(_bot, chat_id, tg_id):
+        # Enqueued again while the call was in flight.
+        operation.kind = AccessOperationKind.GRANT
+        operation.next_attempt_at = NOW
+        return True
+
+    _patch(monkeypatch, [operation], has_access=False)
+    monkeypatch.setattr(access_operations, "ban_in_chat", ban_and_requeue)
+
+    asyncio.run(access_operations.process_access_operations(FakeSession(), object()))
+
+    assert operation.status == AccessOperationStatus.PENDING
+    assert operation.kind == AccessOperationKind.GRANT
+
+
+def test_crashed_operation_does_not_abandon_the_batch(monkeypatch):
+    crashing = ExpiringOperation(**vars(_operation(AccessOperationKind.BAN)))
+    following = ExpiringOperation(**vars(_operation(AccessOperationKind.BAN)))
+    following.id, following.chat_id = 2, -1003
+    banned = []
+
+    async def ban(_bot, chat_id, tg_id):
+        if chat_id == crashing.chat_id:
+            raise RuntimeError("boom")
+        banned.append(chat_id)
+        return True
+
+    _patch(monkeypatch, [crashing, following], has_access=False)
+    monkeypatch.setattr(access_operations, "ban_in_chat", ban)
+    session = FakeSession(loaded=[crashing, following])
+
+    finished = asyncio.run(
+        access_operations.process_access_operations(session, object())
+    )
+
+    assert finished == 1
+    assert banned == [-1003]
+    assert crashing.status == AccessOperationStatus.PENDING
+    assert crashing.attempts == 1
+    assert "boom" in crashing.last_error
+    assert following.status == AccessOperationStatus.DONE
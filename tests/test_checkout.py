@@ -0,0 +1,197 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+
+from bot.db.models import PaymentStatus
+from bot.handlers import menu
+
+
+class FakeResult:
+    def scalar_one_or_none(self):
+        return None
+
+
+class FakeSession:
+    def __init__(self, events):
+        self.events = events
+        self.added = []
+
+    async def execute(self, statement):
+        return FakeResult()
+
+    def add(self, obj):
+        self.added.append(obj)
+
+    async def flush(self):
+        for index, obj in enumerate(self.added, start=1):
+            obj.id = index
+
+    async def commit(self):
+        self.events.append("commit")
+
+    async def rollback(self):
+        self.events.append("rollback")
+
+
+class Responder:
+    bot = None
+
+    def __init__(self):
+        self.texts = []
+
+    async def answer(self, text, reply_markup=None):
+        self.texts.append(text)
+
+
+def _patch_checkout(monkeypatch, events, *, cas_ok):
+    async def version(_session, user_id):
+        return 4
+
+    async def advance(_session, user_id, expected):
+        events.append(("cas", expected))
+        return cas_ok
+
+    async def nothing(*args, **kwargs):
+        return None
+
+    async def no_renewal(*args, **kwargs):
+        return False
+
+    async def price(*args, **kwargs):
+        return 1990
+
+    async def flow(*args, **kwargs):
+        return 3
+
+    async def create_payment(**kwargs):
+        events.append(("create", kwargs["internal_payment_id"]))
+        return "ext-1", "https://pay"
+
+    async def attach(_session, payment_id, external_id, url, now):
+        events.append(("attach", payment_id, external_id))
+        return True
+
+    monkeypatch.setattr(menu, "get_user_version", version)
+    monkeypatch.setattr(menu, "advance_user_version", advance)
+    monkeypatch.setattr(menu, "_find_paid_payment_with_active_flow", nothing)
+    monkeypatch.setattr(menu, "_should_offer_renewal_checkout", no_renewal)
+    monkeypatch.setattr(menu.membership_repo, "get_latest_membership", nothing)
+    monkeypatch.setattr(menu, "calculate_price_rub", price)
+    monkeypatch.setattr(menu, "resolve_flow_for_payment", flow)
+    monkeypatch.setattr(
+        menu, "yookassa_adapter", SimpleNamespace(create_payment=create_payment)
+    )
+    monkeypatch.setattr(menu.payment_repo, "attach_external_payment", attach)
+
+
+def test_new_invoice_is_created_only_after_the_claim_commits(monkeypatch):
+    events = []
+    _patch_checkout(monkeypatch, events, cas_ok=True)
+    responder = Responder()
+
+    done = asyncio.run(
+        menu._checkout_attempt(
+            FakeSession(events), 7, 42, responder, menu.datetime.now(), first=True
+        )
+    )
+
+    assert done
+    # The YooKassa call runs between two short transactions, not inside one.
+    assert events == [
+        ("cas", 4),
+        "commit",
+        ("create", 1),
+        ("attach", 1, "ext-1"),
+        "commit",
+    ]
+    assert responder.texts[-1].startswith("💳 Счёт готов")
+
+
+def test_lost_claim_creates_nothing_and_decides_again(monkeypatch):
+    events = []
+    _patch_checkout(monkeypatch, events, cas_ok=False)
+    session = FakeSession(events)
+
+    done = asyncio.run(
+        menu._checkout_attempt(
+            session, 7, 42, Responder(), menu.datetime.now(), first=True
+        )
+    )
+
+    assert not done
+    assert events == [("cas", 4)]
+
+
+def test_checkout_retries_are_bounded(monkeypatch):
+    events = []
+    attempts = []
+
+    async def get_user(**kwargs):
+        return SimpleNamespace(id=7)
+
+    async def always_conflict(_session, user_id, tg_id, responder, now, *, first):
+        attempts.append(first)
+        return False
+
+    monkeypatch.setattr(menu, "get_or_create_user", get_user)
+    monkeypatch.setattr(menu, "_checkout_attempt", always_conflict)
+    responder = Responder()
+    tg_user = SimpleNamespace(id=42, username=None, first_name="A", last_name=None)
+
+    asyncio.run(
+        menu._send_personal_payment_link(FakeSession(events), tg_user, responder)
+    )
+
+    assert attempts == [True] + [False] * (menu.CHECKOUT_ATTEMPTS - 1)
+    assert events.count("rollback") == menu.CHECKOUT_ATTEMPTS
+    assert "другой запрос" in responder.texts[-1]
+
+
+def _rejecting_create(monkeypatch, events, status_code):
+    async def create_payment(**kwargs):
+        request = httpx.Request("POST", "https://yookassa.test/payments")
+        response = httpx.Response(status_code, request=request)
+        raise httpx.HTTPStatusError("refused", request=request, response=response)
+
+    async def transition(_session, payment_id, status):
+        events.append(("transition", payment_id, status))
+        return True
+
+    monkeypatch.setattr(
+        menu, "yookassa_adapter", SimpleNamespace(create_payment=create_payment)
+    )
+    monkeypatch.setattr(menu.payment_repo, "transition_pending_payment", transition)
+
+
+def test_rejected_invoice_is_failed_so_the_next_tap_starts_over(monkeypatch):
+    events = []
+    _patch_checkout(monkeypatch, events, cas_ok=True)
+    _rejecting_create(monkeypatch, events, 400)
+    responder = Responder()
+
+    done = asyncio.run(
+        menu._checkout_attempt(
+            FakeSession(events), 7, 42, responder, menu.datetime.now(), first=True
+        )
+    )
+
+    assert done
+    assert events[-2:] == [("transition", 1, PaymentStatus.FAILED), "commit"]
+    assert "отклонил" in responder.texts[-1]
+
+
+def test_provider_outage_keeps_the_invoice_for_a_retry(monkeypatch):
+    events = []
+    _patch_checkout(monkeypatch, events, cas_ok=True)
+    _rejecting_create(monkeypatch, events, 503)
+    responder = Responder()
+
+    asyncio.run(
+        menu._checkout_attempt(
+            FakeSession(events), 7, 42, responder, menu.datetime.now(), first=True
+        )
+    )
+
+    assert not [event for event in events if event[0] == "transition"]
+    assert "временно недоступен" in responder.texts[-1]
@@ -1,15 +1,25 @@
 import asyncio
-from datetime import datetime, timedelta, timezone
+from datetime import date, datetime, timedelta, timezone
 from types import SimpleNamespace
 
 import httpx
+from aiogram.exceptions import TelegramAPIError
 
 from bot.access_control import service as access_service
 from bot.admin.keyboards import user_card_kb
 from bot.admin.templates import DEFAULT_TEMPLATES, TEMPLATE_LABELS
-from bot.db.models import MembershipStatus
+from bot.db.models import (
+    MembershipStatus,
+    OutboxKind,
+    PaymentStatus,
+    WebhookEventStatus,
+)
 from bot.handlers.menu import _pay_later_screen, _shop_menu_kb
+from bot.payments import yookassa_adapter as yookassa_module
+from bot.payments.single_flight import SingleFlightPaymentAdapter
 from bot.payments.verification import validate_remote_payment
+from bot.repositories import webhook_inbox as webhook_inbox_repo
+from bot.services import mailings as mailing_service
 from bot.services import memberships as membership_service
 from bot.services import payments as payment_service
 from bot.services.flows import sales_window_for_start
@@ -17,7 +27,14 @@ from bot.services.memberships import PayLaterEligibility
 from bot.ui.formatters import format_flow_period, format_local_date, format_price_rub
 from bot.ui.keyboards import main_menu_kb
 from bot.ui.messages import split_message
+from bot.utils.circuit_breaker import CircuitBreaker, CircuitState
+from bot.utils.rate_limit import AsyncRateLimiter
+from bot.utils.telegram_session import CircuitBreakerSession, TelegramCircuitOpenError
+from bot.webhooks import app as webhook_app
+from bot.webhooks import inbox as webhook_inbox
 from bot.webhooks.app import create_app
+from bot.webhooks.inbox import WebhookRetry
+from bot.webhooks.sender import is_trusted_sender, parse_networks, resolve_client_ip
 
 NOW = datetime(2026, 8, 20, 9, 0, tzinfo=timezone.utc)
 
@@ -93,6 +110,38 @@ def test_sales_window_is_exactly_one_week_before_and_after_start():
     assert close_at == start + timedelta(days=7)
 
 
+def test_grant_access_runs_chats_concurrently_and_links_after_unban(monkeypatch):
+    calls = []
+    both_unbanning = asyncio.Event()
+
+    class FakeBot:
+        async def unban_chat_member(self, **kwargs):
+            calls.append(("unban", kwargs["chat_id"]))
+            if sum(kind == "unban" for kind, _ in calls) == 2:
+                both_unbanning.set()
+            # Each chat waits for the other: a sequential grant would hang.
+            await asyncio.wait_for(both_unbanning.wait(), 1)
+            if kwargs["chat_id"] == -1002:
+                raise TelegramAPIError(method=SimpleNamespace(), message="down")
+
+        async def create_chat_invite_link(self, **kwargs):
+            calls.append(("invite", kwargs["chat_id"]))
+            return SimpleNamespace(invite_link=f"https://t.me/+{kwargs['chat_id']}")
+
+    monkeypatch.setattr(
+        access_service,
+        "settings",
+        SimpleNamespace(primary_channel_id=-1001, secondary_discussion_id=-1002),
+    )
+    monkeypatch.setattr(access_service, "telegram_rate_limiter", AsyncRateLimiter(0))
+    result = run(access_service.grant_access(FakeBot(), 42))
+
+    assert calls.index(("unban", -1001)) < calls.index(("invite", -1001))
+    assert ("invite", -1002) not in calls
+    assert result.channel_ok and result.channel_link == "https://t.me/+-1001"
+    assert not result.group_ok and result.group_link is None
+
+
 def test_payment_is_not_attached_to_future_flow_outside_sales_window(monkeypatch):
     calls = []
 
@@ -175,29 +224,114 @@ def test_revoke_stops_before_group_when_channel_operation_fails(monkeypatch):
     assert not result.successful
 
 
-def test_confirmed_payment_locks_user_before_granting_access(monkeypatch):
+def test_rate_limiter_spaces_concurrent_calls():
+    limiter = AsyncRateLimiter(50)
+
+    async def burst():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await asyncio.gather(*(limiter.acquire() for _ in range(3)))
+        return loop.time() - started
+
+    assert run(burst()) >= 0.035
+
+
+def test_circuit_breaker_opens_probes_and_closes():
+    clock = SimpleNamespace(now=0.0)
+    breaker = CircuitBreaker(
+        "provider",
+        failure_threshold=2,
+        reset_seconds=30,
+        is_failure=lambda exc: isinstance(exc, ConnectionError),
+        clock=lambda: clock.now,
+    )
+    calls = []
+
+    async def failing():
+        calls.append("fail")
+        raise ConnectionError
+
+    async def rejected():
+        calls.append("rejected")
+        raise ValueError
+
+    async def ok():
+        calls.append("ok")
+        return "ok"
+
+    async def attempt(func):
+        try:
+            return await breaker.call(func)
+        except Exception as exc:
+            return type(exc).__name__
+
+    # Errors the dependency answered with do not count as outages.
+    assert run(attempt(failing)) == "ConnectionError"
+    assert run(attempt(rejected)) == "ValueError"
+    assert run(attempt(failing)) == "ConnectionError"
+    assert breaker.state == CircuitState.CLOSED
+    assert run(attempt(failing)) == "ConnectionError"
+    assert breaker.state == CircuitState.OPEN
+
+    assert run(attempt(ok)) == "CircuitOpenError"
+    assert calls.count("ok") == 0
+
+    clock.now = 31
+    assert breaker.state == CircuitState.HALF_OPEN
+    assert run(attempt(failing)) == "ConnectionError"
+    assert breaker.state == CircuitState.OPEN
+
+    clock.now = 62
+    assert run(attempt(ok)) == "ok"
+    assert breaker.snapshot() == {"state": CircuitState.CLOSED, "failures": 0}
+
+
+def test_open_telegram_circuit_fails_like_an_api_error():
+    breaker = CircuitBreaker("telegram", failure_threshold=1, reset_seconds=60)
+    session = CircuitBreakerSession(breaker)
+
+    async def outage():
+        raise ConnectionError
+
+    async def call():
+        try:
+            await breaker.call(outage)
+        except ConnectionError:
+            pass
+        try:
+            await session.make_request(SimpleNamespace(), SimpleNamespace())
+        except TelegramAPIError as exc:
+            return exc
+        finally:
+            await session.close()
+
+    assert isinstance(run(call()), TelegramCircuitOpenError)
+
+
+def test_confirmed_payment_queues_access_instead_of_calling_telegram(monkeypatch):
     calls = []
 
     async def lock_user(_session, user_id):
         calls.append(("lock", user_id))
         return SimpleNamespace(id=user_id, tg_id=42)
 
-    async def grant(_bot, tg_id):
-        calls.append(("grant", tg_id))
-        return access_service.AccessChangeResult(channel_ok=True, group_ok=True)
+    async def enqueue(_session, user_id, kind, payload=None, *, dedupe_key=None):
+        calls.append(("enqueue", user_id, kind))
+        return True
 
     monkeypatch.setattr(payment_service.user_repo, "lock_user_by_id", lock_user)
-    monkeypatch.setattr(payment_service, "grant_access", grant)
+    monkeypatch.setattr(payment_service, "enqueue_outbox", enqueue)
     payment = SimpleNamespace(status="paid", user_id=7)
 
-    result = run(
-        payment_service.confirm_payment(
-            SimpleNamespace(), SimpleNamespace(), payment, notify_user=False
-        )
-    )
+    assert run(payment_service.confirm_payment(SimpleNamespace(), payment))
+    assert calls == [("lock", 7), ("enqueue", 7, OutboxKind.PAID_ACCESS)]
 
-    assert result.successful
-    assert calls == [("lock", 7), ("grant", 42)]
+    # Interactive callers grant access themselves after committing.
+    calls.clear()
+    assert run(
+        payment_service.confirm_payment(SimpleNamespace(), payment, notify_user=False)
+    )
+    assert calls == [("lock", 7)]
 
 
 def test_remote_payment_must_match_identity_amount_and_currency():
@@ -246,6 +380,236 @@ def test_webhook_rejects_invalid_json_without_server_error():
     assert response.status_code == 400
 
 
+class _InboxSession:
+    def __init__(self):
+        self.commits = 0
+        self.rollbacks = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def commit(self):
+        self.commits += 1
+
+    async def rollback(self):
+        self.rollbacks += 1
+
+
+def test_webhook_stores_event_and_acknowledges_without_verifying(monkeypatch):
+    stored = []
+    session = _InboxSession()
+
+    async def add_event(_session, event, payment_id, payload, now, **kwargs):
+        duplicate = (event, payment_id) in [item[:2] for item in stored]
+        stored.append((event, payment_id, payload))
+        return not duplicate
+
+    class Adapter:
+        async def get_payment(self, *args, **kwargs):
+            raise AssertionError("the webhook must not call YooKassa inline")
+
+    monkeypatch.setattr(webhook_app, "AsyncSessionLocal", lambda: session)
+    monkeypatch.setattr(webhook_app, "add_webhook_event", add_event)
+    app = create_app(SimpleNamespace(), Adapter())
+    wakes = []
+    monkeypatch.setattr(app.state.inbox, "wake", lambda: wakes.append(1))
+    payload = {"event": "payment.succeeded", "object": {"id": "pay-1"}}
+
+    async def deliver_twice():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            first = await client.post("/api/yookassa/webhook", json=payload)
+            second = await client.post("/api/yookassa/webhook", json=payload)
+        return first, second
+
+    first, second = run(deliver_twice())
+    assert first.status_code == second.status_code == 200
+    assert [item[:2] for item in stored] == [("payment.succeeded", "pay-1")] * 2
+    assert session.commits == 2
+    assert wakes == [1]
+
+
+def test_inbox_retries_unverified_event_and_gives_up(monkeypatch):
+    session = _InboxSession()
+    event = SimpleNamespace(
+        id=5,
+        event="payment.succeeded",
+        payment_id="pay-1",
+        attempts=0,
+        status=WebhookEventStatus.PENDING,
+        sender_verified=False,
+        payload={},
+    )
+    rescheduled = []
+
+    async def claim(_session, now):
+        return event
+
+    async def process(*args):
+        raise WebhookRetry("timeout")
+
+    async def reschedule(_session, event_id, **kwargs):
+        rescheduled.append((event_id, kwargs["attempts"], kwargs["failed"]))
+        event.attempts = kwargs["attempts"]
+
+    monkeypatch.setattr(webhook_inbox_repo, "claim_next_webhook_event", claim)
+    monkeypatch.setattr(webhook_inbox_repo, "reschedule_webhook_event", reschedule)
+    monkeypatch.setattr(webhook_inbox, "process_webhook_event", process)
+    monkeypatch.setattr(
+        webhook_inbox, "settings", SimpleNamespace(webhook_max_attempts=2)
+    )
+    inbox = webhook_inbox.WebhookInbox(None, lambda: session, 1)
+
+    assert run(inbox.process_next()) is True
+    assert run(inbox.process_next()) is True
+    assert rescheduled == [(5, 1, False), (5, 2, True)]
+    assert session.rollbacks == 2
+    assert event.status == WebhookEventStatus.PENDING
+
+
+def test_inbox_marks_event_processed_in_the_same_commit(monkeypatch):
+    session = _InboxSession()
+    event = SimpleNamespace(
+        id=6,
+        event="payment.succeeded",
+        payment_id="pay-2",
+        attempts=0,
+        status=WebhookEventStatus.PENDING,
+        processed_at=None,
+        sender_verified=False,
+        payload={},
+    )
+    processed = []
+
+    async def claim(_session, now):
+        return event if event.status == WebhookEventStatus.PENDING else None
+
+    async def process(_session, _adapter, kind, payment_id, delivered):
+        processed.append((kind, payment_id))
+        assert session.commits == 0
+
+    monkeypatch.setattr(webhook_inbox_repo, "claim_next_webhook_event", claim)
+    monkeypatch.setattr(webhook_inbox, "process_webhook_event", process)
+    inbox = webhook_inbox.WebhookInbox(None, lambda: session, 1)
+
+    assert run(inbox.process_next()) is True
+    assert run(inbox.process_next()) is False
+    assert processed == [("payment.succeeded", "pay-2")]
+    assert event.status == WebhookEventStatus.PROCESSED
+    assert event.attempts == 1
+    assert session.commits == 1
+
+
+def test_forwarded_address_is_only_trusted_behind_known_proxies():
+    proxies = parse_networks("127.0.0.1,10.0.0.0/8")
+    yookassa = parse_networks("185.71.76.0/27,77.75.156.11")
+
+    behind_nginx = resolve_client_ip("127.0.0.1", "185.71.76.5", proxies)
+    assert is_trusted_sender(behind_nginx, yookassa)
+    # A forged header only counts when every hop to its right is a proxy.
+    chained = resolve_client_ip("127.0.0.1", "185.71.76.5, 203.0.113.9", proxies)
+    assert str(chained) == "203.0.113.9"
+    direct = resolve_client_ip("203.0.113.9", "185.71.76.5", proxies)
+    assert not is_trusted_sender(direct, yookassa)
+    assert not is_trusted_sender(resolve_client_ip("bad", None, proxies), yookassa)
+
+
+def _webhook_payment(status=PaymentStatus.PENDING):
+    return SimpleNamespace(
+        id=11,
+        user_id=7,
+        amount_rub=1990,
+        currency="RUB",
+        status=status,
+        expires_at=None,
+        created_at=NOW,
+    )
+
+
+def _patch_webhook_payment(monkeypatch, payment, confirmed):
+    async def get_payment(_session, external_id):
+        return payment
+
+    async def lock_user(_session, user_id):
+        return SimpleNamespace(id=user_id)
+
+    async def confirm(_session, local, **kwargs):
+        confirmed.append(local.id)
+
+    monkeypatch.setattr(webhook_inbox, "get_payment_by_external_id", get_payment)
+    monkeypatch.setattr(webhook_inbox, "lock_user_by_id", lock_user)
+    monkeypatch.setattr(webhook_inbox, "confirm_payment", confirm)
+
+
+def test_verified_delivery_confirms_without_provider_lookup(monkeypatch):
+    confirmed = []
+    _patch_webhook_payment(monkeypatch, _webhook_payment(), confirmed)
+    delivered = {
+        "id": "pay-1",
+        "status": "succeeded",
+        "metadata": {"internal_payment_id": "11", "user_id": "7"},
+        "amount": {"value": "1990.00", "currency": "RUB"},
+    }
+
+    class Adapter:
+        calls = 0
+
+        async def get_payment(self, external_id, *, fresh=False):
+            self.calls += 1
+            return delivered
+
+    adapter = Adapter()
+    run(
+        webhook_inbox.process_webhook_event(
+            None, adapter, "payment.succeeded", "pay-1", delivered
+        )
+    )
+    assert confirmed == [11]
+    assert adapter.calls == 0
+
+    # A delivered object that does not match is settled by the API.
+    run(
+        webhook_inbox.process_webhook_event(
+            None,
+            adapter,
+            "payment.succeeded",
+            "pay-1",
+            {**delivered, "amount": {"value": "1.00", "currency": "RUB"}},
+        )
+    )
+    assert confirmed == [11, 11]
+    assert adapter.calls == 1
+
+
+def test_pending_snapshot_is_reused_only_while_fresh():
+    payment = SimpleNamespace(
+        confirmation_url=None, remote_status=None, remote_checked_at=None
+    )
+    assert not payment_service.has_fresh_pending_snapshot(payment, NOW)
+
+    payment_service.record_remote_snapshot(
+        payment,
+        {"status": "pending", "confirmation": {"confirmation_url": "https://pay"}},
+        NOW,
+    )
+    assert payment.confirmation_url == "https://pay"
+    assert payment_service.has_fresh_pending_snapshot(payment, NOW)
+    stale = NOW + timedelta(
+        seconds=payment_service.settings.payment_snapshot_fresh_seconds + 1
+    )
+    assert not payment_service.has_fresh_pending_snapshot(payment, stale)
+
+    # A lookup without a confirmation block keeps the stored link.
+    payment_service.record_remote_snapshot(payment, {"status": "succeeded"}, NOW)
+    assert payment.confirmation_url == "https://pay"
+    assert not payment_service.has_fresh_pending_snapshot(payment, NOW)
+
+
 def test_pay_later_is_not_offered_for_stale_membership(monkeypatch):
     membership = SimpleNamespace(
         grace_end_at=NOW - timedelta(days=1),
@@ -314,3 +678,323 @@ def test_apply_pay_later_updates_membership_after_eligibility_check(monkeypatch)
     assert membership.pay_later_deadline_at == NOW + timedelta(days=9)
     assert membership.access_end_at == NOW + timedelta(days=9)
     assert membership.grace_end_at == NOW + timedelta(days=10)
+
+
+def test_pay_later_reminders_use_constant_queries_and_skip_sent_keys(monkeypatch):
+    rows = [
+        (1, 10, NOW + timedelta(hours=5), 1010),
+        (2, 20, NOW + timedelta(days=1), 1020),
+        (3, 30, NOW + timedelta(hours=2), 1030),
+    ]
+    executions = []
+    sent = []
+    audit = []
+
+    class FakeSession:
+        async def execute(self, query):
+            executions.append(query)
+            return SimpleNamespace(all=lambda: rows)
+
+    class FakeBot:
+        async def send_message(self, tg_id, text):
+            sent.append((tg_id, text))
+
+    async def existing_keys(_session, _action, keys):
+        executions.append(keys)
+        return {"auto:pay_later_deadline_today:membership:3:2026-08-20"}
+
+    async def templates(_session, keys):
+        executions.append(keys)
+        return {"pay_later_deadline_today": "today"}
+
+    async def record(_session, action, payload):
+        audit.append(payload["key"])
+
+    monkeypatch.setattr(mailing_service, "list_existing_action_keys", existing_keys)
+    monkeypatch.setattr(mailing_service, "get_templates_by_keys", templates)
+    monkeypatch.setattr(mailing_service, "add_audit_log", record)
+
+    count = run(
+        mailing_service.send_pay_later_deadline_reminders(FakeSession(), FakeBot(), NOW)
+    )
+
+    assert count == 2
+    assert len(executions) == 3
+    assert sent == [
+        (1010, "today"),
+        (1020, DEFAULT_TEMPLATES["pay_later_deadline_minus_1"]),
+    ]
+    assert audit == [
+        "auto:pay_later_deadline_today:membership:1:2026-08-20",
+        "auto:pay_later_deadline_minus_1:membership:2:2026-08-20",
+    ]
+
+
+def test_flow_mailing_calendar_covers_start_and_end_reminders():
+    flow = SimpleNamespace(
+        start_at=datetime(2026, 9, 1, 9, 0, tzinfo=timezone.utc),
+        end_at=datetime(2026, 10, 6, 9, 0, tzinfo=timezone.utc),
+        is_free=False,
+    )
+
+    events = sorted(mailing_service.plan_flow_mailing_events(flow))
+
+    assert [(str(day), key) for day, key, _ in events] == [
+        ("2026-08-25", "mailing_active_7"),
+        ("2026-08-25", "mailing_former_7"),
+        ("2026-08-29", "mailing_active_3"),
+        ("2026-08-29", "mailing_former_3"),
+        ("2026-10-03", "paid_end_minus_3"),
+        ("2026-10-05", "paid_end_minus_1"),
+    ]
+
+
+def test_due_calendar_mailing_drops_users_who_paid_after_prebuild(monkeypatch):
+    event = SimpleNamespace(
+        id=5,
+        template_key="paid_end_minus_1",
+        audience=mailing_service.MAILING_AUDIENCE_FLOW,
+        recipients=[10, 20, 30],
+        cursor=0,
+        status="planned",
+        sent_count=None,
+        sent_at=None,
+    )
+    delivered = _patch_calendar_mailing(monkeypatch, event, participants={20})
+
+    sent = run(
+        mailing_service.send_due_mailings(
+            _CommitSession(), object(), NOW + timedelta(hours=2)
+        )
+    )
+
+    assert sent == 2
+    assert delivered == [[10, 30]]
+    assert event.status == "sent"
+
+
+def test_calendar_mailing_resumes_from_cursor_after_budget_runs_out(monkeypatch):
+    event = SimpleNamespace(
+        id=6,
+        template_key="mailing_active_3",
+        audience=mailing_service.MAILING_AUDIENCE_ACTIVE,
+        recipients=list(range(1, 31)),
+        cursor=0,
+        status="planned",
+        sent_count=None,
+        sent_at=None,
+    )
+    delivered = _patch_calendar_mailing(monkeypatch, event, participants=set())
+    monkeypatch.setattr(mailing_service, "MAILING_CHUNK_SIZE", 20)
+
+    class OneChunkBudget:
+        checks = 0
+
+        @property
+        def exhausted(self):
+            self.checks += 1
+            return self.checks > 2
+
+    later = NOW + timedelta(hours=2)
+    run(
+        mailing_service.send_due_mailings(
+            _CommitSession(), object(), later, OneChunkBudget()
+        )
+    )
+    assert event.cursor == 20
+    assert event.status == "planned"
+
+    run(mailing_service.send_due_mailings(_CommitSession(), object(), later))
+    assert event.cursor == 30
+    assert event.sent_count == 30
+    assert event.status == "sent"
+    assert [len(chunk) for chunk in delivered] == [20, 10]
+
+
+def test_calendar_mailings_catch_up_missed_days_and_expire_older(monkeypatch, caplog):
+    calls = []
+
+    async def expire_stale(_session, not_before):
+        calls.append(("expire", not_before))
+        return [3]
+
+    async def due_events(_session, today, not_before):
+        calls.append(("due", today, not_before))
+        return []
+
+    monkeypatch.setattr(
+        mailing_service.mailing_event_repo, "expire_stale_events", expire_stale
+    )
+    monkeypatch.setattr(
+        mailing_service.mailing_event_repo, "list_due_events", due_events
+    )
+
+    run(
+        mailing_service.send_due_mailings(
+            _CommitSession(), object(), NOW + timedelta(hours=2)
+        )
+    )
+
+    assert calls == [
+        ("expire", date(2026, 8, 18)),
+        ("due", date(2026, 8, 20), date(2026, 8, 18)),
+    ]
+    assert "expired unsent" in caplog.text
+
+
+def test_calendar_mailings_wait_for_the_morning_send_time(monkeypatch):
+    async def should_not_list(*args, **kwargs):
+        raise AssertionError("mailings must not start before 10:00")
+
+    monkeypatch.setattr(
+        mailing_service.mailing_event_repo, "list_due_events", should_not_list
+    )
+    assert run(mailing_service.send_due_mailings(object(), object(), NOW)) == 0
+
+
+class _CommitSession:
+    async def commit(self):
+        return None
+
+
+def _patch_calendar_mailing(monkeypatch, event, *, participants):
+    flow = SimpleNamespace(id=1, end_at=NOW + timedelta(days=1))
+    delivered = []
+
+    async def due_events(_session, today, not_before):
+        return [(event, flow)] if event.status == "planned" else []
+
+    async def expire_stale(_session, not_before):
+        return []
+
+    async def next_paid(*args, **kwargs):
+        return SimpleNamespace(id=2)
+
+    async def flow_participants(_session, flow_id):
+        return participants
+
+    async def text(*args, **kwargs):
+        return "soon"
+
+    async def send_bulk(_session, _bot, user_ids, _text, **kwargs):
+        delivered.append(user_ids)
+        return len(user_ids)
+
+    async def record(*args, **kwargs):
+        return None
+
+    monkeypatch.setattr(
+        mailing_service.mailing_event_repo, "list_due_events", due_events
+    )
+    monkeypatch.setattr(
+        mailing_service.mailing_event_repo, "expire_stale_events", expire_stale
+    )
+    monkeypatch.setattr(mailing_service.flow_repo, "get_next_paid_flow", next_paid)
+    monkeypatch.setattr(
+        mailing_service, "_get_flow_participant_user_ids", flow_participants
+    )
+    monkeypatch.setattr(mailing_service, "_get_template_text", text)
+    monkeypatch.setattr(mailing_service, "_send_bulk", send_bulk)
+    monkeypatch.setattr(mailing_service, "add_audit_log", record)
+    return delivered
+
+
+def _yookassa_with_responses(monkeypatch, responses):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return responses.pop(0)
+
+    async def no_sleep(_delay):
+        return None
+
+    monkeypatch.setattr(yookassa_module.asyncio, "sleep", no_sleep)
+    adapter = yookassa_module.YooKassaAdapter(transport=httpx.MockTransport(handler))
+    return adapter, calls
+
+
+def test_yookassa_get_retries_server_errors_on_one_pooled_client(monkeypatch):
+    adapter, calls = _yookassa_with_responses(
+        monkeypatch,
+        [
+            httpx.Response(503),
+            httpx.Response(200, json={"id": "p1", "status": "pending"}),
+            httpx.Response(200, json={"id": "p2", "status": "succeeded"}),
+        ],
+    )
+
+    async def scenario():
+        first = await adapter.get_payment("p1")
+        client = adapter._client
+        second = await adapter.get_payment("p2")
+        assert adapter._client is client
+        await adapter.aclose()
+        return first, second
+
+    first, second = run(scenario())
+
+    assert first["status"] == "pending"
+    assert second["status"] == "succeeded"
+    assert [call.url.path for call in calls] == [
+        "/v3/payments/p1",
+        "/v3/payments/p1",
+        "/v3/payments/p2",
+    ]
+
+
+def test_yookassa_client_errors_are_not_retried(monkeypatch):
+    adapter, calls = _yookassa_with_responses(monkeypatch, [httpx.Response(404)])
+
+    async def scenario():
+        try:
+            await adapter.get_payment("missing")
+        except httpx.HTTPStatusError as exc:
+            return exc.response.status_code
+        finally:
+            await adapter.aclose()
+
+    assert run(scenario()) == 404
+    assert len(calls) == 1
+
+
+class _CountingAdapter:
+    def __init__(self):
+        self.calls = 0
+
+    async def get_payment(self, external_id, *, fresh=False):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return {"id": external_id, "status": "pending"}
+
+
+def test_concurrent_status_lookups_share_one_provider_request():
+    inner = _CountingAdapter()
+    adapter = SingleFlightPaymentAdapter(inner, ttl_seconds=60)
+
+    async def scenario():
+        results = await asyncio.gather(*(adapter.get_payment("p1") for _ in range(5)))
+        cached = await adapter.get_payment("p1")
+        return results, cached
+
+    results, cached = run(scenario())
+
+    assert inner.calls == 1
+    assert all(result == {"id": "p1", "status": "pending"} for result in results)
+    assert cached["status"] == "pending"
+
+
+def test_fresh_lookup_bypasses_cache_and_expired_entries_refetch():
+    inner = _CountingAdapter()
+    cached_adapter = SingleFlightPaymentAdapter(inner, ttl_seconds=60)
+    expired_adapter = SingleFlightPaymentAdapter(inner, ttl_seconds=0)
+
+    async def scenario():
+        await cached_adapter.get_payment("p1")
+        await cached_adapter.get_payment("p1", fresh=True)
+        await expired_adapter.get_payment("p2")
+        await expired_adapter.get_payment("p2")
+
+    run(scenario())
+
+    assert inner.calls == 4
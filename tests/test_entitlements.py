@@ -1,7 +1,7 @@
 import asyncio
 from datetime import datetime, timezone
 
-from bot.services.entitlements import has_valid_access
+from bot.services.entitlements import has_valid_access, users_with_valid_access
 
 NOW = datetime(2026, 8, 20, tzinfo=timezone.utc)
 
@@ -13,6 +13,12 @@ class FakeResult:
     def scalar_one_or_none(self):
         return self.value
 
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self.value
+
 
 class FakeSession:
     def __init__(self, results):
@@ -45,3 +51,18 @@ def test_access_exempt_user_is_protected_without_membership_or_payment_lookup():
     session = FakeSession([True])
     assert asyncio.run(has_valid_access(session, 7, NOW))
     assert session.executions == 1
+
+
+def test_batched_access_check_unions_exempt_membership_and_paid_users():
+    session = FakeSession([[1], [2], [2, 3]])
+    protected = asyncio.run(
+        users_with_valid_access(session, [1, 2, 3, 4], NOW, exclude_membership_ids=[9])
+    )
+    assert protected == {1, 2, 3}
+    assert session.executions == 3
+
+
+def test_batched_access_check_skips_queries_without_users():
+    session = FakeSession([])
+    assert asyncio.run(users_with_valid_access(session, [], NOW)) == set()
+    assert session.executions == 0
@@ -0,0 +1,93 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from aiogram.exceptions import TelegramAPIError
+
+from bot.access_control import service as access_service
+from bot.services import invite_links
+from bot.utils.rate_limit import AsyncRateLimiter
+
+NOW = datetime.now(timezone.utc)
+CHANNEL, GROUP = -1001, -1002
+
+
+class FakeBot:
+    def __init__(self, *, fail_revoke=()):
+        self.created = []
+        self.revoked = []
+        self._fail_revoke = set(fail_revoke)
+
+    async def unban_chat_member(self, **kwargs):
+        return True
+
+    async def create_chat_invite_link(self, **kwargs):
+        self.created.append(kwargs["chat_id"])
+        return SimpleNamespace(invite_link=f"https://t.me/+new{kwargs['chat_id']}")
+
+    async def revoke_chat_invite_link(self, **kwargs):
+        if kwargs["chat_id"] in self._fail_revoke:
+            raise TelegramAPIError(method=SimpleNamespace(), message="gone")
+        self.revoked.append(kwargs["invite_link"])
+
+
+def _patch(monkeypatch, **repo):
+    chats = SimpleNamespace(
+        primary_channel_id=CHANNEL,
+        secondary_discussion_id=GROUP,
+        invite_link_min_remaining_minutes=60,
+    )
+    monkeypatch.setattr(access_service, "settings", chats)
+    monkeypatch.setattr(invite_links, "settings", chats)
+    monkeypatch.setattr(access_service, "telegram_rate_limiter", AsyncRateLimiter(0))
+    for name, func in repo.items():
+        monkeypatch.setattr(invite_links.invite_link_repo, name, func)
+
+
+def test_grant_reuses_a_still_valid_link_and_stores_only_new_ones(monkeypatch):
+    saved = []
+    lookups = []
+
+    async def reusable(_session, user_id, valid_until):
+        lookups.append(valid_until)
+        return {CHANNEL: "https://t.me/+old"}
+
+    async def save(_session, user_id, links, expires_at, now):
+        saved.append((user_id, dict(links), expires_at - now))
+
+    _patch(monkeypatch, get_reusable_links=reusable, save_invite_links=save)
+    bot = FakeBot()
+
+    result = asyncio.run(invite_links.grant_access_with_links(None, bot, 7, 42))
+
+    assert result.channel_link == "https://t.me/+old"
+    assert result.group_link == f"https://t.me/+new{GROUP}"
+    assert bot.created == [GROUP]
+    assert saved == [
+        (7, {GROUP: f"https://t.me/+new{GROUP}"}, access_service.INVITE_LINK_TTL)
+    ]
+    # Links about to expire are not offered again.
+    assert lookups[0] - NOW >= timedelta(minutes=59)
+
+
+def test_only_successfully_revoked_links_are_marked(monkeypatch):
+    links = [
+        SimpleNamespace(id=1, chat_id=CHANNEL, invite_link="https://t.me/+a"),
+        SimpleNamespace(id=2, chat_id=GROUP, invite_link="https://t.me/+b"),
+    ]
+    marked = []
+
+    async def active(_session, user_id, now, chat_ids=None):
+        return links
+
+    async def mark(_session, link_ids, now):
+        marked.extend(link_ids)
+
+    _patch(monkeypatch, list_active_links=active, mark_links_revoked=mark)
+    bot = FakeBot(fail_revoke={GROUP})
+
+    revoked = asyncio.run(invite_links.revoke_user_invite_links(None, bot, 7))
+
+    assert revoked == 1
+    assert bot.revoked == ["https://t.me/+a"]
+    assert marked == [1]
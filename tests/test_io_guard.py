@@ -0,0 +1,90 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from bot.db import io_guard
+
+
+class FakeSession:
+    def __init__(self, *, holds=True, wrote=False):
+        self.info = {}
+        if holds:
+            self.info[io_guard._HOLDS_CONNECTION] = True
+        if wrote:
+            self.info[io_guard._WROTE] = True
+        self.new = self.dirty = self.deleted = ()
+        self.commits = 0
+
+    async def commit(self):
+        self.commits += 1
+        self.info.clear()
+
+
+def _guard(monkeypatch, mode):
+    monkeypatch.setattr(io_guard, "settings", SimpleNamespace(db_io_guard=mode))
+
+
+def test_marks_follow_the_transaction():
+    engine = create_engine("sqlite://")
+    with Session(engine) as session:
+        session.execute(text("CREATE TABLE t (x INTEGER)"))
+        session.commit()
+        assert not session.info
+
+        session.execute(text("SELECT 1")).all()
+        assert session.info[io_guard._HOLDS_CONNECTION]
+
+        session.execute(text("INSERT INTO t VALUES (1)"))
+        assert session.info[io_guard._WROTE]
+
+        session.rollback()
+        assert not session.info
+
+
+def test_read_only_transaction_is_released_before_io(monkeypatch):
+    _guard(monkeypatch, "raise")
+    session = FakeSession()
+
+    async def scenario():
+        with io_guard.bind_session(session, "menu"):
+            await io_guard.before_network_io("Telegram SendMessage")
+            await io_guard.before_network_io("Telegram SendMessage")
+
+    asyncio.run(scenario())
+
+    assert session.commits == 1
+
+
+def test_unbound_or_idle_sessions_are_left_alone(monkeypatch):
+    _guard(monkeypatch, "raise")
+    idle = FakeSession(holds=False, wrote=True)
+
+    async def scenario():
+        await io_guard.before_network_io("Telegram SendMessage")
+        with io_guard.bind_session(idle, "menu"):
+            await io_guard.before_network_io("Telegram SendMessage")
+
+    asyncio.run(scenario())
+
+    assert idle.commits == 0
+
+
+def test_pending_writes_are_flagged_not_committed(monkeypatch, caplog):
+    _guard(monkeypatch, "warn")
+    session = FakeSession(wrote=True)
+
+    async def scenario():
+        with io_guard.bind_session(session, "pay_later_handler"):
+            await io_guard.before_network_io("YooKassa POST /payments")
+
+    asyncio.run(scenario())
+
+    assert session.commits == 0
+    assert "open transaction" in caplog.text
+
+    _guard(monkeypatch, "raise")
+    with pytest.raises(io_guard.TransactionOpenDuringIOError):
+        asyncio.run(scenario())
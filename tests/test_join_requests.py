@@ -57,11 +57,26 @@ def test_active_user_join_request_is_approved(monkeypatch):
     )
     monkeypatch.setattr(join_requests, "get_user_by_tg_id", get_user)
     monkeypatch.setattr(join_requests, "has_valid_access", has_access)
+    revoked = []
 
-    asyncio.run(join_requests.approve_join_request(_request(bot), SimpleNamespace()))
+    async def revoke_links(_session, _bot, user_id, chat_ids):
+        revoked.append((user_id, chat_ids))
+
+    async def commit():
+        revoked.append("commit")
+
+    monkeypatch.setattr(join_requests, "revoke_user_invite_links", revoke_links)
+
+    asyncio.run(
+        join_requests.approve_join_request(
+            _request(bot), SimpleNamespace(commit=commit)
+        )
+    )
 
     assert bot.approved == [{"chat_id": -1001, "user_id": 42}]
     assert not bot.declined
+    # The used link is revoked so it cannot be passed on.
+    assert revoked == [(7, [-1001]), "commit"]
 
 
 def test_known_user_without_valid_access_is_declined(monkeypatch):
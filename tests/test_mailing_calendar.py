@@ -0,0 +1,96 @@
+"""Calendar rebuilds against a real database.
+
+Needs a disposable PostgreSQL database in TEST_DATABASE_URL; the schema is
+recreated from the models.
+"""
+
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from bot.db.base import Base
+from bot.db.models import Flow, MailingEvent, MailingEventStatus
+from bot.services import mailings as mailing_service
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(
+    not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set"
+)
+
+
+def test_sync_keeps_started_events_and_prebuilt_audiences():
+    async def scenario():
+        engine = create_async_engine(TEST_DATABASE_URL)
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.drop_all)
+                await conn.run_sync(Base.metadata.create_all)
+            async with AsyncSession(engine, expire_on_commit=False) as session:
+                now = datetime.now(timezone.utc)
+                # The 3-day start mailings fall on today, the 7-day ones were
+                # due four days ago.
+                flow = Flow(
+                    title="Flow",
+                    start_at=now + timedelta(days=3),
+                    end_at=now + timedelta(days=38),
+                    duration_weeks=5,
+                    is_free=False,
+                    sales_open_at=now - timedelta(days=14),
+                    sales_close_at=now + timedelta(days=3),
+                )
+                session.add(flow)
+                await session.flush()
+                session.add(
+                    MailingEvent(
+                        flow_id=flow.id,
+                        send_on=(now - timedelta(days=4)).date(),
+                        template_key="mailing_active_7",
+                        audience=mailing_service.MAILING_AUDIENCE_ACTIVE,
+                        status=MailingEventStatus.PLANNED,
+                    )
+                )
+                await session.commit()
+                await mailing_service.sync_mailing_calendar(session)
+                await session.commit()
+
+                events = {
+                    event.template_key: event
+                    for event in (await session.scalars(select(MailingEvent))).all()
+                }
+                today = events["mailing_active_3"]
+                today.recipients, today.cursor, today.sent_count = [1, 2, 3], 2, 2
+                overdue = events["mailing_active_7"]
+                overdue.recipients, overdue.cursor, overdue.sent_count = [4, 5], 1, 1
+                prepared = events["paid_end_minus_3"]
+                prepared.recipients = [6]
+                await session.commit()
+
+                await mailing_service.sync_mailing_calendar(session)
+                await session.commit()
+                rows = (
+                    await session.execute(
+                        select(
+                            MailingEvent.template_key,
+                            MailingEvent.cursor,
+                            MailingEvent.sent_count,
+                            MailingEvent.recipients,
+                        )
+                    )
+                ).all()
+                return {
+                    key: (cursor, sent, recipients)
+                    for key, cursor, sent, recipients in rows
+                }
+        finally:
+            await engine.dispose()
+
+    rows = asyncio.run(scenario())
+
+    assert rows["mailing_active_3"] == (2, 2, [1, 2, 3])
+    assert rows["mailing_active_7"] == (1, 1, [4, 5])
+    assert rows["paid_end_minus_3"][2] == [6]
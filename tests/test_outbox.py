@@ -0,0 +1,208 @@
+import asyncio
+from types import SimpleNamespace
+
+from aiogram.exceptions import TelegramForbiddenError, TelegramNetworkError
+
+from bot.access_control.service import AccessChangeResult
+from bot.db.models import OutboxKind, OutboxStatus
+from bot.services import outbox
+
+
+class FakeSession:
+    def __init__(self):
+        self.commits = 0
+        self.rollbacks = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def commit(self):
+        self.commits += 1
+
+    async def rollback(self):
+        self.rollbacks += 1
+
+
+class FakeBot:
+    def __init__(self, error=None):
+        self.sent = []
+        self._error = error
+
+    async def send_message(self, tg_id, text, reply_markup=None):
+        if self._error is not None:
+            raise self._error
+        self.sent.append((tg_id, text, reply_markup))
+
+
+def _message(kind, payload=None):
+    return SimpleNamespace(
+        id=3,
+        user_id=7,
+        kind=kind,
+        payload=payload or {},
+        status=OutboxStatus.PENDING,
+        attempts=0,
+        sent_at=None,
+    )
+
+
+def _patch(monkeypatch, message, rescheduled=None):
+    async def claim(_session, now, lease_until):
+        return message if message.status == OutboxStatus.PENDING else None
+
+    async def reschedule(_session, message_id, **kwargs):
+        rescheduled.append((message_id, kwargs["attempts"], kwargs["failed"]))
+        message.attempts = kwargs["attempts"]
+
+    async def get_user(_session, user_id):
+        return SimpleNamespace(id=user_id, tg_id=42)
+
+    async def has_access(*args):
+        return True
+
+    async def text(_session, key):
+        return key
+
+    monkeypatch.setattr(outbox.outbox_repo, "claim_next_outbox_message", claim)
+    monkeypatch.setattr(outbox.outbox_repo, "reschedule_outbox_message", reschedule)
+    monkeypatch.setattr(outbox.user_repo, "get_user_by_id", get_user)
+    monkeypatch.setattr(outbox.user_repo, "lock_user_by_id", get_user)
+    monkeypatch.setattr(outbox, "has_valid_access", has_access)
+    monkeypatch.setattr(outbox, "get_text", text)
+    monkeypatch.setattr(
+        outbox,
+        "settings",
+        SimpleNamespace(
+            outbox_workers=1,
+            outbox_max_attempts=2,
+            primary_channel_id=-1001,
+            secondary_discussion_id=-1002,
+        ),
+    )
+
+
+def _granted(granted):
+    async def grant(_session, _bot, user_id, tg_id):
+        granted.append((user_id, tg_id))
+        return AccessChangeResult(
+            channel_ok=True,
+            group_ok=True,
+            channel_link="https://t.me/+c",
+            group_link="https://t.me/+g",
+        )
+
+    return grant
+
+
+def test_paid_access_grant_is_committed_before_the_notice(monkeypatch):
+    session = FakeSession()
+    message = _message(OutboxKind.PAID_ACCESS)
+    granted = []
+    _patch(monkeypatch, message)
+    monkeypatch.setattr(outbox, "grant_access_or_enqueue", _granted(granted))
+    bot = FakeBot()
+    dispatcher = outbox.OutboxDispatcher(bot, lambda: session)
+
+    assert asyncio.run(dispatcher.process_next()) is True
+    assert asyncio.run(dispatcher.process_next()) is False
+    assert granted == [(7, 42)]
+    assert [(tg_id, text) for tg_id, text, _ in bot.sent] == [(42, "payment_success")]
+    assert message.status == OutboxStatus.SENT
+    assert message.payload["links"] == {
+        "channel": "https://t.me/+c",
+        "group": "https://t.me/+g",
+    }
+
+
+def test_failed_notice_is_resent_without_granting_again(monkeypatch):
+    session = FakeSession()
+    message = _message(OutboxKind.PAID_ACCESS)
+    granted = []
+    _patch(monkeypatch, message, [])
+    monkeypatch.setattr(outbox, "grant_access_or_enqueue", _granted(granted))
+    bot = FakeBot(TelegramNetworkError(method=SimpleNamespace(), message="timeout"))
+    dispatcher = outbox.OutboxDispatcher(bot, lambda: session)
+
+    asyncio.run(dispatcher.process_next())
+    bot._error = None
+    asyncio.run(dispatcher.process_next())
+
+    assert granted == [(7, 42)]
+    assert len(bot.sent) == 1
+    assert message.status == OutboxStatus.SENT
+
+
+def test_access_revoked_before_delivery_is_not_granted(monkeypatch):
+    session = FakeSession()
+    message = _message(OutboxKind.PAID_ACCESS)
+    _patch(monkeypatch, message)
+
+    async def no_access(*args):
+        return False
+
+    async def must_not_grant(*args):
+        raise AssertionError("revoked user must not be unbanned")
+
+    monkeypatch.setattr(outbox, "has_valid_access", no_access)
+    monkeypatch.setattr(outbox, "grant_access_or_enqueue", must_not_grant)
+    bot = FakeBot()
+
+    asyncio.run(outbox.OutboxDispatcher(bot, lambda: session).process_next())
+
+    assert bot.sent == []
+    assert message.status == OutboxStatus.SENT
+
+
+def test_access_revoked_during_the_grant_revokes_the_new_links(monkeypatch):
+    session = FakeSession()
+    message = _message(OutboxKind.PAID_ACCESS)
+    checks = iter([True, False])
+    revoked = []
+    _patch(monkeypatch, message)
+
+    async def access(*args):
+        return next(checks)
+
+    async def revoke(_bot, chat_id, link):
+        revoked.append(chat_id)
+        return True
+
+    monkeypatch.setattr(outbox, "has_valid_access", access)
+    monkeypatch.setattr(outbox, "grant_access_or_enqueue", _granted([]))
+    monkeypatch.setattr(outbox, "revoke_invite_link", revoke)
+    bot = FakeBot()
+
+    asyncio.run(outbox.OutboxDispatcher(bot, lambda: session).process_next())
+
+    assert revoked == [-1001, -1002]
+    assert bot.sent == []
+    assert message.payload["links"] is None
+
+
+def test_failed_delivery_is_retried_then_given_up(monkeypatch):
+    session = FakeSession()
+    message = _message(OutboxKind.PAYMENT_NOTICE, {"template_key": "payment_failed"})
+    rescheduled = []
+    _patch(monkeypatch, message, rescheduled)
+    bot = FakeBot(TelegramNetworkError(method=SimpleNamespace(), message="timeout"))
+    dispatcher = outbox.OutboxDispatcher(bot, lambda: session)
+
+    assert asyncio.run(dispatcher.process_next()) is True
+    assert asyncio.run(dispatcher.process_next()) is True
+    assert rescheduled == [(3, 1, False), (3, 2, True)]
+    assert session.rollbacks == 2
+    assert outbox.retry_delay(3) == outbox.RETRY_BASE_DELAY * 4
+
+
+def test_user_who_blocked_the_bot_does_not_block_the_queue(monkeypatch):
+    session = FakeSession()
+    message = _message(OutboxKind.PAYMENT_NOTICE, {"template_key": "payment_failed"})
+    _patch(monkeypatch, message, [])
+    bot = FakeBot(TelegramForbiddenError(method=SimpleNamespace(), message="blocked"))
+    dispatcher = outbox.OutboxDispatcher(bot, lambda: session)
+
+    assert asyncio.run(dispatcher.process_next()) is True
+    assert message.status == OutboxStatus.SENT
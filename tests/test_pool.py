@@ -0,0 +1,42 @@
+import asyncio
+import sqlite3
+
+import pytest
+from sqlalchemy import exc
+from sqlalchemy.util import greenlet_spawn
+
+from bot.db import pool as pool_module
+
+
+def _pool(**kwargs):
+    return pool_module.MeteredPool(
+        lambda: sqlite3.connect(":memory:", check_same_thread=False), **kwargs
+    )
+
+
+def test_metered_pool_reports_checkouts_overflow_and_timeouts(monkeypatch):
+    metrics = pool_module.PoolMetrics()
+    monkeypatch.setattr(pool_module, "pool_metrics", metrics)
+    pool = _pool(pool_size=1, max_overflow=1, timeout=0.05)
+
+    def scenario():
+        first = pool.connect()
+        second = pool.connect()
+        with pytest.raises(exc.TimeoutError):
+            pool.connect()
+        busy = metrics.snapshot(pool)
+        second.close()
+        first.close()
+        return busy
+
+    async def run():
+        return await greenlet_spawn(scenario)
+
+    busy = asyncio.run(run())
+
+    assert busy["checked_out"] == 2
+    assert busy["overflow"] == 1
+    assert busy["timeouts"] == 1
+    assert metrics.checkouts == 2
+    assert metrics.overflow_peak == 1
+    assert metrics.snapshot(pool)["checked_out"] == 0
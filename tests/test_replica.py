@@ -0,0 +1,100 @@
+import asyncio
+import os
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from bot.db import replica
+
+TEST_REPLICA_DATABASE_URL = os.getenv("TEST_REPLICA_DATABASE_URL")
+
+
+def _router(lags, *, configured=True):
+    engine = create_async_engine("postgresql+asyncpg://u:p@localhost/db")
+    router = replica.ReplicaRouter(
+        engine if configured else None, engine, max_lag_seconds=5
+    )
+    probes = []
+
+    async def lag():
+        probes.append(True)
+        value = lags.pop(0)
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+    router._replica_lag = lag
+    return router, probes
+
+
+def test_without_replica_reads_go_to_the_primary():
+    router, probes = _router([], configured=False)
+
+    maker = asyncio.run(router.sessionmaker())
+
+    assert maker is router.primary_sessions
+    assert probes == []
+
+
+def test_replica_is_used_only_while_it_keeps_up(monkeypatch):
+    router, probes = _router([0.5, 30.0, OSError("refused")])
+    monkeypatch.setattr(replica, "CHECK_INTERVAL_SECONDS", 0)
+
+    async def scenario():
+        return [await router.replica_usable() for _ in range(3)]
+
+    assert asyncio.run(scenario()) == [True, False, False]
+    assert len(probes) == 3
+
+
+def test_verdict_is_cached_until_the_next_check(monkeypatch):
+    router, probes = _router([0.0])
+
+    async def scenario():
+        first = await router.sessionmaker()
+        second = await router.sessionmaker()
+        return first, second
+
+    first, second = asyncio.run(scenario())
+
+    assert router.is_replica(first)
+    assert second is first
+    assert len(probes) == 1
+
+
+def test_replica_errors_fall_back_to_the_primary(monkeypatch):
+    router, _ = _router([0.0])
+    monkeypatch.setattr(replica, "replica_router", router)
+
+    class Failed(DBAPIError):
+        def __init__(self):
+            Exception.__init__(self, "connection lost")
+
+    async def scenario():
+        with pytest.raises(Failed):
+            async with replica.read_only_session("test"):
+                raise Failed()
+        return await router.sessionmaker()
+
+    assert asyncio.run(scenario()) is router.primary_sessions
+
+
+@pytest.mark.skipif(
+    not TEST_REPLICA_DATABASE_URL, reason="TEST_REPLICA_DATABASE_URL is not set"
+)
+def test_replica_probe_and_read_only_sessions_on_a_real_server():
+    async def scenario():
+        engine = create_async_engine(TEST_REPLICA_DATABASE_URL)
+        try:
+            router = replica.ReplicaRouter(engine, engine, max_lag_seconds=5)
+            assert await router.replica_usable()
+            async with (await router.sessionmaker())() as session:
+                assert await session.scalar(text("SELECT 1")) == 1
+                with pytest.raises(DBAPIError, match="read-only"):
+                    await session.execute(text("CREATE TABLE read_only_check (x int)"))
+        finally:
+            await engine.dispose()
+
+    asyncio.run(scenario())
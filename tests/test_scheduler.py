@@ -2,14 +2,28 @@ import asyncio
 from datetime import datetime, timedelta, timezone
 from types import SimpleNamespace
 
+import httpx
+
 from bot.access_control.service import AccessChangeResult
 from bot.db.models import MembershipStatus
-from bot.scheduler import jobs
+from bot.payments import yookassa_adapter as yookassa_module
+from bot.scheduler import deadlines, jobs
 from bot.scheduler import setup as scheduler_setup
+from scripts.fake_yookassa import FakeProvider, create_fake_app
 
 NOW = datetime.now(timezone.utc)
 
 
+class RecordingTransport(httpx.ASGITransport):
+    def __init__(self, app):
+        super().__init__(app=app)
+        self.requests: list[httpx.Request] = []
+
+    async def handle_async_request(self, request):
+        self.requests.append(request)
+        return await super().handle_async_request(request)
+
+
 class FakeScalars:
     def __init__(self, rows):
         self.rows = rows
@@ -37,11 +51,50 @@ class FakeSession:
     async def commit(self):
         self.commits += 1
 
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return None
+
+
+def _row(membership_id, user_id, *, overdue_for=timedelta(hours=1)):
+    return SimpleNamespace(
+        id=membership_id,
+        user_id=user_id,
+        status=MembershipStatus.ACTIVE,
+        grace_end_at=NOW - overdue_for,
+        pay_later_deadline_at=None,
+    )
+
+
+def _allow_revokes(limit):
+    async def batch_size(_session, _bot, _job, count, _now):
+        return min(count, limit)
+
+    return batch_size
+
 
-def _patch_revoke_dependencies(monkeypatch, *, stale, access, revoke):
+def _patch_expiry(monkeypatch, rows):
+    async def expire_due(_session, membership_ids, _now):
+        for row in rows:
+            if row.id in membership_ids:
+                row.status = MembershipStatus.EXPIRED
+        return len(membership_ids)
+
+    monkeypatch.setattr(jobs.membership_repo, "expire_due_memberships", expire_due)
+
+
+def _patch_revoke_dependencies(monkeypatch, *, stale, access, revoke, keep=()):
     async def list_stale(*args, **kwargs):
         return stale
 
+    async def batch_access(*args, **kwargs):
+        return set(keep)
+
+    async def text(*args, **kwargs):
+        return "expired"
+
     async def lock_user(_session, user_id):
         return SimpleNamespace(id=user_id, tg_id=user_id + 1000)
 
@@ -49,16 +102,20 @@ def _patch_revoke_dependencies(monkeypatch, *, stale, access, revoke):
         return None
 
     monkeypatch.setattr(jobs, "_is_revoke_jobs_enabled", lambda: True)
-    monkeypatch.setattr(jobs.membership_repo, "list_memberships_to_expire", list_stale)
+    monkeypatch.setattr(jobs.membership_repo, "list_overdue_memberships", list_stale)
+    monkeypatch.setattr(jobs, "users_with_valid_access", batch_access)
     monkeypatch.setattr(jobs, "has_valid_access", access)
+    monkeypatch.setattr(jobs, "get_text", text)
     monkeypatch.setattr(jobs.user_repo, "lock_user_by_id", lock_user)
     monkeypatch.setattr(jobs, "revoke_access", revoke)
+    monkeypatch.setattr(jobs, "revoke_user_invite_links", no_audit)
     monkeypatch.setattr(jobs, "_record_automatic_revoke", no_audit)
+    _patch_expiry(monkeypatch, stale)
 
 
 def test_expiry_counts_only_users_who_would_actually_lose_access(monkeypatch):
-    stale_protected = SimpleNamespace(id=1, user_id=10, status=MembershipStatus.ACTIVE)
-    stale_revoke = SimpleNamespace(id=2, user_id=20, status=MembershipStatus.ACTIVE)
+    stale_protected = _row(1, 10)
+    stale_revoke = _row(2, 20)
     session = FakeSession()
     revoked = []
     safety_counts = []
@@ -75,14 +132,17 @@ def test_expiry_counts_only_users_who_would_actually_lose_access(monkeypatch):
         stale=[stale_protected, stale_revoke],
         access=has_access,
         revoke=revoke,
+        keep={10},
     )
 
-    def mass_limit(_job_name, count):
+    async def mass_limit(_session, _bot, _job_name, count, _now):
         safety_counts.append(count)
-        return False
+        return count
 
-    monkeypatch.setattr(jobs, "_is_mass_revoke_blocked", mass_limit)
-    asyncio.run(jobs.expire_memberships(session, SimpleNamespace()))
+    monkeypatch.setattr(jobs, "_revoke_batch_size", mass_limit)
+    asyncio.run(
+        jobs.process_access_lifecycle(session, SimpleNamespace(), lambda: session)
+    )
 
     assert safety_counts == [1]
     assert revoked == [1020]
@@ -92,7 +152,7 @@ def test_expiry_counts_only_users_who_would_actually_lose_access(monkeypatch):
 
 
 def test_payment_won_race_is_rechecked_before_telegram_revoke(monkeypatch):
-    stale = SimpleNamespace(id=1, user_id=20, status=MembershipStatus.ACTIVE)
+    stale = _row(1, 20)
     session = FakeSession()
     checks = 0
     revoked = []
@@ -100,7 +160,7 @@ def test_payment_won_race_is_rechecked_before_telegram_revoke(monkeypatch):
     async def access_appears_after_lock(*args, **kwargs):
         nonlocal checks
         checks += 1
-        return checks == 2
+        return True
 
     async def revoke(_bot, tg_id):
         revoked.append(tg_id)
@@ -109,39 +169,71 @@ def test_payment_won_race_is_rechecked_before_telegram_revoke(monkeypatch):
     _patch_revoke_dependencies(
         monkeypatch, stale=[stale], access=access_appears_after_lock, revoke=revoke
     )
-    monkeypatch.setattr(jobs, "_is_mass_revoke_blocked", lambda *args: False)
+    monkeypatch.setattr(jobs, "_revoke_batch_size", _allow_revokes(30))
 
-    asyncio.run(jobs.expire_memberships(session, SimpleNamespace()))
+    asyncio.run(
+        jobs.process_access_lifecycle(session, SimpleNamespace(), lambda: session)
+    )
 
-    assert checks == 2
+    assert checks == 1
     assert revoked == []
     assert stale.status == MembershipStatus.EXPIRED
-    assert session.commits == 1
+    assert session.commits == 2
 
 
-def test_failed_telegram_revoke_is_retried_instead_of_hidden(monkeypatch):
-    stale = SimpleNamespace(id=1, user_id=20, status=MembershipStatus.ACTIVE)
+def test_failed_channel_revoke_is_retried_instead_of_hidden(monkeypatch):
+    stale = _row(1, 20)
     session = FakeSession()
 
     async def no_access(*args, **kwargs):
         return False
 
     async def failed_revoke(*args, **kwargs):
-        return AccessChangeResult(channel_ok=True, group_ok=False)
+        return AccessChangeResult(channel_ok=False, group_ok=False)
 
     _patch_revoke_dependencies(
         monkeypatch, stale=[stale], access=no_access, revoke=failed_revoke
     )
-    monkeypatch.setattr(jobs, "_is_mass_revoke_blocked", lambda *args: False)
+    monkeypatch.setattr(jobs, "_revoke_batch_size", _allow_revokes(30))
 
-    asyncio.run(jobs.expire_memberships(session, SimpleNamespace()))
+    asyncio.run(
+        jobs.process_access_lifecycle(session, SimpleNamespace(), lambda: session)
+    )
 
     assert stale.status == MembershipStatus.ACTIVE
-    assert session.commits == 1
+    assert session.commits == 2
+
+
+def test_failed_group_ban_is_queued_without_repeating_channel_ban(monkeypatch):
+    stale = _row(1, 20)
+    session = FakeSession()
+    queued = []
+
+    async def no_access(*args, **kwargs):
+        return False
+
+    async def group_failed(*args, **kwargs):
+        return AccessChangeResult(channel_ok=True, group_ok=False)
+
+    async def enqueue(_session, user_id, result):
+        queued.append((user_id, result.group_ok))
+
+    _patch_revoke_dependencies(
+        monkeypatch, stale=[stale], access=no_access, revoke=group_failed
+    )
+    monkeypatch.setattr(jobs, "_revoke_batch_size", _allow_revokes(30))
+    monkeypatch.setattr(jobs, "enqueue_failed_revoke", enqueue)
+
+    asyncio.run(
+        jobs.process_access_lifecycle(session, SimpleNamespace(), lambda: session)
+    )
+
+    assert queued == [(20, False)]
+    assert stale.status == MembershipStatus.EXPIRED
 
 
 def test_mass_revoke_limit_stops_changes_before_mutation(monkeypatch):
-    stale = SimpleNamespace(id=1, user_id=20, status=MembershipStatus.ACTIVE)
+    stale = _row(1, 20)
     session = FakeSession()
 
     async def no_access(*args, **kwargs):
@@ -153,61 +245,317 @@ def test_mass_revoke_limit_stops_changes_before_mutation(monkeypatch):
     _patch_revoke_dependencies(
         monkeypatch, stale=[stale], access=no_access, revoke=should_not_revoke
     )
-    monkeypatch.setattr(jobs, "_is_mass_revoke_blocked", lambda *args: True)
+    monkeypatch.setattr(jobs, "_revoke_batch_size", _allow_revokes(0))
 
-    asyncio.run(jobs.expire_memberships(session, SimpleNamespace()))
+    backlog = asyncio.run(
+        jobs.process_access_lifecycle(session, SimpleNamespace(), lambda: session)
+    )
 
+    assert backlog == 1
     assert stale.status == MembershipStatus.ACTIVE
-    assert session.commits == 0
+    assert session.commits == 1
 
 
-def test_paid_user_is_not_revoked_when_pay_later_row_expires(monkeypatch):
-    overdue = SimpleNamespace(id=8, user_id=20, status=MembershipStatus.ACTIVE)
-    session = FakeSession(rows=[overdue])
+def test_revoke_backlog_drains_oldest_deadlines_first(monkeypatch):
+    newest = _row(1, 10, overdue_for=timedelta(hours=1))
+    oldest = _row(2, 20, overdue_for=timedelta(days=3))
+    middle = _row(3, 30, overdue_for=timedelta(days=1))
+    session = FakeSession()
     revoked = []
 
-    async def has_paid_access(*args, **kwargs):
-        return True
-
-    async def lock_user(_session, user_id):
-        return SimpleNamespace(id=user_id, tg_id=1020)
+    async def no_access(*args, **kwargs):
+        return False
 
     async def revoke(_bot, tg_id):
         revoked.append(tg_id)
         return AccessChangeResult(channel_ok=True, group_ok=True)
 
-    async def text(*args, **kwargs):
-        return "expired"
+    _patch_revoke_dependencies(
+        monkeypatch, stale=[newest, oldest, middle], access=no_access, revoke=revoke
+    )
+    monkeypatch.setattr(jobs, "_revoke_batch_size", _allow_revokes(2))
 
-    monkeypatch.setattr(jobs, "_is_revoke_jobs_enabled", lambda: True)
-    monkeypatch.setattr(jobs, "has_valid_access", has_paid_access)
-    monkeypatch.setattr(jobs.user_repo, "lock_user_by_id", lock_user)
-    monkeypatch.setattr(jobs, "revoke_access", revoke)
-    monkeypatch.setattr(jobs, "get_text", text)
-    monkeypatch.setattr(jobs, "_is_mass_revoke_blocked", lambda *args: False)
+    backlog = asyncio.run(
+        jobs.process_access_lifecycle(session, SimpleNamespace(), lambda: session)
+    )
 
-    asyncio.run(jobs.enforce_pay_later_deadlines(session, SimpleNamespace()))
+    assert backlog == 1
+    assert sorted(revoked) == [1020, 1030]
+    assert newest.status == MembershipStatus.ACTIVE
+
+
+def test_hourly_ceiling_limits_batch_and_alerts_admins(monkeypatch):
+    sent = []
+    alerts = []
+
+    async def revoked_last_hour(*args, **kwargs):
+        return 55
+
+    async def not_alerted(*args, **kwargs):
+        return False
+
+    async def record_alert(_session, action, payload, **kwargs):
+        alerts.append((action, payload["backlog"]))
+
+    class FakeBot:
+        async def send_message(self, tg_id, text):
+            sent.append(tg_id)
+
+    monkeypatch.setattr(
+        jobs,
+        "settings",
+        SimpleNamespace(
+            max_revoke_per_run=30, max_revoke_per_hour=60, admin_tg_ids=[1]
+        ),
+    )
+    monkeypatch.setattr(jobs, "count_actions_since", revoked_last_hour)
+    monkeypatch.setattr(jobs, "has_action_with_key", not_alerted)
+    monkeypatch.setattr(jobs, "add_audit_log", record_alert)
+
+    allowed = asyncio.run(
+        jobs._revoke_batch_size(FakeSession(), FakeBot(), jobs.LIFECYCLE_JOB, 40, NOW)
+    )
+
+    assert allowed == 5
+    assert sent == [1]
+    assert alerts == [("admin_alert_sent", 35)]
+
+
+def test_independent_users_are_revoked_concurrently(monkeypatch):
+    stale = [
+        _row(1, 10),
+        _row(2, 20),
+    ]
+    session = FakeSession()
+    in_flight = 0
+    max_in_flight = 0
+
+    async def no_access(*args, **kwargs):
+        return False
+
+    async def slow_revoke(_bot, tg_id):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return AccessChangeResult(channel_ok=True, group_ok=True)
+
+    _patch_revoke_dependencies(
+        monkeypatch, stale=stale, access=no_access, revoke=slow_revoke
+    )
+    monkeypatch.setattr(jobs, "_revoke_batch_size", _allow_revokes(30))
+
+    asyncio.run(
+        jobs.process_access_lifecycle(session, SimpleNamespace(), lambda: session)
+    )
+
+    assert max_in_flight == 2
+    assert all(row.status == MembershipStatus.EXPIRED for row in stale)
+
+
+def test_paid_user_is_not_revoked_when_pay_later_row_expires(monkeypatch):
+    overdue = _row(8, 20)
+    overdue.pay_later_deadline_at = NOW - timedelta(minutes=5)
+    session = FakeSession()
+
+    async def should_not_revoke(*args, **kwargs):
+        raise AssertionError("paid user must keep access")
+
+    _patch_revoke_dependencies(
+        monkeypatch,
+        stale=[overdue],
+        access=None,
+        revoke=should_not_revoke,
+        keep={20},
+    )
+    monkeypatch.setattr(jobs, "_revoke_batch_size", _allow_revokes(30))
+
+    asyncio.run(
+        jobs.process_access_lifecycle(session, SimpleNamespace(), lambda: session)
+    )
 
-    assert revoked == []
     assert overdue.status == MembershipStatus.EXPIRED
     assert session.commits == 1
 
 
+def test_single_pass_notifies_only_missed_pay_later_deadlines(monkeypatch):
+    grace_ended = _row(1, 10)
+    pay_later = _row(2, 20, overdue_for=-timedelta(days=3))
+    pay_later.pay_later_deadline_at = NOW - timedelta(minutes=5)
+    session = FakeSession()
+    notified = []
+
+    class FakeBot:
+        async def send_message(self, tg_id, text):
+            notified.append(tg_id)
+
+    async def no_access(*args, **kwargs):
+        return False
+
+    async def revoke(*args, **kwargs):
+        return AccessChangeResult(channel_ok=True, group_ok=True)
+
+    _patch_revoke_dependencies(
+        monkeypatch, stale=[grace_ended, pay_later], access=no_access, revoke=revoke
+    )
+    monkeypatch.setattr(jobs, "_revoke_batch_size", _allow_revokes(30))
+
+    backlog = asyncio.run(
+        jobs.process_access_lifecycle(session, FakeBot(), lambda: session)
+    )
+
+    assert backlog == 0
+    assert notified == [1020]
+    assert grace_ended.status == MembershipStatus.EXPIRED
+    assert pay_later.status == MembershipStatus.EXPIRED
+
+
 def test_duplicate_flow_start_revoke_job_is_not_registered(monkeypatch):
+    monkeypatch.setattr(deadlines, "_scheduler", None)
+    monkeypatch.setattr(deadlines, "_wakeup_job", None)
     monkeypatch.setattr(
         scheduler_setup,
         "settings",
-        SimpleNamespace(scheduler_timezone="UTC", revoke_jobs_enabled=True),
+        SimpleNamespace(
+            scheduler_timezone="UTC",
+            revoke_jobs_enabled=True,
+            scheduler_misfire_grace_seconds=3600,
+            access_sweep_interval_minutes=30,
+        ),
     )
     scheduler = scheduler_setup.setup_scheduler(
         SimpleNamespace(), payment_adapter=SimpleNamespace()
     )
     job_ids = {job.id for job in scheduler.get_jobs()}
-    assert "expire_memberships" in job_ids
-    assert "enforce_pay_later_deadlines" in job_ids
+    assert jobs.LIFECYCLE_JOB in job_ids
+    assert "expire_memberships" not in job_ids
+    assert "enforce_pay_later_deadlines" not in job_ids
     assert "remove_non_renewed" not in job_ids
 
 
+def _scheduler_with_history_settings(monkeypatch):
+    monkeypatch.setattr(deadlines, "_scheduler", None)
+    monkeypatch.setattr(deadlines, "_wakeup_job", None)
+    monkeypatch.setattr(
+        scheduler_setup,
+        "settings",
+        SimpleNamespace(
+            scheduler_timezone="UTC",
+            revoke_jobs_enabled=True,
+            scheduler_misfire_grace_seconds=3600,
+            access_sweep_interval_minutes=30,
+        ),
+    )
+    return scheduler_setup.setup_scheduler(SimpleNamespace())
+
+
+def test_daily_mailing_missed_during_restart_runs_immediately(monkeypatch):
+    scheduler = _scheduler_with_history_settings(monkeypatch)
+    now = datetime(2026, 8, 20, 10, 20, tzinfo=timezone.utc)
+    last_runs = {"auto_mailings": datetime(2026, 8, 19, 10, 0, tzinfo=timezone.utc)}
+
+    planned = scheduler_setup.plan_catch_up(scheduler, last_runs, now)
+
+    assert planned == {"auto_mailings": now}
+
+
+def test_interval_job_keeps_cadence_after_restart(monkeypatch):
+    scheduler = _scheduler_with_history_settings(monkeypatch)
+    now = datetime(2026, 8, 20, 10, 20, tzinfo=timezone.utc)
+    last_run = datetime(2026, 8, 20, 10, 0, tzinfo=timezone.utc)
+
+    planned = scheduler_setup.plan_catch_up(
+        scheduler, {jobs.LIFECYCLE_JOB: last_run}, now
+    )
+
+    assert planned == {jobs.LIFECYCLE_JOB: last_run + timedelta(minutes=30)}
+
+
+def test_run_missed_beyond_grace_period_is_not_replayed(monkeypatch):
+    scheduler = _scheduler_with_history_settings(monkeypatch)
+    now = datetime(2026, 8, 20, 18, 0, tzinfo=timezone.utc)
+    last_runs = {"auto_mailings": datetime(2026, 8, 19, 10, 0, tzinfo=timezone.utc)}
+
+    assert scheduler_setup.plan_catch_up(scheduler, last_runs, now) == {}
+
+
+def test_latest_missed_run_is_checked_against_grace(monkeypatch):
+    scheduler = _scheduler_with_history_settings(monkeypatch)
+    now = datetime(2026, 8, 20, 10, 20, tzinfo=timezone.utc)
+    # Yesterday's 10:00 run failed; today's one was missed during a restart.
+    last_runs = {"auto_mailings": datetime(2026, 8, 18, 10, 0, tzinfo=timezone.utc)}
+
+    planned = scheduler_setup.plan_catch_up(scheduler, last_runs, now)
+
+    assert planned == {"auto_mailings": now}
+
+
+def test_restore_marks_interrupted_runs_failed(monkeypatch):
+    scheduler = _scheduler_with_history_settings(monkeypatch)
+    scheduler_setup.settings.revoke_jobs_enabled = False
+    calls = []
+
+    async def fail_running(_session, now):
+        calls.append("fail_running")
+        return 1
+
+    async def last_runs(_session):
+        calls.append("last_runs")
+        return {}
+
+    async def delete_before(_session, _cutoff):
+        return 0
+
+    monkeypatch.setattr(scheduler_setup, "AsyncSessionLocal", FakeSession)
+    repo = scheduler_setup.job_run_repo
+    monkeypatch.setattr(repo, "fail_running_job_runs", fail_running)
+    monkeypatch.setattr(repo, "get_last_successful_runs", last_runs)
+    monkeypatch.setattr(repo, "delete_job_runs_before", delete_before)
+    monkeypatch.setattr(
+        scheduler_setup.outbox_repo, "delete_sent_outbox_messages_before", delete_before
+    )
+
+    asyncio.run(scheduler_setup.restore_job_schedule(scheduler))
+
+    assert calls == ["fail_running", "last_runs"]
+
+
+def test_new_earlier_deadline_pulls_access_wakeup_forward(monkeypatch):
+    scheduler = _scheduler_with_history_settings(monkeypatch)
+    later = NOW + timedelta(hours=5)
+    earlier = NOW + timedelta(hours=1)
+
+    deadlines.schedule_access_deadline(later)
+    deadlines.schedule_access_deadline(earlier)
+
+    job = scheduler.get_job(deadlines.WAKEUP_JOB_ID)
+    assert job.trigger.run_date == earlier + deadlines.WAKEUP_DELAY
+
+
+def test_later_deadline_does_not_postpone_scheduled_wakeup(monkeypatch):
+    scheduler = _scheduler_with_history_settings(monkeypatch)
+    earlier = NOW + timedelta(hours=1)
+
+    async def schedule_while_running():
+        scheduler.start(paused=True)
+        try:
+            deadlines.schedule_access_deadline(earlier)
+            deadlines.schedule_membership_deadline(
+                SimpleNamespace(
+                    grace_end_at=NOW + timedelta(days=2),
+                    pay_later_deadline_at=NOW + timedelta(hours=3),
+                )
+            )
+            return scheduler.get_job(deadlines.WAKEUP_JOB_ID).next_run_time
+        finally:
+            scheduler.shutdown(wait=False)
+
+    next_run_time = asyncio.run(schedule_while_running())
+
+    assert next_run_time == earlier + deadlines.WAKEUP_DELAY
+
+
 def test_legacy_pending_payment_gets_a_bounded_fallback_deadline():
     created_at = NOW - timedelta(days=2)
     payment = SimpleNamespace(created_at=created_at, expires_at=None)
@@ -226,3 +574,199 @@ def test_old_expiration_does_not_trigger_stale_user_notification():
         expires_at=NOW - timedelta(days=9),
     )
     assert not jobs._expiration_notice_is_timely(payment, NOW)
+
+
+def test_pending_payment_check_resumes_from_saved_cursor(monkeypatch):
+    checked = []
+    saved = []
+    payments = [SimpleNamespace(id=i, external_id=f"ext-{i}") for i in (3, 5, 8)]
+
+    class OneAndAHalfChunks:
+        checks = 0
+
+        @property
+        def exhausted(self):
+            self.checks += 1
+            return self.checks > 3
+
+    async def cursor(*args, **kwargs):
+        return "3"
+
+    async def save(_session, _job, value):
+        saved.append(value)
+
+    async def pending(_session, *, after_id, limit):
+        return [p for p in payments if p.id > after_id][:limit]
+
+    async def check(_session, _adapter, external_id, _now):
+        checked.append(external_id)
+
+    monkeypatch.setattr(jobs, "load_cursor", cursor)
+    monkeypatch.setattr(jobs, "save_cursor", save)
+    monkeypatch.setattr(jobs.payment_repo, "list_pending_payments", pending)
+    monkeypatch.setattr(jobs, "_check_pending_payment", check)
+
+    asyncio.run(
+        jobs.check_pending_payments(
+            FakeSession(), SimpleNamespace(), OneAndAHalfChunks()
+        )
+    )
+
+    assert checked == ["ext-5", "ext-8"]
+    assert saved == ["8"]
+
+
+def test_payments_job_fails_expired_invoices_never_created(monkeypatch):
+    calls = []
+
+    async def fail_unsent(_session, now):
+        calls.append(now)
+        return {9}
+
+    async def no_cursor(*args, **kwargs):
+        return None
+
+    async def save(*args, **kwargs):
+        return None
+
+    async def pending(_session, *, after_id, limit):
+        return []
+
+    monkeypatch.setattr(jobs.payment_repo, "fail_unsent_payments", fail_unsent)
+    monkeypatch.setattr(jobs, "load_cursor", no_cursor)
+    monkeypatch.setattr(jobs, "save_cursor", save)
+    monkeypatch.setattr(jobs.payment_repo, "list_pending_payments", pending)
+    session = FakeSession()
+
+    asyncio.run(jobs.check_pending_payments(session, SimpleNamespace()))
+
+    assert len(calls) == 1
+    assert session.commits == 2
+
+
+def test_reconciliation_pages_provider_list_and_bulk_fails_canceled(monkeypatch):
+    api = FakeProvider(webhook_url="http://127.0.0.1:9/unused")
+    transport = RecordingTransport(create_fake_app(api))
+    created = NOW - timedelta(hours=2)
+    paid = api.add_payment("succeeded", created)
+    canceled = [api.add_payment("canceled", created) for _ in range(3)]
+    api.add_payment("pending", created)
+    local = {
+        item["id"]: SimpleNamespace(
+            id=index,
+            external_id=item["id"],
+            user_id=index,
+            amount_rub=2990,
+            currency="RUB",
+            status="pending",
+            created_at=created,
+            expires_at=None,
+        )
+        for index, item in enumerate([paid, *canceled], start=1)
+    }
+    failed_batches = []
+    checked = []
+
+    async def oldest(_session, *, created_after):
+        return created
+
+    async def no_cursor(*args):
+        return None
+
+    async def save(*args):
+        return None
+
+    async def by_external_ids(_session, external_ids):
+        return {key: local[key] for key in external_ids if key in local}
+
+    async def fail(_session, payment_ids):
+        failed_batches.append(sorted(payment_ids))
+        return set(payment_ids)
+
+    async def notify(*args, **kwargs):
+        return None
+
+    async def check(_session, _adapter, external_id, _now, remote=None):
+        checked.append((external_id, remote["status"]))
+
+    monkeypatch.setattr(jobs.payment_repo, "get_oldest_pending_created_at", oldest)
+    monkeypatch.setattr(jobs, "load_cursor", no_cursor)
+    monkeypatch.setattr(jobs, "save_cursor", save)
+    monkeypatch.setattr(
+        jobs.payment_repo, "get_pending_payments_by_external_ids", by_external_ids
+    )
+    monkeypatch.setattr(jobs.payment_repo, "fail_pending_payments", fail)
+    monkeypatch.setattr(jobs, "notify_payment_status", notify)
+    monkeypatch.setattr(jobs, "_check_pending_payment", check)
+    monkeypatch.setattr(jobs, "validate_remote_payment", lambda *a, **k: None)
+    monkeypatch.setattr(yookassa_module, "LIST_PAGE_SIZE", 2)
+    adapter = yookassa_module.YooKassaAdapter(transport=transport)
+
+    async def scenario():
+        await jobs.reconcile_pending_payments(FakeSession(), adapter)
+        await adapter.aclose()
+
+    asyncio.run(scenario())
+
+    assert checked == [(paid["id"], "succeeded")]
+    assert sorted(sum(failed_batches, [])) == [2, 3, 4]
+    assert all(request.url.path == "/v3/payments" for request in transport.requests)
+    assert len(transport.requests) == 3
+
+
+def test_reconciliation_resumes_paging_where_the_budget_ran_out(monkeypatch):
+    stored = {}
+    listed = []
+    stale_checked = []
+
+    class Pages:
+        async def list_payments(self, *, created_since, status, cursor):
+            listed.append((status, cursor))
+            if status == "succeeded" and cursor is None:
+                return [], "page-2"
+            return [], None
+
+    class Budget:
+        def __init__(self, checks):
+            self.checks = checks
+
+        @property
+        def exhausted(self):
+            self.checks -= 1
+            return self.checks < 0
+
+    async def oldest(_session, *, created_after):
+        return NOW - timedelta(hours=1)
+
+    async def load(_session, _job):
+        return stored.get("cursor")
+
+    async def save(_session, _job, value):
+        stored["cursor"] = value
+
+    async def apply(*args):
+        return 0
+
+    async def stale(_session, *, after_id, created_before, limit):
+        rows = [SimpleNamespace(id=9, external_id="ext-old")]
+        return [row for row in rows if row.id > after_id]
+
+    async def check(_session, _adapter, external_id, _now):
+        stale_checked.append(external_id)
+
+    monkeypatch.setattr(jobs.payment_repo, "get_oldest_pending_created_at", oldest)
+    monkeypatch.setattr(jobs.payment_repo, "list_pending_payments", stale)
+    monkeypatch.setattr(jobs, "load_cursor", load)
+    monkeypatch.setattr(jobs, "save_cursor", save)
+    monkeypatch.setattr(jobs, "_apply_listed_payments", apply)
+    monkeypatch.setattr(jobs, "_check_pending_payment", check)
+
+    asyncio.run(jobs.reconcile_pending_payments(FakeSession(), Pages(), Budget(1)))
+    assert listed == [("succeeded", None)]
+    assert '"page": "page-2"' in stored["cursor"]
+
+    asyncio.run(jobs.reconcile_pending_payments(FakeSession(), Pages(), Budget(10)))
+    assert listed[1:] == [("succeeded", "page-2"), ("canceled", None)]
+    assert stale_checked == ["ext-old"]
+    # The pass is complete: the next tick starts a fresh window.
+    assert stored["cursor"] is None